@@ -0,0 +1,115 @@
+import os
+import json
+import time
+import tempfile
+import itertools
+import pandas as pd
+
+from crisscross.assembly_handle_optimization.handle_evolution import EvolveManager
+from crisscross.assembly_handle_optimization.hamming_benchmarks import generate_benchmark_corpus, get_benchmark_metadata
+from crisscross.helper_functions import create_dir_if_empty
+
+
+def benchmark_evolution_run(slat_array, generations=20, target_hamming=None, export_interval=10, **evolution_params):
+    """
+    Runs a short, fixed-seed evolution and measures where the time is spent.
+    :param slat_array: The slat array to evolve handles for
+    :param generations: Number of generations to run
+    :param target_hamming: Hamming distance for which the time (and generation count) to reach should be recorded (optional)
+    :param export_interval: Number of generations between each results export (as in run_full_experiment)
+    :param evolution_params: Any other parameters to pass on to the EvolveManager
+    :return: Dictionary of timings and results
+    """
+    timings = {'Evaluation Time': 0, 'Mutation Time': 0, 'Metrics Time': 0, 'Export Time': 0}
+    time_to_target = None
+    generations_to_target = None
+
+    with tempfile.TemporaryDirectory() as log_folder:
+        start_time = time.time()
+        with EvolveManager(slat_array, evolution_generations=generations, log_tracking_directory=log_folder,
+                           **evolution_params) as evolve_manager:
+            setup_time = time.time() - start_time
+
+            for generation in range(generations):
+                step_start = time.time()
+                evolve_manager.evolution_step()
+                step_time = time.time() - step_start
+
+                evaluation_time = evolve_manager.metrics['Hamming Compute Time'][-1]
+                mutation_time = evolve_manager.metrics['Mutation Time'][-1]
+                timings['Evaluation Time'] += evaluation_time
+                timings['Mutation Time'] += mutation_time
+                # everything else in a step (cache lookups, score unpacking, similarity, etc.) counts as metrics
+                timings['Metrics Time'] += step_time - evaluation_time - mutation_time
+
+                if export_interval and (generation + 1) % export_interval == 0:
+                    export_start = time.time()
+                    evolve_manager.export_results()
+                    evolve_manager.wait_for_exports()  # the export time should include the writing of all files
+                    timings['Export Time'] += time.time() - export_start
+
+                if (target_hamming is not None and time_to_target is None and
+                        evolve_manager.metrics['Corresponding Hamming Distance'][-1] >= target_hamming):
+                    time_to_target = time.time() - start_time
+                    generations_to_target = generation + 1
+
+            evolve_manager.wait_for_exports()
+            total_time = time.time() - start_time
+            hammings = evolve_manager.metrics['Corresponding Hamming Distance']
+
+    return {'Generations': generations,
+            'Total Time': total_time,
+            'Setup Time': setup_time,
+            **timings,
+            'Generations/sec': generations / (total_time - setup_time),
+            'Seconds/Generation': (total_time - setup_time) / generations,
+            'Time to Target': time_to_target,
+            'Generations to Target': generations_to_target,
+            'Final Hamming Distance': hammings[-1],
+            'Best Hamming Distance': max(hammings)}
+
+
+def run_evolution_benchmarks(output_folder, designs=('square_32',), populations=(30,), process_counts=(1,),
+                             generations=20, target_hamming=None, export_interval=10, random_seed=8, **evolution_params):
+    """
+    Runs fixed-seed evolution benchmarks over all combinations of design, population size and process count.
+    The results can be used to size compute requests (e.g. for create_o2_slurm_file).
+    :param output_folder: Folder to which the JSON and CSV reports should be written
+    :param designs: Names of the benchmark corpus designs to evolve (refer to generate_benchmark_corpus)
+    :param populations: Population sizes to benchmark
+    :param process_counts: Process counts to benchmark
+    :param generations: Number of generations to run for each combination
+    :param target_hamming: Hamming distance for which the time to reach should be recorded (optional)
+    :param export_interval: Number of generations between each results export
+    :param random_seed: Random seed used for every run
+    :param evolution_params: Any other parameters to pass on to the EvolveManager
+    :return: Dataframe with one row of results per combination
+    """
+    corpus = generate_benchmark_corpus()
+    for design in designs:
+        if design not in corpus:
+            raise ValueError(f'Benchmark design {design} not recognized.')
+
+    create_dir_if_empty(output_folder)
+
+    results = []
+    for design, population, process_count in itertools.product(designs, populations, process_counts):
+        print(f'Benchmarking evolution for design {design}, population {population}, process count {process_count}.')
+        result = {'Design': design, 'Population': population, 'Process Count': process_count}
+        result.update(benchmark_evolution_run(corpus[design]['slat_array'], generations=generations,
+                                              target_hamming=target_hamming, export_interval=export_interval,
+                                              random_seed=random_seed, evolution_population=population,
+                                              process_count=process_count,
+                                              unique_handle_sequences=corpus[design]['unique_handles'],
+                                              **evolution_params))
+        results.append(result)
+
+    results_df = pd.DataFrame(results)
+    results_df.to_csv(os.path.join(output_folder, 'evolution_benchmarks.csv'), index=False)
+    with open(os.path.join(output_folder, 'evolution_benchmarks.json'), 'w') as f:
+        json.dump({'metadata': get_benchmark_metadata(),
+                   'settings': {'generations': generations, 'target_hamming': target_hamming,
+                                'export_interval': export_interval, 'random_seed': random_seed, **evolution_params},
+                   'results': results}, f, indent=4, default=str)
+
+    return results_df
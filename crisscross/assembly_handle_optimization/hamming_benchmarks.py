@@ -0,0 +1,261 @@
+import os
+import sys
+import json
+import time
+import platform
+import itertools
+import subprocess
+import tracemalloc
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+from crisscross.core_functions.slat_design import generate_standard_square_slats
+from crisscross.assembly_handle_optimization import generate_random_slat_handles
+from crisscross.assembly_handle_optimization.hamming_compute import (extract_handle_dicts, oneshot_hamming_compute,
+                                                                    precise_hamming_compute, multirule_oneshot_hamming,
+                                                                    self_hamming_compute, SlatIndex, hamming_backends,
+                                                                    max_self_block_size)
+
+
+def generate_stacked_square_slats(slat_count=32, layers=3):
+    """
+    Generates a base array for a square megastructure with several layers, with slat directions alternating between layers.
+    :param slat_count: Number of handle positions in each slat
+    :param layers: Number of slat layers
+    :return: 3D numpy array with x/y slat positions
+    """
+    base_array = np.zeros((slat_count, slat_count, layers))
+    for layer in range(layers):
+        for i in range(1, slat_count + 1):
+            if layer % 2 == 0:
+                base_array[i - 1, :, layer] = i
+            else:
+                base_array[:, i - 1, layer] = i
+    return base_array
+
+
+def generate_sparse_canvas_slats(slat_count=32, canvas_size=160, square_positions=((0, 0), (0, 128), (64, 64), (128, 0), (128, 128))):
+    """
+    Generates a base array for a large, mostly empty canvas containing several separate square megastructures.
+    :param slat_count: Number of handle positions in each slat
+    :param canvas_size: Width/height of the canvas
+    :param square_positions: Top-left corner of each square on the canvas
+    :return: 3D numpy array with x/y slat positions
+    """
+    base_array = np.zeros((canvas_size, canvas_size, 2))
+    square_array, _ = generate_standard_square_slats(slat_count)
+    for square_index, (x, y) in enumerate(square_positions):
+        # slat IDs are offset to keep every slat on the canvas unique
+        base_array[x:x + slat_count, y:y + slat_count, :] = np.where(square_array > 0, square_array + square_index * slat_count, 0)
+    return base_array
+
+
+def generate_benchmark_corpus(seed=8):
+    """
+    Generates the fixed set of designs (and their handle arrays) used for benchmarking.
+    The same seed always produces the same corpus, so results can be compared between code versions.
+    :param seed: Random seed for the handle arrays
+    :return: Dictionary of designs, each containing a slat array, handle array and slat length
+    """
+    square_array, _ = generate_standard_square_slats(32)
+    designs = OrderedDict()
+    designs['square_32'] = {'slat_array': square_array, 'unique_handles': 32}
+    designs['stack_3_layer'] = {'slat_array': generate_stacked_square_slats(32, 3), 'unique_handles': 32}
+    designs['sparse_large_canvas'] = {'slat_array': generate_sparse_canvas_slats(), 'unique_handles': 32}
+    designs['square_32_library_64'] = {'slat_array': square_array, 'unique_handles': 64}
+
+    np.random.seed(seed)
+    for design in designs.values():
+        design['handle_array'] = generate_random_slat_handles(design['slat_array'], design['unique_handles'])
+        design['slat_length'] = 32
+    return designs
+
+
+def generate_option_grid(design):
+    """
+    Generates every combination of multirule_oneshot_hamming options for a design.
+    :param design: Design dictionary (from generate_benchmark_corpus)
+    :return: List of option dictionaries
+    """
+    handle_dict, antihandle_dict = extract_handle_dicts(design['handle_array'], design['slat_array'])
+    handle_keys = list(handle_dict.keys())
+    antihandle_keys = list(antihandle_dict.keys())
+    slat_length = design['slat_length']
+
+    # groups/partial areas cover a fixed fraction of the design's slats
+    slat_groups = {'group_1': handle_keys[:len(handle_keys) // 4] + antihandle_keys[:len(antihandle_keys) // 4]}
+    partial_areas = {'partial_1': {'handles': {key: [i < slat_length // 2 for i in range(slat_length)] for key in handle_keys[:len(handle_keys) // 4]},
+                                   'antihandles': {key: [i < slat_length // 2 for i in range(slat_length)] for key in antihandle_keys[:len(antihandle_keys) // 4]}}}
+
+    option_values = OrderedDict([('report_worst_slat_combinations', [True, False]),
+                                 ('per_layer_check', [True, False]),
+                                 ('specific_slat_groups', [None, slat_groups]),
+                                 ('request_substitute_risk_score', [True, False]),
+                                 ('partial_area_score', [False, partial_areas]),
+                                 ('memory_budget', [None, 64])])
+
+    return [dict(zip(option_values.keys(), values)) for values in itertools.product(*option_values.values())]
+
+
+def describe_options(options):
+    """
+    Converts a set of options into a short, readable label (groups and partial areas are only marked as enabled).
+    :param options: Option dictionary
+    :return: String label
+    """
+    labels = []
+    for key, value in options.items():
+        if isinstance(value, dict):
+            value = 'on'
+        labels.append(f'{key}={value}')
+    return ', '.join(labels)
+
+
+def time_function(function, repeats=3):
+    """
+    Times a function and measures its peak (traced) memory usage.  The memory is measured in a separate run,
+    as memory tracing slows down execution.
+    :param function: Function (with no arguments) to benchmark
+    :param repeats: Number of timing repeats
+    :return: Dictionary with the best and mean run times (s), the peak memory (MB) and evaluations per second
+    """
+    function()  # warm-up run
+    run_times = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        function()
+        run_times.append(time.perf_counter() - start_time)
+
+    tracemalloc.start()
+    function()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'best_time': min(run_times),
+            'mean_time': float(np.mean(run_times)),
+            'peak_memory_mb': peak_memory / 1024 ** 2,
+            'evaluations_per_second': 1 / float(np.mean(run_times))}
+
+
+def check_self_comparison_pairs(result, num_slats, pairs_evaluated):
+    """
+    Checks that a self-comparison only evaluated (roughly) the upper triangle of slat pairs, and adds the pair counts
+    to its benchmark result.  Only the diagonal blocks are allowed to evaluate pairs outside of the upper triangle.
+    :param result: Benchmark result dictionary of the self-comparison
+    :param num_slats: Number of slats compared
+    :param pairs_evaluated: Number of slat pairs evaluated by the self-comparison
+    :return: N/A
+    """
+    upper_triangle_pairs = num_slats * (num_slats - 1) // 2
+    result['pairs_evaluated'] = pairs_evaluated
+    result['upper_triangle_pairs'] = upper_triangle_pairs
+    if pairs_evaluated > upper_triangle_pairs + num_slats * max_self_block_size:
+        raise ValueError(f'The self-comparison of {num_slats} slats evaluated {pairs_evaluated} pairs, '
+                         f'but only the {upper_triangle_pairs} pairs of the upper triangle should be required.')
+
+
+def get_benchmark_metadata():
+    """
+    Gathers details on the code version and system on which benchmarks are being run.
+    :return: Dictionary of metadata
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {'commit': commit or None,
+            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'python_version': platform.python_version(),
+            'numpy_version': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()}
+
+
+def run_hamming_benchmarks(output_file=None, repeats=3, designs=None, full_option_grid=True):
+    """
+    Benchmarks the hamming kernels over the benchmark corpus.  The following are covered:
+    - handle extraction (extract_handle_dicts and SlatIndex)
+    - oneshot_hamming_compute (for every registered backend)
+    - precise_hamming_compute (for all handle/antihandle combinations)
+    - multirule_oneshot_hamming (for every option combination, or just the default options)
+    :param output_file: JSON file to which the benchmark report should be written (optional)
+    :param repeats: Number of timing repeats for each benchmark
+    :param designs: Names of the corpus designs to benchmark (all if not specified)
+    :param full_option_grid: Set to false to only benchmark multirule_oneshot_hamming with its default options
+    :return: Benchmark report (dictionary with metadata and a list of results)
+    """
+    corpus = generate_benchmark_corpus()
+    if designs is not None:
+        corpus = OrderedDict((name, corpus[name]) for name in designs)
+
+    results = []
+
+    def record(benchmark, design_name, options, function):
+        result = {'benchmark': benchmark, 'design': design_name, 'options': options, 'repeats': repeats}
+        result.update(time_function(function, repeats))
+        results.append(result)
+        print(f'{benchmark} | {design_name} | {options} | {result["mean_time"]:.4f}s | {result["peak_memory_mb"]:.1f}MB')
+
+    for design_name, design in corpus.items():
+        slat_array = design['slat_array']
+        handle_array = design['handle_array']
+        slat_length = design['slat_length']
+
+        uint_slat_array = slat_array.astype(np.uint16)
+        slat_index = SlatIndex(slat_array)
+        record('extract_handle_dicts', design_name, '', lambda: extract_handle_dicts(handle_array, uint_slat_array))
+        record('SlatIndex.extract', design_name, '', lambda: slat_index.extract(handle_array))
+
+        handle_dict, antihandle_dict = extract_handle_dicts(handle_array, uint_slat_array)
+        for backend in hamming_backends:
+            try:
+                oneshot_hamming_compute(handle_dict, antihandle_dict, slat_length, backend)
+            except (ValueError, ImportError):  # backend not compatible with this design
+                continue
+            record('oneshot_hamming_compute', design_name, f'backend={backend}',
+                   lambda: oneshot_hamming_compute(handle_dict, antihandle_dict, slat_length, backend))
+
+        valid_product_indices = [True] * (len(handle_dict) * len(antihandle_dict))
+        record('precise_hamming_compute', design_name, '',
+               lambda: precise_hamming_compute(handle_dict, antihandle_dict, valid_product_indices, slat_length))
+
+        for slat_type, slat_dict in [('handles', handle_dict), ('antihandles', antihandle_dict)]:
+            record('self_hamming_compute', design_name, slat_type, lambda: self_hamming_compute(slat_dict, slat_length))
+            check_self_comparison_pairs(results[-1], len(slat_dict), self_hamming_compute(slat_dict, slat_length)['pairs_evaluated'])
+
+        option_grid = generate_option_grid(design) if full_option_grid else [{}]
+        for options in option_grid:
+            record('multirule_oneshot_hamming', design_name, describe_options(options),
+                   lambda: multirule_oneshot_hamming(slat_array, handle_array, slat_length=slat_length, **options))
+
+    report = {'metadata': get_benchmark_metadata(), 'results': results}
+
+    if output_file is not None:
+        with open(output_file, 'w') as f:
+            json.dump(report, f, indent=4)
+
+    return report
+
+
+def compare_benchmark_reports(baseline_file, new_file):
+    """
+    Compares two benchmark reports (e.g. generated on two different commits).
+    :param baseline_file: JSON benchmark report to use as the baseline
+    :param new_file: JSON benchmark report to compare against the baseline
+    :return: Dataframe with the mean time and peak memory of each benchmark in both reports, along with the speedup
+    """
+    reports = []
+    for report_file in [baseline_file, new_file]:
+        with open(report_file, 'r') as f:
+            reports.append(pd.DataFrame(json.load(f)['results']).set_index(['benchmark', 'design', 'options']))
+
+    comparison = reports[0][['mean_time', 'peak_memory_mb']].join(reports[1][['mean_time', 'peak_memory_mb']],
+                                                                  lsuffix='_baseline', rsuffix='_new', how='inner')
+    comparison['speedup'] = comparison['mean_time_baseline'] / comparison['mean_time_new']
+    return comparison
+
+
+if __name__ == '__main__':
+    run_hamming_benchmarks(sys.argv[1] if len(sys.argv) > 1 else 'hamming_benchmarks.json')
@@ -1,6 +1,47 @@
+import os
+import json
+import time
+import math
+import importlib
 import numpy as np
+import threading
+import multiprocessing
 from itertools import product
 from collections import defaultdict, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from numpy.lib.stride_tricks import sliding_window_view
+
+from crisscross.helper_functions import get_user_cache_directory
+
+# torch is only imported when its backend is first used, as importing it is slow (and it might not be required at all)
+torch_available = importlib.util.find_spec("torch") is not None
+
+# upper limit on the size of the square slat blocks of self-comparisons (refer to compute_self_block_size)
+max_self_block_size = 8
+
+# thread pools are kept alive and re-used between calls (one per thread count)
+_thread_pools = {}
+_thread_pool_lock = threading.Lock()
+
+# timers and counters that can be recorded for each stage of the hamming pipeline (refer to record_stage_metric)
+hamming_stage_metric_names = ['Extraction Time', 'Shift Construction Time', 'Comparison Time', 'Reduction Time',
+                              'Hall of Shame Time', 'Slat Combinations Compared']
+
+
+def record_stage_metric(stage_metrics, name, start_time=None, count=None):
+    """
+    Adds the time elapsed since start_time (or a count) to a stage of the hamming pipeline.  Nothing is recorded if
+    stage_metrics is None, so that the stages can always be marked at a negligible cost.
+    :param stage_metrics: Dictionary of stage timers/counters (or None if stage metrics are not being recorded)
+    :param name: Name of the timer/counter (refer to hamming_stage_metric_names)
+    :param start_time: Time (from time.perf_counter) at which the stage started, if recording a time
+    :param count: Amount to add to the counter, if recording a count
+    :return: The current time (to be used as the start time of the next stage)
+    """
+    current_time = time.perf_counter()
+    if stage_metrics is not None:
+        stage_metrics[name] = stage_metrics.get(name, 0) + (current_time - start_time if count is None else count)
+    return current_time
 
 def extract_handle_dicts(handle_array, slat_array, list_indices_only=False):
     """
@@ -62,62 +103,1002 @@ def extract_handle_dicts(handle_array, slat_array, list_indices_only=False):
         return handle_dict, antihandle_dict
 
 
-def oneshot_hamming_compute(handle_dict, antihandle_dict, slat_length):
+class SlatIndex:
+    """
+    Precomputed index of the handle/antihandle positions of every slat in a design.  Since the slat array does not change
+    when a design's handles are being evolved, all handles of a candidate handle array can then be extracted
+    with a single gather operation instead of searching for every slat in the slat array.
+    """
+
+    def __init__(self, slat_array):
+        """
+        :param slat_array: Array of XxYxZ dimensions containing the positions of all slats in the design
+        (all slats must have the same number of positions)
+        """
+        slat_array = np.array(slat_array, dtype=np.uint16)
+        num_layers = slat_array.shape[2]
+        handle_layers = max(num_layers - 1, 1)
+
+        self.handle_keys = []
+        self.antihandle_keys = []
+        handle_indices = []
+        antihandle_indices = []
+
+        # slats are ordered by layer and ID, with the same alternating handle/antihandle assumption as extract_handle_dicts
+        for layer_position in range(num_layers):
+            handles_available = True
+            antihandles_available = True
+            if layer_position == 0:
+                handles_available = True
+                antihandles_available = False
+            if layer_position == num_layers - 1:
+                handles_available = False
+                antihandles_available = True
+
+            # a stable sort groups together the positions of each slat, while keeping them in the same order as a boolean mask
+            layer_ids = slat_array[..., layer_position].ravel()
+            sorted_positions = np.argsort(layer_ids, kind='stable')
+            slat_ids, slat_starts, slat_counts = np.unique(layer_ids[sorted_positions], return_index=True, return_counts=True)
+
+            for slat, start, count in zip(slat_ids, slat_starts, slat_counts):
+                if slat == 0:
+                    continue
+                # converts the (x, y) positions into flat indices of the XxYxZ-1 handle array
+                positions = sorted_positions[start:start + count] * handle_layers
+                if handles_available:
+                    self.handle_keys.append((layer_position + 1, slat))
+                    handle_indices.append(positions + layer_position)
+                if antihandles_available:
+                    self.antihandle_keys.append((layer_position + 1, slat))
+                    antihandle_indices.append(positions + layer_position - 1)
+
+        if len(set(len(indices) for indices in handle_indices + antihandle_indices)) > 1:
+            raise ValueError('All slats in the design need to have the same number of positions to be indexed.')
+
+        self.handle_indices = np.array(handle_indices, dtype=np.intp)
+        self.antihandle_indices = np.array(antihandle_indices, dtype=np.intp)
+        self.handle_layers = np.array([layer for layer, _ in self.handle_keys], dtype=np.int64)
+        self.antihandle_layers = np.array([layer for layer, _ in self.antihandle_keys], dtype=np.int64)
+
+    def group_indices(self, slat_group):
+        """
+        Finds the positions of a group of slats in the handle and antihandle orderings.
+        :param slat_group: List of tuples containing the layer and slat ID of the slats in the group
+        :return: Index arrays of the group's handle slats and antihandle slats
+        """
+        slat_group = set(slat_group)
+        return (np.array([i for i, key in enumerate(self.handle_keys) if key in slat_group], dtype=np.intp),
+                np.array([i for i, key in enumerate(self.antihandle_keys) if key in slat_group], dtype=np.intp))
+
+    def extract(self, handle_array, handle_out=None, antihandle_out=None):
+        """
+        Extracts the handles and antihandles of all slats in the design from a handle array.
+        :param handle_array: Array of XxYxZ-1 dimensions containing the IDs of all the handles in the design
+        :param handle_out: Optional pre-allocated uint16 array of shape (num_handle_slats, slat_length) to fill with the handles
+        :param antihandle_out: Optional pre-allocated uint16 array of shape (num_antihandle_slats, slat_length) to fill with the antihandles
+        :return: Arrays of handles and antihandles (one row per slat, in the same order as handle_keys and antihandle_keys)
+        """
+        flat_handles = np.asarray(handle_array, dtype=np.uint16).reshape(-1)
+        return (np.take(flat_handles, self.handle_indices, out=handle_out),
+                np.take(flat_handles, self.antihandle_indices, out=antihandle_out))
+
+    def extract_dicts(self, handle_array):
+        """
+        Extracts handles in the same format as extract_handle_dicts.
+        :param handle_array: Array of XxYxZ-1 dimensions containing the IDs of all the handles in the design
+        :return: Two dictionaries containing the handle sequences for each slat - one for handles and one for antihandles
+        """
+        handles, antihandles = self.extract(handle_array)
+        return OrderedDict(zip(self.handle_keys, handles)), OrderedDict(zip(self.antihandle_keys, antihandles))
+
+
+def generate_shifted_handles(handles, slat_length):
+    """
+    Generates every possible shift and reversed shift of a stack of handle sequences.
+    The goal is to simulate every possible physical interaction between two slats.
+    The shifts are windows into a single zero-padded buffer (per slat) containing the normal and reversed sequences,
+    and so are returned as a read-only strided view rather than as shifted copies.  Shift i of the first 2 * slat_length - 1
+    is the normal sequence offset by i - (slat_length - 1) positions (the unshifted sequence is at index slat_length - 1),
+    and the remaining shifts are the same for the reversed sequence.
+    :param handles: Array of handles with shape (num_slats, slat_length)
+    :param slat_length: The length of a single slat (must be an integer)
+    :return: Array of shape (num_slats, 4 * slat_length - 2, slat_length) containing all shifted handle sequences
+    """
+    # buffer layout: padding, handles, padding, reversed handles, padding (the central padding is shared by both directions)
+    # The total number of windows will be 4 * the slat length - 2 (two states are repeated)
+    padded_handles = np.zeros((handles.shape[0], 5 * slat_length - 3), dtype=np.uint16)
+    padded_handles[:, slat_length - 1:2 * slat_length - 1] = handles
+    padded_handles[:, 3 * slat_length - 2:4 * slat_length - 2] = handles[:, ::-1]
+
+    return sliding_window_view(padded_handles, slat_length, axis=1)
+
+
+def precise_shift_order(slat_length):
+    """
+    Provides the shifts (indices into generate_shifted_handles) used by precise_hamming_compute, which considers 4 rotations
+    per slat position and so includes each unshifted sequence twice:
+    1. X vs Y, rotation to the left
+    2. X vs Y, rotation to the right
+    3. X vs Y, rotation to the left, reversed X
+    4. X vs Y, rotation to the right, reversed X
+    :param slat_length: The length of a single slat (must be an integer)
+    :return: Array of 4 * slat_length shift indices
+    """
+    rotations = np.arange(slat_length)
+    return np.concatenate([slat_length - 1 + rotations, slat_length - 1 - rotations,
+                           3 * slat_length - 2 + rotations, 3 * slat_length - 2 - rotations])
+
+
+def stack_handles(handles):
+    """
+    Converts a dictionary of slat handles into a single array (arrays are returned unchanged).
+    :param handles: Dictionary of handles i.e. {slat_id: slat_handle_array} or an array with shape (num_slats, slat_length)
+    :return: Array of handles with shape (num_slats, slat_length)
+    """
+    if isinstance(handles, dict):
+        return np.array(list(handles.values()))
+    return np.asarray(handles)
+
+
+def oneshot_hamming_compute(handle_dict, antihandle_dict, slat_length, backend='numpy', stage_metrics=None):
     """
     Given a dictionary of slat handles and antihandles, this function computes the hamming distance between all possible combinations.
     This is the fastest implementation available, making full use of Numpy's efficient vector computation.
-    :param handle_dict: Dictionary of handles i.e. {slat_id: slat_handle_array}
-    :param antihandle_dict: Dictionary of antihandles i.e. {slat_id: slat_antihandle_array}
+    :param handle_dict: Dictionary of handles i.e. {slat_id: slat_handle_array} (or a stacked array of handles)
+    :param antihandle_dict: Dictionary of antihandles i.e. {slat_id: slat_antihandle_array} (or a stacked array of antihandles)
     :param slat_length: The length of a single slat (must be an integer)
+    :param backend: The matching engine to use - 'numpy' compares handle IDs elementwise, 'bitset' packs each slat
+    into bit-planes (faster for large designs, slats of up to 64 handles only) and 'gemm' computes matches via
+    BLAS matrix multiplications of one-hot encoded handles.  All give identical results.  Other registered backends
+    can also be used, or 'auto' to select the fastest backend (refer to autotune_hamming_backend).
+    :param stage_metrics: Dictionary in which to accumulate the shift construction and comparison times (optional)
     :return: Array of results for each possible combination (a single integer per combination)
     """
 
-    handles = np.array(list(handle_dict.values()))
+    handles = stack_handles(handle_dict)
+    num_handles = handles.shape[0]
+    backend = resolve_hamming_backend(backend, num_handles, len(antihandle_dict), slat_length)
+
+    # Generate every possible shift and reversed shift of the handle sequences (as a view, no copies are made)
+    stage_start = time.perf_counter()
+    shifted_handles = generate_shifted_handles(handles, slat_length)
+    stage_start = record_stage_metric(stage_metrics, 'Shift Construction Time', stage_start)
+
+    # The antihandles do not need to be shifted - with the numpy backend, the shifted handles and antihandles are broadcast
+    # against each other such that each and every handle-slat is matched with each and every antihandle-slat in one go
+    hamming_results = hamming_block_compute(shifted_handles, stack_handles(antihandle_dict), slat_length, backend)
+    record_stage_metric(stage_metrics, 'Comparison Time', stage_start)
+
+    return hamming_results
+
+
+def popcount(words):
+    """
+    Counts the number of set bits in each element of an unsigned integer array.
+    :param words: Array of unsigned integers
+    :return: Array of the same shape containing the number of set bits in each element
+    """
+    if hasattr(np, 'bitwise_count'):  # only available in numpy 2.0+
+        return np.bitwise_count(words)
+    byte_counts = np.unpackbits(np.arange(256, dtype=np.uint8)[:, np.newaxis], axis=1).sum(axis=1).astype(np.uint8)
+    word_bytes = np.ascontiguousarray(words).view(np.uint8).reshape(words.shape + (words.dtype.itemsize,))
+    return byte_counts[word_bytes].sum(axis=-1, dtype=np.uint8)
+
+
+def encode_handle_bitplanes(handles, num_planes):
+    """
+    Encodes handle sequences into bit-planes, where each handle sequence is packed into a single machine word per plane.
+    Plane b contains the bit b of the handle ID at each slat position, and the final plane marks positions with a non-zero handle.
+    :param handles: Array of handles with shape (..., slat_length) - slat_length can be at most 64
+    :param num_planes: Number of bits required to represent the largest handle ID
+    :return: Array of shape (..., num_planes + 1) containing the packed bit-planes
+    """
+    slat_length = handles.shape[-1]
+    if slat_length > 64:
+        raise ValueError('The bitset hamming backend only supports slats with up to 64 handles.')
+    word_type = np.uint32 if slat_length <= 32 else np.uint64
+    position_bits = np.left_shift(np.ones(1, dtype=word_type), np.arange(slat_length, dtype=word_type))
+
+    planes = np.zeros(handles.shape[:-1] + (num_planes + 1,), dtype=word_type)
+    for plane in range(num_planes):
+        # each position has a unique bit, so a sum is equivalent to a bitwise OR
+        planes[..., plane] = np.sum(((handles >> plane) & 1).astype(word_type) * position_bits, axis=-1, dtype=word_type)
+    planes[..., num_planes] = np.sum((handles != 0).astype(word_type) * position_bits, axis=-1, dtype=word_type)
+    return planes
+
+
+def encode_shifted_handle_bitplanes(handles, num_planes):
+    """
+    Encodes every shift of a stack of handle sequences into bit-planes, giving the same result as encoding the output of
+    generate_shifted_handles with encode_handle_bitplanes.  Only the unshifted and reversed sequences are encoded,
+    and each shift is then simply a bit shift of the packed words (which is far quicker than encoding every shift).
+    :param handles: Array of handles with shape (num_slats, slat_length) - slat_length can be at most 64
+    :param num_planes: Number of bits required to represent the largest handle ID
+    :return: Array of shape (num_slats, 4 * slat_length - 2, num_planes + 1) containing the packed bit-planes
+    """
+    slat_length = handles.shape[-1]
+    shifted_planes = []
+    for sequences in [handles, handles[:, ::-1]]:
+        planes = encode_handle_bitplanes(sequences, num_planes)[:, np.newaxis, :]
+        word_type = planes.dtype.type
+        # window position l of shift d contains handle position l + d (shifts are in the same order as generate_shifted_handles)
+        offsets = np.arange(-(slat_length - 1), slat_length)
+        right_shifts = np.maximum(offsets, 0).astype(word_type)[:, np.newaxis]
+        left_shifts = np.maximum(-offsets, 0).astype(word_type)[:, np.newaxis]
+        shifted_planes.append(((planes >> right_shifts) << left_shifts) & word_type((1 << slat_length) - 1))
+    return np.concatenate(shifted_planes, axis=1)
+
+
+def bitset_hamming_block_compute(shifted_handles, antihandles, slat_length):
+    """
+    Computes the same results as hamming_block_compute, but with the handle sequences packed into bit-planes.
+    Matches for each shift are then computed with a few XOR/AND operations and a popcount per handle/antihandle pair,
+    rather than an element-by-element comparison along the slat.
+    :param shifted_handles: Array of shifted handles, as generated by generate_shifted_handles
+    :param antihandles: Array of antihandles with shape (num_antihandles, slat_length)
+    :param slat_length: The length of a single slat (must be an integer and at most 64)
+    :return: Array of shape (num_handles, num_antihandles, 4 * slat_length - 2) containing the hamming distances
+    """
+    num_planes = max(int(np.max(shifted_handles, initial=0)), int(np.max(antihandles, initial=0)), 1).bit_length()
+    handle_planes = encode_handle_bitplanes(shifted_handles, num_planes)[:, np.newaxis, :, :]
+    antihandle_planes = encode_handle_bitplanes(antihandles, num_planes)[np.newaxis, :, np.newaxis, :]
+
+    # positions where any bit of the handle and antihandle IDs differ are not matches
+    mismatches = handle_planes[..., 0] ^ antihandle_planes[..., 0]
+    for plane in range(1, num_planes):
+        mismatches |= handle_planes[..., plane] ^ antihandle_planes[..., plane]
+
+    matches = handle_planes[..., num_planes] & ~mismatches  # empty handle positions can never match
+    return slat_length - popcount(matches).astype(np.int64)
+
+
+def gemm_hamming_block_compute(handles, antihandles, slat_length):
+    """
+    Computes the same results as hamming_block_compute, but formulates the matching as a series of matrix multiplications.
+    For a fixed shift, the number of matches between all handle/antihandle pairs is the product of the one-hot encoded
+    (shifted) handles with the one-hot encoded antihandles.  Each shift is a window into a zero-padded one-hot
+    array, which means no shifted copies are created and the heavy lifting is passed to the (multithreaded) BLAS library.
+    :param handles: Array of (unshifted) handles with shape (num_handles, slat_length)
+    :param antihandles: Array of antihandles with shape (num_antihandles, slat_length)
+    :param slat_length: The length of a single slat (must be an integer)
+    :return: Array of shape (num_handles, num_antihandles, 4 * slat_length - 2) containing the hamming distances
+    """
     num_handles = handles.shape[0]
-    flippedhandles = handles[:, ::-1]
-
-    # Generate every possible shift and reversed shift of the handle sequences -
-    # the goal is to simulate every possible physical interaction between two slats
-    # The total length will be 4 * the slat length - 2 (two states are repeated)
-    # The operations are repeated for all handles in the input array
-    shifted_handles = np.zeros((handles.shape[0], (4 * slat_length)-2, slat_length), dtype=np.uint16)
-
-    for i in range(slat_length):
-        # Normal shifts
-        shifted_handles[:, i, i:] = handles[:, :slat_length - i]
-        if i != 0: # skip the first one as it repeats the normal slat
-            shifted_handles[:, slat_length + i - 1, :slat_length - i] = handles[:, i:] # index has a -1 due to the skipped first combination
-        # Reversed shifts
-        shifted_handles[:, 2 * slat_length + i - 1, i:] = flippedhandles[:, :slat_length - i]
-        if i != 0:  # skip the first one as it repeats the normal reversed slat
-            shifted_handles[:, 3 * slat_length + i - 2, :slat_length - i] = flippedhandles[:, i:] # index has a -2 due to the two skipped combinations at this point
-
-    # The antihandles should simply be tiled to generate the same number of sequences as the handles, shifts are not needed
-    antihandles = np.array(list(antihandle_dict.values()))
     num_antihandles = antihandles.shape[0]
-    tiled_antihandles = np.tile(antihandles[:, np.newaxis, :], (1, (4 * slat_length) - 2, 1))
+    num_shifts = 4 * slat_length - 2
+    match_counts = np.zeros((num_shifts, num_handles, num_antihandles), dtype=np.float32)
+
+    # only handle IDs present in both sets can produce a match, which keeps the one-hot encoding as small as possible
+    shared_ids = np.intersect1d(handles[handles != 0], antihandles[antihandles != 0])
+
+    if len(shared_ids) > 0:
+        id_lookup = np.full(max(int(handles.max()), int(antihandles.max())) + 1, -1, dtype=np.int64)
+        id_lookup[shared_ids] = np.arange(len(shared_ids))
+
+        def one_hot(sequences):
+            encoded = np.zeros(sequences.shape + (len(shared_ids),), dtype=np.float32)
+            positions = np.nonzero(id_lookup[sequences] >= 0)
+            encoded[positions + (id_lookup[sequences][positions],)] = 1
+            return encoded
+
+        encoded_antihandles = one_hot(antihandles).reshape(num_antihandles, -1).T
+
+        # same buffer layout as generate_shifted_handles, so that the shifts are in the same order
+        padded_handles = np.zeros((num_handles, 5 * slat_length - 3, len(shared_ids)), dtype=np.float32)
+        padded_handles[:, slat_length - 1:2 * slat_length - 1] = one_hot(handles)
+        padded_handles[:, 3 * slat_length - 2:4 * slat_length - 2] = one_hot(handles[:, ::-1])
+        for start in range(num_shifts):
+            # windows into the padded array can be flattened without copying, and so are passed directly to BLAS
+            shifted_window = padded_handles[:, start:start + slat_length].reshape(num_handles, -1)
+            np.matmul(shifted_window, encoded_antihandles, out=match_counts[start])
+
+    return slat_length - np.ascontiguousarray(match_counts.transpose(1, 2, 0)).astype(np.int64)
+
+
+def numpy_hamming_block_compute(shifted_handles, antihandles, slat_length):
+    """
+    Computes the hamming distance between a block of pre-shifted handles and a block of antihandles via elementwise comparisons.
+    Broadcasting replaces the tiling used in oneshot_hamming_compute, but the comparison is identical.
+    :param shifted_handles: Array of shifted handles, as generated by generate_shifted_handles
+    :param antihandles: Array of antihandles with shape (num_antihandles, slat_length)
+    :param slat_length: The length of a single slat (must be an integer)
+    :return: Array of shape (num_handles, num_antihandles, 4 * slat_length - 2) containing the hamming distances
+    """
+    block_handles = shifted_handles[:, np.newaxis, :, :]
+    block_matches = (block_handles == antihandles[np.newaxis, :, np.newaxis, :]) & (block_handles != 0)
+    return slat_length - np.count_nonzero(block_matches, axis=3)
+
+
+def gemm_shifted_hamming_block_compute(shifted_handles, antihandles, slat_length):
+    """
+    Adapts gemm_hamming_block_compute to pre-shifted handles (the unshifted handles are always at index slat_length - 1 of the shifted array).
+    :param shifted_handles: Array of shifted handles, as generated by generate_shifted_handles
+    :param antihandles: Array of antihandles with shape (num_antihandles, slat_length)
+    :param slat_length: The length of a single slat (must be an integer)
+    :return: Array of shape (num_handles, num_antihandles, 4 * slat_length - 2) containing the hamming distances
+    """
+    return gemm_hamming_block_compute(shifted_handles[:, slat_length - 1, :], antihandles, slat_length)
+
+
+def torch_hamming_block_compute(shifted_handles, antihandles, slat_length):
+    """
+    Computes the same elementwise comparison as numpy_hamming_block_compute using PyTorch, on the GPU if one is available.
+    :param shifted_handles: Array of shifted handles, as generated by generate_shifted_handles
+    :param antihandles: Array of antihandles with shape (num_antihandles, slat_length)
+    :param slat_length: The length of a single slat (must be an integer)
+    :return: Array of shape (num_handles, num_antihandles, 4 * slat_length - 2) containing the hamming distances
+    """
+    if not torch_available:
+        raise ImportError('PyTorch is not available on this system.')
+    import torch
+
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    # torch has limited support for unsigned integers, so the IDs are converted to int32 first
+    block_handles = torch.from_numpy(shifted_handles.astype(np.int32)).to(device)[:, None, :, :]
+    block_antihandles = torch.from_numpy(antihandles.astype(np.int32)).to(device)[None, :, None, :]
+    block_matches = (block_handles == block_antihandles) & (block_handles != 0)
+    return slat_length - torch.count_nonzero(block_matches, dim=3).cpu().numpy().astype(np.int64)
+
+
+# all available hamming matching engines - each takes the shifted handles, antihandles and slat length, and returns the
+# (num_handles, num_antihandles, 4 * slat_length - 2) hamming distance array.  Additional engines can be added via register_hamming_backend.
+hamming_backends = OrderedDict()
+
+
+def register_hamming_backend(name, block_function):
+    """
+    Registers a hamming matching engine, making it available as a backend option to all hamming functions.
+    :param name: Name of the backend
+    :param block_function: Function with the same inputs and outputs as numpy_hamming_block_compute
+    :return: N/A
+    """
+    if name == 'auto':
+        raise ValueError('The backend name "auto" is reserved for automatic backend selection.')
+    hamming_backends[name] = block_function
+
+
+register_hamming_backend('numpy', numpy_hamming_block_compute)
+register_hamming_backend('bitset', bitset_hamming_block_compute)
+register_hamming_backend('gemm', gemm_shifted_hamming_block_compute)
+if torch_available:
+    register_hamming_backend('torch', torch_hamming_block_compute)
+
+
+def hamming_block_compute(shifted_handles, antihandles, slat_length, backend='numpy'):
+    """
+    Computes the hamming distance between a block of pre-shifted handles and a block of antihandles.
+    :param shifted_handles: Array of shifted handles, as generated by generate_shifted_handles
+    :param antihandles: Array of antihandles with shape (num_antihandles, slat_length)
+    :param slat_length: The length of a single slat (must be an integer)
+    :param backend: The matching engine to use - 'numpy' (elementwise comparisons), 'bitset' (packed bit-planes),
+    'gemm' (matrix multiplications of one-hot encodings), 'torch' (if PyTorch is installed) or any other registered backend
+    :return: Array of shape (num_handles, num_antihandles, 4 * slat_length - 2) containing the hamming distances
+    """
+    if backend not in hamming_backends:
+        raise ValueError(f'Hamming backend {backend} not recognized.')
+    return hamming_backends[backend](shifted_handles, antihandles, slat_length)
+
+
+# backends selected by the autotuner are retained here for the lifetime of the process (and in the tuning file)
+_tuned_backends = {}
+
+
+def autotune_hamming_backend(num_handles, num_antihandles, slat_length, tuning_file=None, repeats=3, memory_budget=128,
+                             excluded_backends=()):
+    """
+    Selects the fastest registered hamming backend for a design shape, by timing each backend on a representative
+    block of random handles.  The timings are persisted in a tuning file, so each design shape only needs to be tuned once.
+    Backends that cannot be used for the shape (e.g. bitset for slats longer than 64 handles) are skipped.
+    :param num_handles: Number of handle slats in the design
+    :param num_antihandles: Number of antihandle slats in the design
+    :param slat_length: The length of a single slat (must be an integer)
+    :param tuning_file: JSON file in which tuning results are stored (defaults to hamming_backend_tuning.json
+    within the per-user cache directory - refer to get_user_cache_directory)
+    :param repeats: Number of timing repeats for each backend (the fastest repeat is used)
+    :param memory_budget: Memory limit (in MB) for the block used for timing
+    :param excluded_backends: Backends that should not be selected (these are also never run for timing)
+    :return: Name of the fastest backend
+    """
+    shape_key = f'{num_handles}x{num_antihandles}x{slat_length}'
+    if tuning_file is None:
+        tuning_file = os.path.join(get_user_cache_directory(), 'hamming_backend_tuning.json')
+    candidate_backends = [name for name in hamming_backends if name not in excluded_backends]
+
+    def select_fastest(timings):
+        valid_timings = {name: timings[name] for name in candidate_backends if timings.get(name) is not None}
+        return min(valid_timings, key=valid_timings.get) if len(valid_timings) > 0 else 'numpy'
+
+    timings = dict(_tuned_backends.get(shape_key, {}).get('timings', {}))
+    if any(name not in timings for name in candidate_backends) and os.path.isfile(tuning_file):
+        try:
+            with open(tuning_file, 'r') as f:
+                timings.update(json.load(f).get(shape_key, {}).get('timings', {}))
+        except (json.JSONDecodeError, OSError):  # a corrupted file is simply re-tuned
+            pass
+
+    # only the backends that have not been timed for this shape yet are timed here
+    untimed_backends = [name for name in candidate_backends if name not in timings]
+    if len(untimed_backends) == 0:
+        _tuned_backends[shape_key] = {'backend': select_fastest(timings), 'timings': timings}
+        return _tuned_backends[shape_key]['backend']
+
+    # a single block of the size used when streaming the design is timed for each backend
+    handle_block, antihandle_block = compute_chunk_sizes(max(num_handles, 1), max(num_antihandles, 1), slat_length, memory_budget)
+    random_generator = np.random.default_rng(0)
+    handles = random_generator.integers(1, 33, size=(handle_block, slat_length), dtype=np.uint16)
+    antihandles = random_generator.integers(1, 33, size=(antihandle_block, slat_length), dtype=np.uint16)
+    shifted_handles = generate_shifted_handles(handles, slat_length)
+
+    for name in untimed_backends:
+        block_function = hamming_backends[name]
+        try:
+            block_function(shifted_handles, antihandles, slat_length)  # warm-up (e.g. library loading)
+            best_time = np.inf
+            for _ in range(repeats):
+                start_time = time.perf_counter()
+                block_function(shifted_handles, antihandles, slat_length)
+                best_time = min(best_time, time.perf_counter() - start_time)
+            timings[name] = best_time
+        except (ValueError, ImportError, RuntimeError, MemoryError):
+            timings[name] = None
+
+    _tuned_backends[shape_key] = {'backend': select_fastest(timings), 'timings': timings}
+
+    # the file is re-read just before writing, to avoid removing results written by other processes in the meantime
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(tuning_file)), exist_ok=True)
+        tuning_results = {}
+        if os.path.isfile(tuning_file):
+            with open(tuning_file, 'r') as f:
+                tuning_results = json.load(f)
+        tuning_results[shape_key] = _tuned_backends[shape_key]
+        temporary_file = f'{tuning_file}.{os.getpid()}.tmp'
+        with open(temporary_file, 'w') as f:
+            json.dump(tuning_results, f, indent=4)
+        os.replace(temporary_file, tuning_file)
+    except (json.JSONDecodeError, OSError):
+        pass  # the selection is still retained for this process
+
+    return _tuned_backends[shape_key]['backend']
+
+
+def resolve_hamming_backend(backend, num_handles, num_antihandles, slat_length, excluded_backends=()):
+    """
+    Converts the 'auto' backend option into the fastest available backend for a design shape (other options are unchanged).
+    :param backend: Backend option
+    :param num_handles: Number of handle slats in the design
+    :param num_antihandles: Number of antihandle slats in the design
+    :param slat_length: The length of a single slat (must be an integer)
+    :param excluded_backends: Backends that should not be selected automatically
+    :return: Name of the backend to use
+    """
+    if backend == 'auto':
+        return autotune_hamming_backend(num_handles, num_antihandles, slat_length, excluded_backends=excluded_backends)
+    return backend
+
+
+def compute_chunk_sizes(num_handles, num_antihandles, slat_length, memory_budget):
+    """
+    Computes the size of the handle/antihandle blocks that can be evaluated at once within the provided memory budget.
+    Full antihandle rows are preferred, and the antihandles are only split when a single handle cannot be
+    compared against all antihandles within the budget.
+    :param num_handles: Total number of handle slats
+    :param num_antihandles: Total number of antihandle slats
+    :param slat_length: The length of a single slat (must be an integer)
+    :param memory_budget: Maximum memory (in MB) to use for the intermediate comparison arrays
+    :return: The number of handles and the number of antihandles to include in each block
+    """
+    # every handle/antihandle pair requires three boolean arrays (equality, non-zero and combined matches)
+    # for all shifts, along with the final integer hamming counts
+    bytes_per_pair = ((4 * slat_length) - 2) * (3 * slat_length + 8)
+    pairs_in_budget = max(1, int(memory_budget * 1024 ** 2) // bytes_per_pair)
+
+    if pairs_in_budget >= num_antihandles:
+        return max(1, min(num_handles, pairs_in_budget // num_antihandles)), num_antihandles
+    else:
+        return 1, pairs_in_budget
+
+
+def compute_thread_chunk_sizes(num_handles, num_antihandles, slat_length, memory_budget, num_threads):
+    """
+    Computes block sizes for a threaded hamming computation.  The memory budget is shared between all threads, and
+    the handles are split into several blocks per thread to keep all threads busy.  NumPy releases the GIL within
+    the comparisons of each block, so the blocks run in parallel.
+    :param num_handles: Total number of handle slats
+    :param num_antihandles: Total number of antihandle slats
+    :param slat_length: The length of a single slat (must be an integer)
+    :param memory_budget: Maximum memory (in MB) to use for the intermediate comparison arrays (over all threads)
+    :param num_threads: Number of threads that will process blocks at the same time
+    :return: The number of handles and the number of antihandles to include in each block
+    """
+    handle_block, antihandle_block = compute_chunk_sizes(num_handles, num_antihandles, slat_length, memory_budget / max(1, num_threads))
+    if num_threads > 1:
+        handle_block = min(handle_block, max(1, -(-num_handles // (4 * num_threads))))
+    return handle_block, antihandle_block
+
+
+def get_thread_pool(num_threads):
+    """
+    Returns a persistent pool of threads for hamming computations, creating it if not already available.
+    :param num_threads: Number of threads in the pool
+    :return: ThreadPoolExecutor
+    """
+    with _thread_pool_lock:
+        if num_threads not in _thread_pools:
+            _thread_pools[num_threads] = ThreadPoolExecutor(max_workers=num_threads, thread_name_prefix='hamming')
+        return _thread_pools[num_threads]
+
+
+def map_hamming_blocks(block_function, blocks, num_threads=1):
+    """
+    Applies a function to a list of blocks, either sequentially or over a pool of threads.
+    :param block_function: Function to apply to each block
+    :param blocks: List of blocks
+    :param num_threads: Number of threads to use (1 to run sequentially)
+    :return: Iterator of results, in the same order as the blocks
+    """
+    if num_threads > 1 and len(blocks) > 1:
+        return get_thread_pool(num_threads).map(block_function, blocks)
+    return map(block_function, blocks)
+
+
+def threaded_hamming_compute(handles, antihandles, slat_length, num_threads, memory_budget=512, backend='numpy'):
+    """
+    Computes the same full hamming results array as oneshot_hamming_compute, but splits the handles into blocks
+    that are computed in parallel over a pool of threads within the current process.
+    :param handles: Dictionary of handles i.e. {slat_id: slat_handle_array} (or a stacked array of handles)
+    :param antihandles: Dictionary of antihandles i.e. {slat_id: slat_antihandle_array} (or a stacked array of antihandles)
+    :param slat_length: The length of a single slat (must be an integer)
+    :param num_threads: Number of threads to use
+    :param memory_budget: Maximum memory (in MB) to use for the intermediate comparison arrays (excluding the results array)
+    :param backend: The matching engine to use (refer to hamming_block_compute)
+    :return: Array of shape (num_handles, num_antihandles, 4 * slat_length - 2) containing the hamming distances
+    """
+    handles = stack_handles(handles)
+    antihandles = stack_handles(antihandles)
+    num_handles = handles.shape[0]
+    backend = resolve_hamming_backend(backend, num_handles, antihandles.shape[0], slat_length)
 
-    # tiles all the handle and antihandles into a large 4D array containing:
-        # all combinations of handles with antihandles (dimensions 1 and 2)
-        # all possible shifts of the handles (dimension 3)
-    # This final tiling ensures that each and every handle-slat is matched with each and every antihandle-slat
-    combinatorial_matrix_handles = np.tile(shifted_handles[:, np.newaxis, :, :], (1, num_antihandles, 1, 1))
-    combinatorial_matrix_antihandles = np.tile(tiled_antihandles[np.newaxis, :, :, :], (num_handles, 1, 1, 1))
+    hamming_results = np.empty((num_handles, antihandles.shape[0], (4 * slat_length) - 2), dtype=np.int64)
+    handle_block, _ = compute_thread_chunk_sizes(num_handles, antihandles.shape[0], slat_length, memory_budget, num_threads)
 
-    # After all the matches are built up, the hamming distance can be computed for all combinations in one go
-    all_matches = (combinatorial_matrix_handles == combinatorial_matrix_antihandles) & (combinatorial_matrix_handles != 0)
-    hamming_results = slat_length - np.count_nonzero(all_matches, axis=3) # hamming distance maximum is always the length of the slats
+    def compute_block(h_start):
+        h_end = min(h_start + handle_block, num_handles)
+        hamming_results[h_start:h_end] = hamming_block_compute(generate_shifted_handles(handles[h_start:h_end], slat_length),
+                                                               antihandles, slat_length, backend)
 
+    for _ in map_hamming_blocks(compute_block, list(range(0, num_handles, handle_block)), num_threads):
+        pass
     return hamming_results
 
 
+def partition_score_from_histogram(histogram, slat_length):
+    """
+    Computes the physics-informed partition score directly from a histogram of hamming distances.
+    :param histogram: Array containing the number of handle/antihandle combinations at each hamming distance (index = distance)
+    :param slat_length: The length of a single slat (must be an integer)
+    :return: The physics-informed partition score (identical in definition to the one computed in multirule_oneshot_hamming)
+    """
+    distances = np.arange(len(histogram))
+    return -np.sum(histogram * np.exp(-10 * (distances - slat_length))) / np.sum(histogram)
+
+
+def chunked_hamming_compute(handle_dict, antihandle_dict, slat_length, memory_budget=512,
+                            report_worst_slat_combinations=True, keep_pair_minimums=False,
+                            offender_cutoff=None, backend='numpy', num_threads=1):
+    """
+    Computes the same hamming distances as oneshot_hamming_compute, but streams over blocks of handles/antihandles
+    to keep peak memory usage within the provided budget.  The full results array is never built - instead, the minimum,
+    the histogram of all hamming distances and the worst combinations are reduced on the fly.
+    :param handle_dict: Dictionary of handles i.e. {slat_id: slat_handle_array} (or a stacked array of handles)
+    :param antihandle_dict: Dictionary of antihandles i.e. {slat_id: slat_antihandle_array} (or a stacked array of antihandles)
+    :param slat_length: The length of a single slat (must be an integer)
+    :param memory_budget: Maximum memory (in MB) to use for the intermediate comparison arrays
+    :param report_worst_slat_combinations: Set to true to collect the indices of all combinations matching the minimum hamming distance
+    :param keep_pair_minimums: Set to true to also return the minimum hamming distance (over all shifts) of each handle/antihandle pair
+    :param offender_cutoff: If provided, all combinations with a hamming distance below this value are also collected
+    :param backend: The matching engine to use (refer to hamming_block_compute)
+    :param num_threads: Number of threads over which to spread the blocks (the memory budget is shared between them)
+    :return: Dictionary containing the minimum hamming distance ('minimum'), the histogram of all distances ('histogram'),
+    an array of (handle index, antihandle index, shift index) rows for the worst combinations ('worst_combinations'),
+    if requested, the per-pair minimum matrix ('pair_minimums') and an array of (handle index, antihandle index,
+    shift index, hamming distance) rows for all combinations below the offender cutoff ('offenders').
+    """
+
+    handles = stack_handles(handle_dict)
+    antihandles = stack_handles(antihandle_dict)
+    num_handles = handles.shape[0]
+    num_antihandles = antihandles.shape[0]
+    backend = resolve_hamming_backend(backend, num_handles, num_antihandles, slat_length)
+
+    handle_block, antihandle_block = compute_thread_chunk_sizes(num_handles, num_antihandles, slat_length, memory_budget, num_threads)
+
+    global_min = slat_length
+    histogram = np.zeros(slat_length + 1, dtype=np.int64)
+    worst_blocks = []
+    offender_blocks = []
+    pair_minimums = np.zeros((num_handles, num_antihandles), dtype=np.int64) if keep_pair_minimums else None
+
+    def reduce_block(block):
+        h_start, h_end, ah_start, ah_end = block
+        block_results = hamming_block_compute(generate_shifted_handles(handles[h_start:h_end], slat_length),
+                                              antihandles[ah_start:ah_end], slat_length, backend)
+
+        block_histogram = np.bincount(block_results.ravel(), minlength=slat_length + 1)
+
+        if keep_pair_minimums:  # blocks never overlap, so can be written directly
+            pair_minimums[h_start:h_end, ah_start:ah_end] = np.min(block_results, axis=2)
+
+        block_min = np.min(block_results)
+        worst_indices = None
+        if report_worst_slat_combinations:
+            worst_indices = np.argwhere(block_results == block_min)
+            worst_indices[:, 0] += h_start
+            worst_indices[:, 1] += ah_start
+
+        offender_indices = None
+        if offender_cutoff is not None:
+            offender_indices = np.argwhere(block_results < offender_cutoff)
+            offender_indices[:, 0] += h_start
+            offender_indices[:, 1] += ah_start
+            offender_indices = np.column_stack((offender_indices, block_results[block_results < offender_cutoff]))
+
+        return block_min, block_histogram, worst_indices, offender_indices
+
+    blocks = [(h_start, min(h_start + handle_block, num_handles), ah_start, min(ah_start + antihandle_block, num_antihandles))
+              for h_start in range(0, num_handles, handle_block) for ah_start in range(0, num_antihandles, antihandle_block)]
+
+    for block_min, block_histogram, worst_indices, offender_indices in map_hamming_blocks(reduce_block, blocks, num_threads):
+        histogram += block_histogram
+        if block_min < global_min:
+            global_min = block_min
+            worst_blocks = []
+        if report_worst_slat_combinations and block_min == global_min:
+            worst_blocks.append(worst_indices)
+        if offender_cutoff is not None:
+            offender_blocks.append(offender_indices)
+
+    if report_worst_slat_combinations and len(worst_blocks) > 0:
+        worst_combinations = np.concatenate(worst_blocks)
+        # restores the same (handle, antihandle, shift) ordering that np.where would produce on the full array
+        worst_combinations = worst_combinations[np.lexsort(worst_combinations.T[::-1])]
+    else:
+        worst_combinations = np.zeros((0, 3), dtype=np.int64)
+
+    offenders = None
+    if offender_cutoff is not None:
+        offenders = np.concatenate(offender_blocks) if len(offender_blocks) > 0 else np.zeros((0, 4), dtype=np.int64)
+        offenders = offenders[np.lexsort(offenders[:, :3].T[::-1])]
+
+    return {'minimum': np.int64(global_min),
+            'histogram': histogram,
+            'worst_combinations': worst_combinations,
+            'pair_minimums': pair_minimums,
+            'offenders': offenders}
+
+
+def compute_self_block_size(slat_length, memory_budget, num_threads=1):
+    """
+    Computes the size of the square slat blocks used for self-comparisons.  Blocks are kept small (even if more fit
+    within the memory budget), as only the diagonal blocks compute pairs outside of the upper triangle.
+    :param slat_length: The length of a single slat (must be an integer)
+    :param memory_budget: Maximum memory (in MB) to use for the intermediate comparison arrays (over all threads)
+    :param num_threads: Number of threads that will process blocks at the same time
+    :return: Number of slats in each block (for both rows and columns)
+    """
+    bytes_per_pair = ((4 * slat_length) - 2) * (3 * slat_length + 8)  # refer to compute_chunk_sizes
+    pairs_in_budget = max(1, int(memory_budget * 1024 ** 2 / max(1, num_threads)) // bytes_per_pair)
+    return max(1, min(max_self_block_size, math.isqrt(pairs_in_budget)))
+
+
+def self_hamming_compute(slat_handles, slat_length, memory_budget=512, keep_pair_minimums=False, backend='numpy', num_threads=1,
+                         row_range=None):
+    """
+    Computes the minimum hamming distance between all pairs of different slats within a single set of handles (or antihandles).
+    The best alignment of slat A against slat B (over all shifts and reversals) is also the best alignment of B against A,
+    so only the upper triangle of slat pairs is computed.  The slats are tiled into square row/column blocks, and only
+    the blocks on or above the diagonal are evaluated (the lower half of each diagonal block is then masked out).
+    :param slat_handles: Dictionary of handles i.e. {slat_id: slat_handle_array} (or a stacked array of handles)
+    :param slat_length: The length of a single slat (must be an integer)
+    :param memory_budget: Maximum memory (in MB) to use for the intermediate comparison arrays
+    :param keep_pair_minimums: Set to true to also return the full (symmetric) matrix of per-pair minimums,
+    with the diagonal set to the slat length
+    :param backend: The matching engine to use (refer to hamming_block_compute)
+    :param num_threads: Number of threads over which to spread the blocks (the memory budget is shared between them)
+    :param row_range: Set to a (start, end) tuple to only compute the pairs of the slats within this range of rows
+    (i.e. their pairs with all later slats).  Used to split the computation between several workers.
+    :return: Dictionary containing the minimum hamming distance between different slats ('minimum'),
+    the number of slat pairs evaluated ('pairs_evaluated', including the masked pairs of the diagonal blocks)
+    and, if requested, the per-pair minimum matrix ('pair_minimums').
+    """
+    slat_handles = stack_handles(slat_handles)
+    num_slats = slat_handles.shape[0]
+    backend = resolve_hamming_backend(backend, num_slats, num_slats, slat_length)
+
+    global_min = slat_length  # if there is only one slat, nothing can be substituted
+    pair_minimums = np.full((num_slats, num_slats), slat_length, dtype=np.int64) if keep_pair_minimums else None
+
+    block_size = compute_self_block_size(slat_length, memory_budget, num_threads)
+
+    first_row, last_row = (0, num_slats) if row_range is None else row_range
+    last_row = min(last_row, num_slats - 1)  # the last slat has no later slats to be compared with
+
+    # column blocks start at the row block itself, so the first block of each row is the only diagonal block
+    blocks = [(row_start, min(row_start + block_size, last_row), column_start, min(column_start + block_size, num_slats))
+              for row_start in range(first_row, last_row, block_size)
+              for column_start in range(row_start, num_slats, block_size)]
+    shifted_handles = {}  # the shifted handles of each row block are shared by all of its column blocks
+
+    def reduce_block(block):
+        row_start, row_end, column_start, column_end = block
+        if row_start not in shifted_handles:
+            shifted_handles[row_start] = generate_shifted_handles(slat_handles[row_start:row_end], slat_length)
+        block_minimums = np.min(hamming_block_compute(shifted_handles[row_start], slat_handles[column_start:column_end],
+                                                      slat_length, backend), axis=2)
+        if column_start < row_end:  # diagonal block
+            upper_triangle = np.arange(row_start, row_end)[:, np.newaxis] < np.arange(column_start, column_end)[np.newaxis, :]
+            block_minimums[~upper_triangle] = slat_length
+
+        if keep_pair_minimums:  # blocks never overlap, so can be written directly
+            pair_minimums[row_start:row_end, column_start:column_end] = block_minimums
+        return np.min(block_minimums)
+
+    for block_min in map_hamming_blocks(reduce_block, blocks, num_threads):
+        global_min = min(global_min, block_min)
+
+    if keep_pair_minimums:
+        pair_minimums = np.minimum(pair_minimums, pair_minimums.T)
+
+    return {'minimum': np.int64(global_min),
+            'pairs_evaluated': sum((row_end - row_start) * (column_end - column_start)
+                                   for row_start, row_end, column_start, column_end in blocks),
+            'pair_minimums': pair_minimums}
+
+
+def _hamming_tile_compute(handles, antihandles, h_start, slat_length, memory_budget, report_worst_slat_combinations,
+                          keep_pair_minimums, offender_cutoff, backend):
+    """
+    Computes the streamed hamming summary of a single tile of handles against all antihandles, within a worker process.
+    All handle indices are converted back to the indices of the full design.  Refer to chunked_hamming_compute for details.
+    :return: Hamming summary of the tile (refer to chunked_hamming_compute)
+    """
+    tile_summary = chunked_hamming_compute(handles, antihandles, slat_length, memory_budget,
+                                           report_worst_slat_combinations=report_worst_slat_combinations,
+                                           keep_pair_minimums=keep_pair_minimums, offender_cutoff=offender_cutoff,
+                                           backend=backend)
+    tile_summary['worst_combinations'][:, 0] += h_start
+    if offender_cutoff is not None:
+        tile_summary['offenders'][:, 0] += h_start
+    return tile_summary
+
+
+def _self_hamming_tile_compute(slat_handles, row_start, row_end, slat_length, memory_budget, backend):
+    """
+    Computes the minimum self-comparison hamming distance of a range of rows, within a worker process.
+    Refer to self_hamming_compute for details.
+    :return: Minimum hamming distance between the slats in the row range and all later slats
+    """
+    return self_hamming_compute(slat_handles, slat_length, memory_budget, backend=backend, row_range=(row_start, row_end))['minimum']
+
+
+def parallel_hamming_compute(handle_dict, antihandle_dict, slat_length, workers, memory_budget=512,
+                             report_worst_slat_combinations=True, keep_pair_minimums=False, offender_cutoff=None,
+                             backend='numpy', worker_pool=None):
+    """
+    Computes the same hamming summary as chunked_hamming_compute, but splits the handles into tiles that are
+    computed over a pool of worker processes.  The partial minimums, histograms and worst combinations of each tile
+    are then merged together.  Intended for single, very large designs where there is nothing else to parallelize.
+    :param handle_dict: Dictionary of handles i.e. {slat_id: slat_handle_array} (or a stacked array of handles)
+    :param antihandle_dict: Dictionary of antihandles i.e. {slat_id: slat_antihandle_array} (or a stacked array of antihandles)
+    :param slat_length: The length of a single slat (must be an integer)
+    :param workers: Number of worker processes to use
+    :param memory_budget: Maximum memory (in MB) to use for the intermediate comparison arrays (shared between all workers)
+    :param report_worst_slat_combinations: Set to true to collect the indices of all combinations matching the minimum hamming distance
+    :param keep_pair_minimums: Set to true to also return the minimum hamming distance (over all shifts) of each handle/antihandle pair
+    :param offender_cutoff: If provided, all combinations with a hamming distance below this value are also collected
+    :param backend: The matching engine to use (refer to hamming_block_compute)
+    :param worker_pool: Pool of (at least the requested number of) worker processes to use.  If not provided,
+    a pool is started up (and shut down) within this function.
+    :return: Dictionary in the same format as chunked_hamming_compute
+    """
+    handles = stack_handles(handle_dict)
+    antihandles = stack_handles(antihandle_dict)
+    num_handles = handles.shape[0]
+    backend = resolve_hamming_backend(backend, num_handles, antihandles.shape[0], slat_length)  # tuned once for all workers
+
+    # several tiles per worker help balance the load
+    tile_size = max(1, -(-num_handles // (4 * workers)))
+    tiles = [(handles[h_start:h_start + tile_size], antihandles, h_start, slat_length, memory_budget / workers,
+              report_worst_slat_combinations, keep_pair_minimums, offender_cutoff, backend)
+             for h_start in range(0, num_handles, tile_size)]
+
+    if worker_pool is None:
+        with multiprocessing.Pool(processes=workers) as pool:
+            tile_summaries = pool.starmap(_hamming_tile_compute, tiles)
+    else:
+        tile_summaries = worker_pool.starmap(_hamming_tile_compute, tiles)
+
+    global_min = min([tile_summary['minimum'] for tile_summary in tile_summaries], default=slat_length)
+    histogram = np.sum([tile_summary['histogram'] for tile_summary in tile_summaries], axis=0, dtype=np.int64) \
+        if len(tile_summaries) > 0 else np.zeros(slat_length + 1, dtype=np.int64)
+
+    worst_combinations = np.zeros((0, 3), dtype=np.int64)
+    if report_worst_slat_combinations and len(tile_summaries) > 0:
+        # tiles are in handle order, so the worst combinations are already in the same order as np.where would produce
+        worst_combinations = np.concatenate([tile_summary['worst_combinations'] for tile_summary in tile_summaries
+                                             if tile_summary['minimum'] == global_min])
+
+    pair_minimums = None
+    if keep_pair_minimums:
+        pair_minimums = np.concatenate([tile_summary['pair_minimums'] for tile_summary in tile_summaries]) \
+            if len(tile_summaries) > 0 else np.zeros((0, antihandles.shape[0]), dtype=np.int64)
+
+    offenders = None
+    if offender_cutoff is not None:
+        offenders = np.concatenate([tile_summary['offenders'] for tile_summary in tile_summaries] + [np.zeros((0, 4), dtype=np.int64)])
+
+    return {'minimum': np.int64(global_min),
+            'histogram': histogram,
+            'worst_combinations': worst_combinations,
+            'pair_minimums': pair_minimums,
+            'offenders': offenders}
+
+
+def parallel_self_hamming_compute(slat_handles, slat_length, workers, memory_budget=512, backend='numpy', worker_pool=None):
+    """
+    Computes the same minimum as self_hamming_compute, but splits the slat rows over a pool of worker processes.
+    Since only the upper triangle of pairs is computed, earlier rows contain more pairs and are split more finely.
+    :param slat_handles: Dictionary of handles i.e. {slat_id: slat_handle_array} (or a stacked array of handles)
+    :param slat_length: The length of a single slat (must be an integer)
+    :param workers: Number of worker processes to use
+    :param memory_budget: Maximum memory (in MB) to use for the intermediate comparison arrays (shared between all workers)
+    :param backend: The matching engine to use (refer to hamming_block_compute)
+    :param worker_pool: Pool of (at least the requested number of) worker processes to use.  If not provided,
+    a pool is started up (and shut down) within this function.
+    :return: Minimum hamming distance between different slats
+    """
+    slat_handles = stack_handles(slat_handles)
+    num_slats = slat_handles.shape[0]
+    if num_slats < 2:
+        return np.int64(slat_length)
+    backend = resolve_hamming_backend(backend, num_slats, num_slats, slat_length)
+
+    # row boundaries are chosen such that each tile contains a similar number of pairs
+    num_tiles = min(num_slats - 1, 4 * workers)
+    pairs_before_row = np.cumsum(np.arange(num_slats - 1, -1, -1))
+    row_bounds = np.unique(np.searchsorted(pairs_before_row, np.linspace(0, pairs_before_row[-1], num_tiles + 1)[1:-1]))
+    row_bounds = [0] + [int(bound) for bound in row_bounds if 0 < bound < num_slats - 1] + [num_slats - 1]
+
+    tiles = [(slat_handles, row_start, row_end, slat_length, memory_budget / workers, backend)
+             for row_start, row_end in zip(row_bounds[:-1], row_bounds[1:])]
+    if worker_pool is None:
+        with multiprocessing.Pool(processes=workers) as pool:
+            tile_minimums = pool.starmap(_self_hamming_tile_compute, tiles)
+    else:
+        tile_minimums = worker_pool.starmap(_self_hamming_tile_compute, tiles)
+
+    return np.int64(min(tile_minimums))
+
+
+def compile_partial_area_groups(partial_area_score, handle_keys, antihandle_keys, slat_length):
+    """
+    Converts partial area groups (refer to multirule_oneshot_hamming) into boolean position masks and pair index arrays,
+    so that all groups can be evaluated together in a single batched pass.  The masked slats of all groups are stacked
+    (one row per slat in each group), and each group's handle/antihandle combinations are listed as pairs of stacked rows.
+    :param partial_area_score: Dictionary of partial area groups i.e. {group_name: {'handles': {...}, 'antihandles': {...}}}
+    :param handle_keys: Ordered list of the (layer, slat ID) keys of all handle slats in the design
+    :param antihandle_keys: Ordered list of the (layer, slat ID) keys of all antihandle slats in the design
+    :param slat_length: The length of a single slat (must be an integer)
+    :return: Dictionary containing the group names, the slat indices and inclusion masks of the stacked rows,
+    the stacked rows of each pair and the offset of each group's first pair
+    """
+    handle_positions = {key: i for i, key in enumerate(handle_keys)}
+    antihandle_positions = {key: i for i, key in enumerate(antihandle_keys)}
+
+    handle_indices, handle_masks, antihandle_indices, antihandle_masks = [], [], [], []
+    pair_handles, pair_antihandles, group_offsets = [], [], []
+    handle_rows, antihandle_rows, pair_count = 0, 0, 0
+    for group_key, slat_dict in partial_area_score.items():
+        num_handles, num_antihandles = len(slat_dict['handles']), len(slat_dict['antihandles'])
+        if num_handles == 0 or num_antihandles == 0:
+            raise ValueError(f'Partial area group {group_key} needs to contain at least one handle and one antihandle slat.')
+        handle_indices.extend(handle_positions[key] for key in slat_dict['handles'])
+        handle_masks.extend(slat_dict['handles'].values())
+        antihandle_indices.extend(antihandle_positions[key] for key in slat_dict['antihandles'])
+        antihandle_masks.extend(slat_dict['antihandles'].values())
+
+        # all handle/antihandle combinations of the group (in the same order as product(handles, antihandles))
+        group_pairs = np.indices((num_handles, num_antihandles)).reshape(2, -1)
+        pair_handles.append(group_pairs[0] + handle_rows)
+        pair_antihandles.append(group_pairs[1] + antihandle_rows)
+        group_offsets.append(pair_count)
+        handle_rows += num_handles
+        antihandle_rows += num_antihandles
+        pair_count += num_handles * num_antihandles
+
+    return {'group_keys': list(partial_area_score.keys()),
+            'handle_indices': np.array(handle_indices, dtype=np.intp),
+            'handle_masks': np.array(handle_masks, dtype=bool).reshape(handle_rows, slat_length),
+            'antihandle_indices': np.array(antihandle_indices, dtype=np.intp),
+            'antihandle_masks': np.array(antihandle_masks, dtype=bool).reshape(antihandle_rows, slat_length),
+            'pair_handles': np.concatenate(pair_handles) if pair_count > 0 else np.zeros(0, dtype=np.intp),
+            'pair_antihandles': np.concatenate(pair_antihandles) if pair_count > 0 else np.zeros(0, dtype=np.intp),
+            'group_offsets': np.array(group_offsets, dtype=np.intp)}
+
+
+def partial_area_hamming_compute(handles, antihandles, compiled_groups, slat_length, memory_budget=None, num_threads=1):
+    """
+    Computes the minimum hamming distance within each partial area group, only considering the handles included in the group.
+    All groups are evaluated in one batched pass over their listed handle/antihandle pairs (refer to
+    compile_partial_area_groups), so only the combinations within each group are computed.
+    :param handles: Array of all handles in the design, with shape (num_handle_slats, slat_length)
+    :param antihandles: Array of all antihandles in the design, with shape (num_antihandle_slats, slat_length)
+    :param compiled_groups: Partial area groups compiled by compile_partial_area_groups
+    :param slat_length: The length of a single slat (must be an integer)
+    :param memory_budget: Maximum memory (in MB) to use for the intermediate comparison arrays (defaults to 512)
+    :param num_threads: Number of threads over which to split the pairs
+    :return: Dictionary of the minimum hamming distance of each group
+    """
+    if len(compiled_groups['group_keys']) == 0:
+        return {}
+
+    # handles in non-considered regions are set to 0, which means they can never match
+    group_handles = np.where(compiled_groups['handle_masks'], handles[compiled_groups['handle_indices']], 0).astype(np.uint16)
+    group_antihandles = np.where(compiled_groups['antihandle_masks'], antihandles[compiled_groups['antihandle_indices']], 0).astype(np.uint16)
+    pair_handles = compiled_groups['pair_handles']
+    pair_antihandles = compiled_groups['pair_antihandles']
+
+    # the sequences are packed into bit-planes where possible (refer to bitset_hamming_block_compute), which keeps
+    # the per-pair copies of the shifted handles small - otherwise, each pair is compared element by element
+    use_bitsets = slat_length <= 64
+    if use_bitsets:
+        num_planes = max(int(np.max(group_handles, initial=0)), int(np.max(group_antihandles, initial=0)), 1).bit_length()
+        shifted_handles = encode_shifted_handle_bitplanes(group_handles, num_planes)
+        group_antihandles = encode_handle_bitplanes(group_antihandles, num_planes)
+        bytes_per_pair = ((4 * slat_length) - 2) * (num_planes + 4) * shifted_handles.itemsize
+    else:
+        shifted_handles = generate_shifted_handles(group_handles, slat_length)
+        bytes_per_pair = ((4 * slat_length) - 2) * (4 * slat_length + 8)
+    memory_budget = 512 if memory_budget is None else memory_budget  # shared between all threads
+    pair_block = max(1, int(memory_budget * 1024 ** 2 / max(1, num_threads)) // bytes_per_pair)
+    pair_minimums = np.empty(len(pair_handles), dtype=np.int64)
+
+    def compute_block(p_start):
+        p_end = min(p_start + pair_block, len(pair_handles))
+        block_handles = shifted_handles[pair_handles[p_start:p_end]]
+        block_antihandles = group_antihandles[pair_antihandles[p_start:p_end], np.newaxis]
+        if use_bitsets:
+            mismatches = block_handles[..., 0] ^ block_antihandles[..., 0]
+            for plane in range(1, num_planes):
+                mismatches |= block_handles[..., plane] ^ block_antihandles[..., plane]
+            match_counts = popcount(block_handles[..., num_planes] & ~mismatches)
+        else:
+            match_counts = np.count_nonzero((block_handles == block_antihandles) & (block_handles != 0), axis=2)
+        pair_minimums[p_start:p_end] = slat_length - np.max(match_counts, axis=1)
+
+    for _ in map_hamming_blocks(compute_block, list(range(0, len(pair_handles), pair_block)), num_threads):
+        pass
+
+    group_minimums = np.minimum.reduceat(pair_minimums, compiled_groups['group_offsets'])
+    return {group_key: np.int64(group_minimum) for group_key, group_minimum in zip(compiled_groups['group_keys'], group_minimums)}
+
+
 def multirule_oneshot_hamming(slat_array, handle_array,
                               report_worst_slat_combinations=True,
                               per_layer_check=False,
                               specific_slat_groups=None,
                               request_substitute_risk_score=False,
                               slat_length=32,
-                              partial_area_score=False):
+                              partial_area_score=False,
+                              memory_budget=None,
+                              backend='numpy',
+                              slat_index=None,
+                              hamming_report_cutoff=None,
+                              cache=None,
+                              num_threads=1,
+                              workers=1,
+                              stage_metrics=None,
+                              worker_pool=None):
     """
     Given a slat and handle array, this function computes the hamming distance of all handle/antihandle combinations provided.
     Scores for individual components, such as specific slat groups, can also be requested.
@@ -144,107 +1125,370 @@ def multirule_oneshot_hamming(slat_array, handle_array,
     :param partial_area_score: Calculates Hamming distance and substitution risk among a subset of provided slats when only considering a subset of the handles.
     Provide a dictionary with key as a group name and the values as dictionarys with keys "handle" and "antihandle".
     The corresponding values are dictionaries, where the key is a tuple like so (slat layer, slat ID) and the value is a list of TRUE/FALSE depending on whether that position's handle is included.
+    :param memory_budget: Set to a memory limit (in MB) to stream the computation over blocks of slats instead of building
+    the full 4D comparison array in one go.  Peak memory will then no longer grow with the number of handle/antihandle
+    combinations.  The partition score is reduced via a histogram in this mode, so can differ from the default mode
+    in the last floating point digits.
+    :param backend: The hamming matching engine to use - 'numpy' (elementwise comparisons), 'bitset' (packed bit-planes,
+    for slats of up to 64 handles), 'gemm' (BLAS matrix multiplications), 'torch' (if PyTorch is installed) or any other
+    registered backend.  All backends give identical results.  Set to 'auto' to use the fastest backend for the
+    design's shape (refer to autotune_hamming_backend).
+    :param slat_index: Pre-computed SlatIndex of the slat array.  When scoring many handle arrays for the same design,
+    building this once and passing it in skips the slat search on every call.
+    :param hamming_report_cutoff: Set to a hamming distance to also report the distribution of the design's hamming distances.
+    The number of handle/antihandle combinations at each distance is returned under 'Hamming distribution' (index = distance),
+    and every combination below the cutoff is listed under 'Offending combinations' as a tuple of
+    (handle slat, antihandle slat, shift index, hamming distance), with shift indices as in generate_shifted_handles.
+    This report is always streamed over blocks (within a 512MB budget if no memory budget is set), so the partition
+    score is then reduced via a histogram as in the memory budget mode.
+    :param cache: A HammingResultCache in which to look up (and store) the results of this handle array.
+    :param num_threads: Set to more than 1 to split the computation over a pool of threads within this process.
+    This avoids the start-up and data transfer costs of worker processes, as NumPy releases the GIL while comparing handles.
+    :param workers: Set to more than 1 to split the handle/antihandle combinations into tiles that are computed over a pool
+    of worker processes (for single, very large designs).  Results are then merged in the same way as when a memory
+    budget is set, with the memory budget (512MB if not set) shared between all workers.
+    :param stage_metrics: Dictionary in which to accumulate the time spent on each stage of the computation, along with
+    the number of slat combinations compared (refer to hamming_stage_metric_names).  Shifts are constructed block by block
+    when the computation is streamed or split, and are then included in the comparison time.
+    :param worker_pool: Pool of worker processes to use when workers is more than 1.  If not provided, a single pool
+    is started up for this call and shared by all of its parallel computations.
     :return: Dictionary of scores (or slat layer/handle IDS for the worst slat combinations)
      for each of the slat combinations requested from the design
     """
 
-    slat_array = np.array(slat_array, dtype=np.uint16) # converts to int to reduce memory usage
-    handle_array = np.array(handle_array, dtype=np.uint16)
+    # the backend, slat index, threads and workers do not affect the results, so are not part of the cache key
+    if cache is not None:
+        options = {'report_worst_slat_combinations': report_worst_slat_combinations, 'per_layer_check': per_layer_check,
+                   'specific_slat_groups': specific_slat_groups, 'request_substitute_risk_score': request_substitute_risk_score,
+                   'slat_length': slat_length, 'partial_area_score': partial_area_score, 'memory_budget': memory_budget,
+                   'hamming_report_cutoff': hamming_report_cutoff}
+        return cache.get_or_compute('multirule_oneshot_hamming', slat_array, handle_array, options,
+                                    lambda: multirule_oneshot_hamming(slat_array, handle_array, backend=backend,
+                                                                      slat_index=slat_index, num_threads=num_threads,
+                                                                      workers=workers, stage_metrics=stage_metrics,
+                                                                      worker_pool=worker_pool, **options))
+
+    if workers > 1 and worker_pool is None:  # the pool start-up cost is only paid once for all parallel computations
+        with multiprocessing.Pool(processes=workers) as worker_pool:
+            return multirule_oneshot_hamming(slat_array, handle_array, report_worst_slat_combinations, per_layer_check,
+                                             specific_slat_groups, request_substitute_risk_score, slat_length,
+                                             partial_area_score, memory_budget, backend, slat_index, hamming_report_cutoff,
+                                             None, num_threads, workers, stage_metrics, worker_pool)
+
+    stage_start = time.perf_counter()
+    if slat_index is None:
+        slat_index = SlatIndex(slat_array)
 
     # extract all slats and compute full hamming distance here
-    handle_dict, antihandle_dict = extract_handle_dicts(handle_array, slat_array)
+    handles, antihandles = slat_index.extract(handle_array)
+    stage_start = record_stage_metric(stage_metrics, 'Extraction Time', stage_start)
 
-    hamming_results = oneshot_hamming_compute(handle_dict, antihandle_dict, slat_length)
+    handle_ordered_list = slat_index.handle_keys
+    antihandle_ordered_list = slat_index.antihandle_keys
+    backend = resolve_hamming_backend(backend, len(handle_ordered_list), len(antihandle_ordered_list), slat_length)
+    record_stage_metric(stage_metrics, 'Slat Combinations Compared', count=len(handle_ordered_list) * len(antihandle_ordered_list))
+
+    # either the full results array is computed, or a summary of the results is streamed
+    # (distribution reports are always streamed, so that the full results array is never held alongside them)
+    hamming_results = None
+    hamming_summary = None
+    stream_results = memory_budget is not None or hamming_report_cutoff is not None
+    if workers > 1:
+        hamming_summary = parallel_hamming_compute(handles, antihandles, slat_length, workers,
+                                                   512 if memory_budget is None else memory_budget,
+                                                   report_worst_slat_combinations=report_worst_slat_combinations,
+                                                   keep_pair_minimums=bool(per_layer_check or specific_slat_groups),
+                                                   offender_cutoff=hamming_report_cutoff, backend=backend,
+                                                   worker_pool=worker_pool)
+    elif not stream_results and num_threads > 1:
+        hamming_results = threaded_hamming_compute(handles, antihandles, slat_length, num_threads, backend=backend)
+    elif not stream_results:
+        hamming_results = oneshot_hamming_compute(handles, antihandles, slat_length, backend, stage_metrics)
+    else:
+        hamming_summary = chunked_hamming_compute(handles, antihandles, slat_length, 512 if memory_budget is None else memory_budget,
+                                                  report_worst_slat_combinations=report_worst_slat_combinations,
+                                                  keep_pair_minimums=bool(per_layer_check or specific_slat_groups),
+                                                  offender_cutoff=hamming_report_cutoff, backend=backend,
+                                                  num_threads=num_threads)
+    if hamming_results is None or num_threads > 1:  # the oneshot computation records its own stages
+        stage_start = record_stage_metric(stage_metrics, 'Comparison Time', stage_start)
+    else:
+        stage_start = time.perf_counter()
 
     # calculate hamming distance in the case that we are only considering a partial area, which requires editing slat handles in non-considered regions to be "0"
     if partial_area_score:
-        hamming_results_partial = {}
-        for group_key, slat_dict in partial_area_score.items():
-            handle_dict_partial = OrderedDict()
-            antihandle_dict_partial = OrderedDict()
-            
-            for (slat_layer, slat_ID), full_slat_handles in handle_dict.items():
-                try:
-                    slat_inclusion = slat_dict["handles"][(slat_layer, slat_ID)]
-                    partial_slat_handles = np.array([x if y else 0 for x,y in zip(full_slat_handles, slat_inclusion)], dtype=np.uint16)
-                    handle_dict_partial[(slat_layer, slat_ID)] = partial_slat_handles
-                except KeyError: # Not included - leave in all slats but filter out at the end using indices
-                    handle_dict_partial[(slat_layer, slat_ID)] = full_slat_handles
-
-            for (slat_layer, slat_ID), full_slat_antihandles in antihandle_dict.items():
-                try:
-                    slat_inclusion = slat_dict["antihandles"][(slat_layer, slat_ID)]
-                    partial_slat_antihandles = np.array([x if y else 0 for x,y in zip(full_slat_antihandles, slat_inclusion)], dtype=np.uint16)
-                    antihandle_dict_partial[(slat_layer, slat_ID)] = partial_slat_antihandles
-                except KeyError: # Not included - leave in all slats but filter out at the end using indices
-                    antihandle_dict_partial[(slat_layer, slat_ID)] = full_slat_antihandles
-
-            hamming_results_partial[group_key] = oneshot_hamming_compute(handle_dict_partial, antihandle_dict_partial, slat_length)
+        hamming_results_partial = partial_area_hamming_compute(handles, antihandles,
+                                                               compile_partial_area_groups(partial_area_score, handle_ordered_list,
+                                                                                           antihandle_ordered_list, slat_length),
+                                                               slat_length, memory_budget, num_threads)
+        stage_start = record_stage_metric(stage_metrics, 'Comparison Time', stage_start)
 
     score_dict = {}
-    handle_ordered_list = list(handle_dict.keys())
-    antihandle_ordered_list = list(antihandle_dict.keys())
 
-    # The universal hamming score representing the worst case scenario
-    score_dict['Universal'] = np.min(hamming_results)
+    if hamming_summary is None:
+        # The universal hamming score representing the worst case scenario
+        score_dict['Universal'] = np.min(hamming_results)
 
-    # physics-based score motivated by the definition of the partition function in the dirks 2007 paper (original nupack paper)
-    score_dict['Physics-Informed Partition Score'] = -np.average(np.exp(-10 * (hamming_results - slat_length)))
+        # physics-based score motivated by the definition of the partition function in the dirks 2007 paper (original nupack paper).
+        # This is always computed from the histogram of all distances, so that the score is bitwise identical
+        # no matter how the results were computed (full, streamed, parallel or incremental)
+        score_dict['Physics-Informed Partition Score'] = partition_score_from_histogram(
+            np.bincount(hamming_results.ravel(), minlength=slat_length + 1), slat_length)
+    else:
+        score_dict['Universal'] = hamming_summary['minimum']
+        score_dict['Physics-Informed Partition Score'] = partition_score_from_histogram(hamming_summary['histogram'], slat_length)
 
     # If requested, the hamming distance for each layer and each specific slat group is calculated (these will always be better than or identical to the universal score)
     if per_layer_check or specific_slat_groups:
-        layer_hammings = defaultdict(list)
-        group_hammings = defaultdict(list)
-        for (handle_layer, handle_id), (antihandle_layer, antihandle_id) in product(handle_ordered_list, antihandle_ordered_list):
-            handle_matrix_index = handle_ordered_list.index((handle_layer, handle_id))
-            antihandle_matrix_index = antihandle_ordered_list.index((antihandle_layer, antihandle_id))
-
-            if per_layer_check and handle_layer == antihandle_layer - 1:
-                layer_hammings[handle_layer].append(min(hamming_results[handle_matrix_index, antihandle_matrix_index, :]))
-            if specific_slat_groups:
-                for group_key, group in specific_slat_groups.items():
-                    if (handle_layer, handle_id) in group and (antihandle_layer, antihandle_id) in group:
-                        group_hammings[group_key].append(min(hamming_results[handle_matrix_index, antihandle_matrix_index, :]))
-
-        if per_layer_check:
-            for layer, all_hammings in layer_hammings.items():
-                score_dict[f'Layer {layer}'] = np.min(all_hammings)
+        if hamming_summary is None:
+            pair_minimums = np.min(hamming_results, axis=2)
+        else:
+            pair_minimums = hamming_summary['pair_minimums']
+
+        if per_layer_check:  # each layer interface is made up of the handles of one layer and the antihandles of the next
+            for layer in np.unique(slat_index.handle_layers):
+                layer_minimums = pair_minimums[slat_index.handle_layers == layer][:, slat_index.antihandle_layers == layer + 1]
+                if layer_minimums.size > 0:
+                    score_dict[f'Layer {layer}'] = np.min(layer_minimums)
+
         if specific_slat_groups:
-            for group_key, all_hammings in group_hammings.items():
-                score_dict[group_key] = np.min(all_hammings)
+            group_minimums = []
+            for group_key, group in specific_slat_groups.items():
+                group_handles, group_antihandles = slat_index.group_indices(group)
+                if len(group_handles) > 0 and len(group_antihandles) > 0:
+                    # groups are reported in the order of their first handle/antihandle pair
+                    first_pair = group_handles[0] * len(antihandle_ordered_list) + group_antihandles[0]
+                    group_minimums.append((first_pair, group_key,
+                                           np.min(pair_minimums[np.ix_(group_handles, group_antihandles)])))
+            for _, group_key, group_minimum in sorted(group_minimums, key=lambda x: x[0]):
+                score_dict[group_key] = group_minimum
+    stage_start = record_stage_metric(stage_metrics, 'Reduction Time', stage_start)
 
     # generates lists of the worst handle/antihandle combinations - these will be used for mutations in the evolutionary algorithm
     if report_worst_slat_combinations:
-        min_hamming_indices = np.where((hamming_results == score_dict['Universal']))
+        if hamming_summary is None:
+            min_hamming_indices = np.where((hamming_results == score_dict['Universal']))
+        else:
+            min_hamming_indices = hamming_summary['worst_combinations'].T
         hallofshamehandles = [handle_ordered_list[i] for i in min_hamming_indices[0]]
         hallofshameantihandles = [antihandle_ordered_list[i] for i in min_hamming_indices[1]]
         score_dict['Worst combinations handle IDs'] = hallofshamehandles
         score_dict['Worst combinations antihandle IDs'] = hallofshameantihandles
+        stage_start = record_stage_metric(stage_metrics, 'Hall of Shame Time', stage_start)
+
+    # the full distribution of hamming distances, along with the specific combinations that are below the cutoff
+    if hamming_report_cutoff is not None:
+        score_dict['Hamming distribution'] = hamming_summary['histogram']
+        score_dict['Offending combinations'] = [(handle_ordered_list[h], antihandle_ordered_list[ah], shift, distance)
+                                                for h, ah, shift, distance in hamming_summary['offenders'].tolist()]
+        stage_start = record_stage_metric(stage_metrics, 'Reduction Time', stage_start)
 
     # this computes the risk that two slats are identical i.e. the risk that one slat could replace another in the wrong place if it has enough complementary handles
     # for now, no special index validation is provided for this feature.
     if request_substitute_risk_score:
-        duplicate_results = []
-        for combo_dict in [handle_dict, antihandle_dict]:
-            duplicate_results.append(oneshot_hamming_compute(combo_dict, combo_dict, slat_length))
-        global_min = np.inf
-        for sim_list in duplicate_results:
-            num_handles = sim_list.shape[0]
-            global_min = np.min([np.min(sim_list[np.eye(num_handles)==0,:]), global_min])  # ignores diagonal i.e. slat self-comparisons
+        if workers > 1:
+            global_min = min(parallel_self_hamming_compute(slat_handles, slat_length, workers,
+                                                           512 if memory_budget is None else memory_budget, backend,
+                                                           worker_pool)
+                             for slat_handles in [handles, antihandles])
+        else:
+            global_min = min(self_hamming_compute(slat_handles, slat_length, 512 if memory_budget is None else memory_budget,
+                                                  backend=backend, num_threads=num_threads)['minimum']
+                             for slat_handles in [handles, antihandles])  # slat self-comparisons are ignored
         score_dict['Substitute Risk'] = np.int64(global_min)
+        record_stage_metric(stage_metrics, 'Comparison Time', stage_start)
+        record_stage_metric(stage_metrics, 'Slat Combinations Compared',
+                            count=sum(len(keys) * (len(keys) - 1) // 2 for keys in [handle_ordered_list, antihandle_ordered_list]))
 
     # if a specific region was requested, filter for just the slats that were considered rather than all slats
     if partial_area_score:
-        handle_ordered_list_partial = list(handle_dict_partial.keys())
-        antihandle_ordered_list_partial = list(antihandle_dict_partial.keys())
-        for group_key, slat_dict in partial_area_score.items():
-            handle_matrix_indices = np.array([handle_ordered_list_partial.index((x,y)) for x,y in slat_dict["handles"].keys()], dtype=np.uint16)
-            antihandle_matrix_indices = np.array([antihandle_ordered_list_partial.index((x,y)) for x,y in slat_dict["antihandles"].keys()], dtype=np.uint16)
-            score_dict[group_key] = np.min([hamming_results_partial[group_key][hID, ahID, :] for hID, ahID in product(handle_matrix_indices, antihandle_matrix_indices)])
+        for group_key in partial_area_score.keys():
+            score_dict[group_key] = hamming_results_partial[group_key]
 
     return score_dict
 
 
+def summarize_pair_results(hamming_results):
+    """
+    Reduces per-pair hamming results (over all shifts) to the values required to re-score a design incrementally.
+    :param hamming_results: Array of hamming results i.e. (handles, antihandles, shifts)
+    :return: The minimum of each handle/antihandle pair, along with the number of shifts matching this minimum
+    """
+    pair_minimums = np.min(hamming_results, axis=2)
+    pair_minimum_counts = np.count_nonzero(hamming_results == pair_minimums[..., np.newaxis], axis=2).astype(np.uint16)
+    return pair_minimums, pair_minimum_counts
+
+
+def get_incremental_hamming_results(state):
+    """
+    Retrieves the full per-pair hamming results of an incremental hamming state.  States from incremental_oneshot_hamming
+    only hold the rows/columns changed by the mutation (on top of their parent's results), and so the full array is only
+    assembled here (once) if the state is used as the parent of another mutation.
+    :param state: Incremental hamming state (from prepare_incremental_hamming_state or incremental_oneshot_hamming)
+    :return: Array of hamming results for all handle/antihandle pairs i.e. (handles, antihandles, shifts)
+    """
+    if state['hamming_results'] is None:
+        parent_results, changed_handles, handle_rows, changed_antihandles, antihandle_columns = state['result_updates']
+        hamming_results = parent_results.copy()
+        if handle_rows is not None:
+            hamming_results[changed_handles] = handle_rows
+        if antihandle_columns is not None:
+            hamming_results[:, changed_antihandles] = antihandle_columns
+        state['hamming_results'] = hamming_results
+        state['result_updates'] = None
+    return state['hamming_results']
+
+
+def prepare_incremental_hamming_state(slat_array, handle_array, slat_length=32, request_substitute_risk_score=True,
+                                      backend='numpy', slat_index=None):
+    """
+    Runs a full hamming computation for a handle array, but retains all the intermediate per-pair results
+    so that mutated versions of the same array can be re-scored incrementally via incremental_oneshot_hamming.
+    Results are stored in the smallest integer type that can hold the slat length (uint8 for standard slats).
+    :param slat_array: Array of XxYxZ dimensions, where X and Y are the dimensions of the design and Z is the number of layers in the design
+    :param handle_array: Array of XxYxZ-1 dimensions containing the IDs of all the handles in the design
+    :param slat_length: The length of a single slat (must be an integer)
+    :param request_substitute_risk_score: Set to true to also retain the handle/handle and antihandle/antihandle comparisons
+    :param backend: The hamming matching engine to use (refer to hamming_block_compute)
+    :param slat_index: Pre-computed SlatIndex of the slat array (built from the slat array if not provided)
+    :return: Dictionary containing the handles, antihandles and all per-pair hamming results of the handle array
+    """
+    if slat_index is None:
+        slat_index = SlatIndex(slat_array)
+    handles, antihandles = slat_index.extract(handle_array)
+    backend = resolve_hamming_backend(backend, handles.shape[0], antihandles.shape[0], slat_length)
+    result_type = np.min_scalar_type(slat_length)
+
+    hamming_results = hamming_block_compute(generate_shifted_handles(handles, slat_length), antihandles, slat_length,
+                                            backend).astype(result_type)
+    pair_minimums, pair_minimum_counts = summarize_pair_results(hamming_results)
+
+    state = {'handle_keys': slat_index.handle_keys,
+             'antihandle_keys': slat_index.antihandle_keys,
+             'handles': handles,
+             'antihandles': antihandles,
+             'hamming_results': hamming_results,
+             'result_updates': None,
+             'pair_minimums': pair_minimums,
+             'pair_minimum_counts': pair_minimum_counts,
+             'histogram': np.bincount(hamming_results.ravel(), minlength=slat_length + 1),
+             'self_minimums': None}
+
+    # for the substitute risk, only the minimum over all shifts is needed for each slat pair
+    if request_substitute_risk_score:
+        state['self_minimums'] = []
+        for slat_handles in [handles, antihandles]:  # the diagonal (slat self-comparisons) is set to the slat length
+            state['self_minimums'].append(self_hamming_compute(slat_handles, slat_length, keep_pair_minimums=True,
+                                                               backend=backend)['pair_minimums'].astype(result_type))
+
+    return state
+
+
+def incremental_oneshot_hamming(parent_state, slat_array, handle_array, slat_length=32,
+                                report_worst_slat_combinations=True, request_substitute_risk_score=False, backend='numpy',
+                                slat_index=None, stage_metrics=None):
+    """
+    Computes the hamming scores of a handle array which is a mutated version of a parent array that has already been
+    analyzed with prepare_incremental_hamming_state.  Only the handle/antihandle pairs involving slats that were changed
+    by the mutation are re-computed - all other results are taken from the parent, and the parent's full results array
+    is never copied (the returned state only holds the re-computed rows and columns).
+    All scores are identical to those from multirule_oneshot_hamming.
+    :param parent_state: Incremental state of the parent handle array (from prepare_incremental_hamming_state or a previous call of this function)
+    :param slat_array: Array of XxYxZ dimensions, where X and Y are the dimensions of the design and Z is the number of layers in the design
+    :param handle_array: Mutated array of XxYxZ-1 dimensions containing the IDs of all the handles in the design
+    :param slat_length: The length of a single slat (must be an integer)
+    :param report_worst_slat_combinations: Set to true to provide the IDs of the worst handle/antihandle slat combinations
+    :param request_substitute_risk_score: Set to true to provide a measure of the largest amount of handle duplication between slats of the same type
+    (the parent state must have been prepared with the substitute risk option enabled)
+    :param backend: The hamming matching engine to use (refer to hamming_block_compute)
+    :param slat_index: Pre-computed SlatIndex of the slat array (built from the slat array if not provided)
+    :param stage_metrics: Dictionary in which to accumulate the time spent on each stage of the computation, along with
+    the number of slat combinations re-computed (refer to multirule_oneshot_hamming)
+    :return: Dictionary of scores (same format as multirule_oneshot_hamming) and the incremental state of the mutated handle array
+    """
+    stage_start = time.perf_counter()
+    if slat_index is None:
+        slat_index = SlatIndex(slat_array)
+    handles, antihandles = slat_index.extract(handle_array)
+    backend = resolve_hamming_backend(backend, handles.shape[0], antihandles.shape[0], slat_length)
+    result_type = np.min_scalar_type(slat_length)
+
+    # the slats changed by the mutation are identified directly by comparing against the parent
+    changed_handles = np.flatnonzero(np.any(handles != parent_state['handles'], axis=1))
+    changed_antihandles = np.flatnonzero(np.any(antihandles != parent_state['antihandles'], axis=1))
+    parent_results = get_incremental_hamming_results(parent_state)
+    stage_start = record_stage_metric(stage_metrics, 'Extraction Time', stage_start)
+
+    # only the (small) per-pair summaries are copied from the parent, and are then updated with the re-computed slats
+    pair_minimums = parent_state['pair_minimums'].copy()
+    pair_minimum_counts = parent_state['pair_minimum_counts'].copy()
+    histogram = parent_state['histogram'].copy()
+    handle_rows, antihandle_columns = None, None
+    if len(changed_handles) > 0:
+        shifted_handles = generate_shifted_handles(handles[changed_handles], slat_length)
+        stage_start = record_stage_metric(stage_metrics, 'Shift Construction Time', stage_start)
+        handle_rows = hamming_block_compute(shifted_handles, antihandles, slat_length, backend).astype(result_type)
+        stage_start = record_stage_metric(stage_metrics, 'Comparison Time', stage_start)
+        histogram -= np.bincount(parent_results[changed_handles].ravel(), minlength=slat_length + 1)
+        histogram += np.bincount(handle_rows.ravel(), minlength=slat_length + 1)
+        pair_minimums[changed_handles], pair_minimum_counts[changed_handles] = summarize_pair_results(handle_rows)
+    if len(changed_antihandles) > 0:
+        shifted_handles = generate_shifted_handles(handles, slat_length)
+        stage_start = record_stage_metric(stage_metrics, 'Shift Construction Time', stage_start)
+        antihandle_columns = hamming_block_compute(shifted_handles, antihandles[changed_antihandles],
+                                                   slat_length, backend).astype(result_type)
+        stage_start = record_stage_metric(stage_metrics, 'Comparison Time', stage_start)
+        # pairs involving a changed handle have already been counted in the histogram above
+        unchanged_handles = np.setdiff1d(np.arange(handles.shape[0]), changed_handles)
+        histogram -= np.bincount(parent_results[np.ix_(unchanged_handles, changed_antihandles)].ravel(), minlength=slat_length + 1)
+        histogram += np.bincount(antihandle_columns[unchanged_handles].ravel(), minlength=slat_length + 1)
+        pair_minimums[:, changed_antihandles], pair_minimum_counts[:, changed_antihandles] = summarize_pair_results(antihandle_columns)
+    record_stage_metric(stage_metrics, 'Slat Combinations Compared',
+                        count=len(changed_handles) * antihandles.shape[0] + handles.shape[0] * len(changed_antihandles))
+
+    state = {'handle_keys': parent_state['handle_keys'],
+             'antihandle_keys': parent_state['antihandle_keys'],
+             'handles': handles,
+             'antihandles': antihandles,
+             'hamming_results': None,  # assembled on demand (refer to get_incremental_hamming_results)
+             'result_updates': (parent_results, changed_handles, handle_rows, changed_antihandles, antihandle_columns),
+             'pair_minimums': pair_minimums,
+             'pair_minimum_counts': pair_minimum_counts,
+             'histogram': histogram,
+             'self_minimums': None}
+
+    score_dict = {'Universal': np.int64(np.min(pair_minimums)),
+                  'Physics-Informed Partition Score': partition_score_from_histogram(histogram, slat_length)}
+    stage_start = record_stage_metric(stage_metrics, 'Reduction Time', stage_start)
+
+    if report_worst_slat_combinations:
+        # each pair is listed once for every shift matching the minimum (as when searching the full results array)
+        worst_pairs = np.argwhere(pair_minimums == score_dict['Universal'])
+        worst_pairs = np.repeat(worst_pairs, pair_minimum_counts[worst_pairs[:, 0], worst_pairs[:, 1]], axis=0)
+        score_dict['Worst combinations handle IDs'] = [state['handle_keys'][i] for i in worst_pairs[:, 0]]
+        score_dict['Worst combinations antihandle IDs'] = [state['antihandle_keys'][i] for i in worst_pairs[:, 1]]
+        stage_start = record_stage_metric(stage_metrics, 'Hall of Shame Time', stage_start)
+
+    if request_substitute_risk_score:
+        state['self_minimums'] = []
+        for slat_handles, self_minimums, changed_slats in zip([handles, antihandles], parent_state['self_minimums'],
+                                                              [changed_handles, changed_antihandles]):
+            if len(changed_slats) > 0:
+                self_minimums = self_minimums.copy()
+                # the minimum over all shifts is symmetric, so both the row and the column can be updated in one go
+                changed_minimums = np.min(hamming_block_compute(generate_shifted_handles(slat_handles[changed_slats], slat_length),
+                                                                slat_handles, slat_length, backend), axis=2)
+                self_minimums[changed_slats, :] = changed_minimums
+                self_minimums[:, changed_slats] = changed_minimums.T
+                self_minimums[changed_slats, changed_slats] = slat_length
+                record_stage_metric(stage_metrics, 'Slat Combinations Compared', count=len(changed_slats) * slat_handles.shape[0])
+            state['self_minimums'].append(self_minimums)  # unchanged minimums are shared with the parent (never modified in place)
+        score_dict['Substitute Risk'] = np.int64(min(np.min(m) for m in state['self_minimums']))
+        record_stage_metric(stage_metrics, 'Comparison Time', stage_start)
+
+    return score_dict, state
+
+
 def precise_hamming_compute(handle_dict, antihandle_dict, valid_product_indices, slat_length):
     """
     Given a dictionary of slat handles and antihandles, this function computes the hamming distance between all possible combinations.
@@ -257,34 +1501,27 @@ def precise_hamming_compute(handle_dict, antihandle_dict, valid_product_indices,
     :param slat_length: The length of a single slat (must be an integer)
     :return: Array of results for each possible combination (a single integer per combination)
     """
-    single_combo = 4 * slat_length
-    total_combos = single_combo * sum(valid_product_indices)
-    combination_matrix_1 = np.zeros((total_combos, slat_length), dtype=np.uint16)
-    combination_matrix_2 = np.zeros((total_combos, slat_length), dtype=np.uint16)
-    valid_combo_index = 0
-    for i, ((hk, handle_slat), (ahk, antihandle_slat)) in enumerate(product(handle_dict.items(), antihandle_dict.items())):
-        if valid_product_indices[i]:
-            for j in range(slat_length):
-                # 4 combinations:
-                # 1. X vs Y, rotation to the left
-                # 2. X vs Y, rotation to the right
-                # 3. X vs Y, rotation to the left, reversed X
-                # 4. X vs Y, rotation to the right, reversed X
-                # All rotations padded with zeros (already in array)
-
-                combination_matrix_1[(valid_combo_index * single_combo) + j, :slat_length - j] = handle_slat[j:]
-                combination_matrix_1[(valid_combo_index * single_combo) + slat_length + j, j:] = handle_slat[:slat_length - j]
-                combination_matrix_1[(valid_combo_index * single_combo) + (2 * slat_length) + j, :slat_length - j] = handle_slat[::-1][j:]
-                combination_matrix_1[(valid_combo_index * single_combo) + (3 * slat_length) + j, j:] = handle_slat[::-1][:slat_length - j]
-            combination_matrix_2[valid_combo_index * single_combo:(valid_combo_index + 1) * single_combo, :] = antihandle_slat
-            valid_combo_index += 1
-    results = np.count_nonzero(np.logical_or(combination_matrix_1 != combination_matrix_2, combination_matrix_1 == 0, combination_matrix_2 == 0), axis=1)
+    handles = stack_handles(handle_dict)
+    antihandles = stack_handles(antihandle_dict)
+
+    # combinations are in the same order as product(handle_dict, antihandle_dict)
+    handle_indices, antihandle_indices = np.nonzero(np.asarray(valid_product_indices, dtype=bool).reshape(len(handle_dict), len(antihandle_dict)))
+    if len(handle_indices) == 0:
+        return np.zeros(0, dtype=np.intp)
+
+    # the rotations are only gathered once per handle slat, and the antihandles are broadcast rather than copied
+    # All rotations padded with zeros (already in the shifted handles)
+    rotated_handles = generate_shifted_handles(handles, slat_length)[:, precise_shift_order(slat_length)]
+    combination_matrix_1 = rotated_handles[handle_indices]
+    combination_matrix_2 = antihandles[antihandle_indices][:, np.newaxis, :]
+
+    results = np.count_nonzero((combination_matrix_1 != combination_matrix_2) | (combination_matrix_1 == 0), axis=2).ravel()
     return results
 
 
 def multirule_precise_hamming(slat_array, handle_array, universal_check=True, per_layer_check=False,
                               specific_slat_groups=None, slat_length=32, request_substitute_risk_score=False,
-                              partial_area_score=False):
+                              partial_area_score=False, cache=None):
     """
     Given a slat and handle array, this function computes the hamming distance of all handle/antihandle combinations provided.
     Scores for individual components, such as specific slat groups, can also be requested.
@@ -300,9 +1537,17 @@ def multirule_precise_hamming(slat_array, handle_array, universal_check=True, pe
     :param partial_area_score: Calculates Hamming distance and substitution risk among a subset of provided slats when only considering a subset of the handles.
     Provide a dictionary with key as a group name and the values as dictionaries with keys "handle" and "antihandle".
     The corresponding values are dictionaries, where the key is a tuple like so (slat layer, slat ID) and the value is a list of TRUE/FALSE depending on whether that position's handle is included.
+    :param cache: A HammingResultCache in which to look up (and store) the results of this handle array.
     :return: Dictionary of scores for each of the aspects requested from the design
     """
 
+    if cache is not None:
+        options = {'universal_check': universal_check, 'per_layer_check': per_layer_check,
+                   'specific_slat_groups': specific_slat_groups, 'slat_length': slat_length,
+                   'request_substitute_risk_score': request_substitute_risk_score, 'partial_area_score': partial_area_score}
+        return cache.get_or_compute('multirule_precise_hamming', slat_array, handle_array, options,
+                                    lambda: multirule_precise_hamming(slat_array, handle_array, **options))
+
     slat_array = np.array(slat_array, dtype=np.uint16) # converts to int to reduce memory usage
     handle_array = np.array(handle_array, dtype=np.uint16)
 
@@ -338,27 +1583,11 @@ def multirule_precise_hamming(slat_array, handle_array, universal_check=True, pe
 
     # calculate hamming distance in the case that we are only considering a partial area, which requires editing slat handles in non-considered regions to be "0"
     if partial_area_score:
-        hamming_results_partial = {}
-        for group_key, slat_dict in partial_area_score.items():
-            bag_of_slat_handles_partial = OrderedDict()
-            bag_of_slat_antihandles_partial = OrderedDict()
-            
-            for (slat_layer, slat_ID), full_slat_handles in bag_of_slat_handles.items():
-                if (slat_layer, slat_ID) in slat_dict['handles']:
-                    slat_inclusion = slat_dict["handles"][(slat_layer, slat_ID)]
-                    partial_slat_handles = np.array([x if y else 0 for x,y in zip(full_slat_handles, slat_inclusion)], dtype=np.uint16)
-                    bag_of_slat_handles_partial[(slat_layer, slat_ID)] = partial_slat_handles
-
-            for (slat_layer, slat_ID), full_slat_antihandles in bag_of_slat_antihandles.items():
-                if (slat_layer, slat_ID) in slat_dict['antihandles']:
-                    slat_inclusion = slat_dict["antihandles"][(slat_layer, slat_ID)]
-                    partial_slat_antihandles = np.array([x if y else 0 for x,y in zip(full_slat_antihandles, slat_inclusion)], dtype=np.uint16)
-                    bag_of_slat_antihandles_partial[(slat_layer, slat_ID)] = partial_slat_antihandles
-
-                # Filters out the selection here - everything listed is included
-            valid_product_indices_partial = [True for _ in product(bag_of_slat_handles_partial, bag_of_slat_antihandles_partial)] 
-            hamming_results_partial[group_key] = precise_hamming_compute(bag_of_slat_handles_partial, bag_of_slat_antihandles_partial, valid_product_indices_partial, slat_length)
-    
+        hamming_results_partial = partial_area_hamming_compute(stack_handles(bag_of_slat_handles), stack_handles(bag_of_slat_antihandles),
+                                                               compile_partial_area_groups(partial_area_score, list(bag_of_slat_handles.keys()),
+                                                                                           list(bag_of_slat_antihandles.keys()), slat_length),
+                                                               slat_length)
+
     # this computes the risk that two slats are identical i.e. the risk that one slat could replace another in the wrong place if it has enough complementary handles
     # for now, no special index validation is provided for this feature.
     if request_substitute_risk_score:
@@ -387,9 +1616,8 @@ def multirule_precise_hamming(slat_array, handle_array, universal_check=True, pe
         for group_key, indices in group_indices.items():
             score_dict[group_key] = np.min(hamming_results[indices])
     if partial_area_score:
-        for group_key, slat_dict in partial_area_score.items():
-            #selected_indices = np.array([(x,y) for x,y in slat_dict["handles"].keys()] + [(x,y) for x,y in slat_dict["antihandles"].keys()], dtype=np.uint16)
-            score_dict[group_key] = np.min(hamming_results_partial[group_key])
+        for group_key in partial_area_score.keys():
+            score_dict[group_key] = hamming_results_partial[group_key]
 
     return score_dict
 
@@ -0,0 +1,210 @@
+import os
+import time
+import pickle
+import sqlite3
+import hashlib
+from collections import OrderedDict
+import numpy as np
+
+from crisscross.helper_functions import get_user_cache_directory
+
+
+def canonical_option_repr(value):
+    """
+    Converts a set of scoring options into a string that is identical for identical options,
+    such that it can be used as part of a cache key.  Numpy objects are converted to plain python values first.
+    :param value: The option value (can be a nested dictionary/list/tuple/array)
+    :return: String representation of the option
+    """
+    if isinstance(value, dict):
+        return '{' + ','.join(f'{canonical_option_repr(k)}:{canonical_option_repr(v)}' for k, v in value.items()) + '}'
+    if isinstance(value, (list, tuple)):
+        return ('[' if isinstance(value, list) else '(') + ','.join(canonical_option_repr(v) for v in value) + (']' if isinstance(value, list) else ')')
+    if isinstance(value, (np.ndarray, np.generic)):
+        return canonical_option_repr(value.tolist())
+    return repr(value)
+
+
+class HammingResultCache:
+    """
+    Content-addressed cache of hamming scoring results, stored in an sqlite database (by default within the per-user cache directory).
+    Results are keyed on the slat array, handle array and scoring options, so an identical scoring request never needs
+    to be computed twice, even across separate runs.  A small in-memory LRU sits in front of the database, and the
+    oldest entries are evicted once the database grows beyond its size limit.  The database can be safely shared by
+    several processes (e.g. pool workers) at once.
+    """
+
+    # part of every key - increment whenever the format of the results changes (e.g. the shift order of offending combinations)
+    result_version = 3
+
+    def __init__(self, database_file=None, max_size=512, memory_entries=1000, eviction_interval=64):
+        """
+        :param database_file: Location of the sqlite database file (created if it does not exist).  Defaults to
+        hamming_results.sqlite within the per-user cache directory (refer to get_user_cache_directory).
+        :param max_size: Maximum size (in MB) of the stored results before the least recently used entries are evicted
+        :param memory_entries: Number of results to retain in the in-memory LRU
+        :param eviction_interval: Number of database insertions between each size check
+        """
+        if database_file is None:
+            database_file = os.path.join(get_user_cache_directory(), 'hamming_results.sqlite')
+        self.database_file = database_file
+        self.max_size = max_size
+        self.memory_entries = memory_entries
+        self.eviction_interval = eviction_interval
+
+        self.memory_cache = OrderedDict()
+        self.connection = None
+        self.connection_pid = None
+        self.insertions_since_eviction = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __getstate__(self):
+        # connections cannot be shared between processes - each process re-opens the database when first needed
+        state = self.__dict__.copy()
+        state['connection'] = None
+        state['connection_pid'] = None
+        state['memory_cache'] = OrderedDict()
+        return state
+
+    def get_connection(self):
+        """
+        Opens the database for the current process (if not already open), creating the results table if required.
+        :return: sqlite connection
+        """
+        if self.connection is None or self.connection_pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.database_file)), exist_ok=True)
+            self.connection = sqlite3.connect(self.database_file, timeout=60, isolation_level=None)
+            # write-ahead logging allows readers to continue while another process is writing
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA busy_timeout=60000')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS results '
+                                    '(key TEXT PRIMARY KEY, result BLOB NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)')
+            self.connection_pid = os.getpid()
+        return self.connection
+
+    def close(self):
+        """
+        Closes the database connection of the current process.
+        :return: N/A
+        """
+        if self.connection is not None and self.connection_pid == os.getpid():
+            self.connection.close()
+        self.connection = None
+        self.connection_pid = None
+
+    @staticmethod
+    def compute_key(function_name, slat_array, handle_array, options):
+        """
+        Computes the content-addressed key of a scoring request.
+        :param function_name: Name of the scoring function
+        :param slat_array: The design's slat array
+        :param handle_array: The handle array being scored
+        :param options: Dictionary of all scoring options that can affect the result
+        :return: sha256 hex digest
+        """
+        key_hash = hashlib.sha256(f'{function_name}:{HammingResultCache.result_version}'.encode())
+        for array in [np.asarray(slat_array, dtype=np.uint16), np.asarray(handle_array, dtype=np.uint16)]:
+            key_hash.update(str(array.shape).encode())
+            key_hash.update(np.ascontiguousarray(array).tobytes())
+        key_hash.update(canonical_option_repr(options).encode())
+        return key_hash.hexdigest()
+
+    def get(self, key):
+        """
+        Retrieves a result from the cache.
+        :param key: Key of the result (from compute_key)
+        :return: The cached result, or None if not available
+        """
+        if key in self.memory_cache:
+            self.memory_cache.move_to_end(key)
+            self.hits += 1
+            return pickle.loads(self.memory_cache[key])
+
+        connection = self.get_connection()
+        row = connection.execute('SELECT result FROM results WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        connection.execute('UPDATE results SET last_access = ? WHERE key = ?', (time.time(), key))
+        self.remember(key, row[0])
+        self.hits += 1
+        return pickle.loads(row[0])
+
+    def put(self, key, result):
+        """
+        Stores a result in the cache.
+        :param key: Key of the result (from compute_key)
+        :param result: The result to store (must be picklable)
+        :return: N/A
+        """
+        result_bytes = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        self.remember(key, result_bytes)
+        self.get_connection().execute('INSERT OR REPLACE INTO results (key, result, size, last_access) VALUES (?, ?, ?, ?)',
+                                      (key, result_bytes, len(result_bytes), time.time()))
+
+        self.insertions_since_eviction += 1
+        if self.insertions_since_eviction >= self.eviction_interval:
+            self.evict()
+
+    def remember(self, key, result_bytes):
+        """
+        Adds a pickled result to the in-memory LRU, removing the least recently used result if full.
+        :param key: Key of the result
+        :param result_bytes: Pickled result
+        :return: N/A
+        """
+        self.memory_cache[key] = result_bytes
+        self.memory_cache.move_to_end(key)
+        if len(self.memory_cache) > self.memory_entries:
+            self.memory_cache.popitem(last=False)
+
+    def evict(self):
+        """
+        Removes the least recently used results from the database until its contents fit within the size limit.
+        :return: N/A
+        """
+        self.insertions_since_eviction = 0
+        connection = self.get_connection()
+        total_size = connection.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        excess = total_size - int(self.max_size * 1024 ** 2)
+        if excess <= 0:
+            return
+
+        # finds the access time up to which entries need to be removed to free up enough space
+        removed_size = 0
+        cutoff_time = None
+        for size, last_access in connection.execute('SELECT size, last_access FROM results ORDER BY last_access'):
+            removed_size += size
+            cutoff_time = last_access
+            if removed_size >= excess:
+                break
+        connection.execute('DELETE FROM results WHERE last_access <= ?', (cutoff_time,))
+
+    def clear(self):
+        """
+        Removes all results from the cache.
+        :return: N/A
+        """
+        self.memory_cache.clear()
+        self.get_connection().execute('DELETE FROM results')
+
+    def get_or_compute(self, function_name, slat_array, handle_array, options, compute_function):
+        """
+        Returns the cached result of a scoring request, or computes (and stores) it if not yet available.
+        :param function_name: Name of the scoring function
+        :param slat_array: The design's slat array
+        :param handle_array: The handle array being scored
+        :param options: Dictionary of all scoring options that can affect the result
+        :param compute_function: Function (with no arguments) that computes the result if it is not in the cache
+        :return: The scoring result
+        """
+        key = self.compute_key(function_name, slat_array, handle_array, options)
+        result = self.get(key)
+        if result is None:
+            result = compute_function()
+            self.put(key, result)
+        return result
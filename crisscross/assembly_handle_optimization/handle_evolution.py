@@ -1,30 +1,244 @@
 import os
-from collections import defaultdict
+import hashlib
+from collections import defaultdict, OrderedDict
 import pandas as pd
 import numpy as np
 from tqdm import tqdm
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import multiprocessing
+import threading
+from multiprocessing import shared_memory
+from multiprocessing.pool import ThreadPool
+from concurrent.futures import ThreadPoolExecutor
 import time
+import queue
+from functools import partial
 import matplotlib.ticker as ticker
 from colorama import Fore
 
-from crisscross.assembly_handle_optimization.hamming_compute import multirule_oneshot_hamming
-from crisscross.assembly_handle_optimization.handle_mutation import mutate_handle_arrays
+from crisscross.assembly_handle_optimization.hamming_compute import (multirule_oneshot_hamming, prepare_incremental_hamming_state,
+                                                                    incremental_oneshot_hamming, SlatIndex,
+                                                                    resolve_hamming_backend, hamming_stage_metric_names,
+                                                                    record_stage_metric)
+from crisscross.assembly_handle_optimization.handle_mutation import HandleMutator
 from crisscross.assembly_handle_optimization import generate_random_slat_handles, generate_layer_split_handles
 from crisscross.helper_functions import save_list_dict_to_file, create_dir_if_empty
 
+# design details are stored here within each pool worker, so that they only need to be sent over once when the pool starts
+_worker_design = {}
+
+# scores written directly into shared memory by the pool workers (in this column order)
+shared_score_names = ['Physics-Informed Partition Score', 'Universal', 'Substitute Risk']
+
+# color scale applied to exported handle arrays
+excel_conditional_formatting = {'type': '3_color_scale',
+                                'criteria': '<>',
+                                'min_color': "#63BE7B",  # Green
+                                'mid_color': "#FFEB84",  # Yellow
+                                'max_color': "#F8696B",  # Red
+                                'value': 0}
+
+# stage timers/counters recorded by the pool workers for each candidate (summed over the population in each generation)
+evaluation_stage_metric_names = hamming_stage_metric_names + ['Parent State Time']
+
+
+def _create_evaluation_design(slat_array, slat_length, memory_budget, backend, population, scores, parent_state_cache_size,
+                              stage_profiling):
+    """
+    Gathers the (fixed) design details required to evaluate members of a candidate population.
+    :param slat_array: The basis slat array for which a handle set is being evolved
+    :param slat_length: Slat length in terms of number of handles
+    :param memory_budget: Memory limit (in MB) for each hamming computation (can be None)
+    :param backend: The hamming matching engine to use (refer to multirule_oneshot_hamming)
+    :param population: Array containing the candidate handle arrays i.e. (population, X, Y, layers - 1)
+    :param scores: Array into which the scores of each candidate should be written (population, number of scores)
+    :param parent_state_cache_size: Number of parent incremental hamming states to retain
+    :param stage_profiling: Set to true to record the time spent on each stage of the hamming computation
+    :return: Dictionary of design details
+    """
+    return {'slat_array': slat_array,
+            'slat_index': SlatIndex(slat_array),  # slat positions are fixed, so only need to be found once
+            'slat_length': slat_length,
+            'memory_budget': memory_budget,
+            'backend': backend,
+            'population': population,
+            'scores': scores,
+            'parent_states': OrderedDict(),
+            'parent_state_cache_size': parent_state_cache_size,
+            'parent_state_lock': threading.Lock(),
+            'stage_profiling': stage_profiling}
+
+
+def _initialize_evaluation_worker(slat_array, slat_length, memory_budget, backend, population_memory_name, population_shape,
+                                  score_memory_name, parent_state_cache_size, stage_profiling):
+    """
+    Stores the (fixed) design details in a worker process of the evaluation pool, and attaches the worker
+    to the shared memory buffers containing the candidate population and their scores.
+    :param slat_array: The basis slat array for which a handle set is being evolved
+    :param slat_length: Slat length in terms of number of handles
+    :param memory_budget: Memory limit (in MB) for each hamming computation (can be None)
+    :param backend: The hamming matching engine to use (refer to multirule_oneshot_hamming)
+    :param population_memory_name: Name of the shared memory block containing the candidate handle arrays
+    :param population_shape: Shape of the candidate population array i.e. (population, X, Y, layers - 1)
+    :param score_memory_name: Name of the shared memory block into which scores should be written
+    :param parent_state_cache_size: Number of parent incremental hamming states to retain in the worker
+    :param stage_profiling: Set to true to record the time spent on each stage of the hamming computation
+    :return: N/A
+    """
+    # the shared memory objects need to be kept alive for as long as the arrays are in use
+    _worker_design['population_memory'] = shared_memory.SharedMemory(name=population_memory_name)
+    _worker_design['score_memory'] = shared_memory.SharedMemory(name=score_memory_name)
+    population = np.ndarray(population_shape, dtype=np.uint16, buffer=_worker_design['population_memory'].buf)
+    scores = np.ndarray((population_shape[0], len(shared_score_names)), dtype=np.float64, buffer=_worker_design['score_memory'].buf)
+
+    _worker_design.update(_create_evaluation_design(slat_array, slat_length, memory_budget, backend, population, scores,
+                                                    parent_state_cache_size, stage_profiling))
+
+
+def _get_parent_state(design, parent_index):
+    """
+    Retrieves the incremental hamming state of a parent in the population, computing it if not already available.
+    :param design: Evaluation design details (from _create_evaluation_design)
+    :param parent_index: Index of the parent in the population
+    :return: Incremental hamming state of the parent (refer to prepare_incremental_hamming_state)
+    """
+    parent_array = design['population'][parent_index]
+    parent_key = hashlib.sha256(parent_array.tobytes()).hexdigest()
+    parent_states = design['parent_states']
+
+    # the cache can be shared by several threads, so is only ever accessed under the lock
+    with design['parent_state_lock']:
+        parent_state = parent_states.get(parent_key)
+        if parent_state is not None:
+            parent_states.move_to_end(parent_key)
+    if parent_state is None:
+        parent_state = prepare_incremental_hamming_state(design['slat_array'], parent_array, design['slat_length'],
+                                                         backend=design['backend'], slat_index=design['slat_index'])
+        with design['parent_state_lock']:
+            parent_states[parent_key] = parent_state
+            if len(parent_states) > design['parent_state_cache_size']:
+                parent_states.popitem(last=False)
+
+    return parent_state
+
+
+def _evaluate_population_member(index, parent_index=None, design=None):
+    """
+    Computes the hamming scores of a single candidate handle array from the shared population.
+    Numerical scores are written directly into the shared score array, and only the worst handle/antihandle
+    combinations are sent back to the main process.  Refer to the multirule_oneshot_hamming function for details on the scores.
+    :param index: Index of the candidate in the population
+    :param parent_index: Index of the candidate's parent in the population.  If provided, the candidate will be scored
+    incrementally, by only re-computing the slat combinations that were changed by the mutation.
+    :param design: Evaluation design details (from _create_evaluation_design).  If not provided, the details stored
+    in the worker process will be used.
+    :return: Dictionary containing the worst handle/antihandle combinations of the candidate (and its stage metrics,
+    if stage profiling is enabled)
+    """
+    if design is None:
+        design = _worker_design
+
+    stage_metrics = {} if design['stage_profiling'] else None
+
+    if parent_index is None:
+        res = multirule_oneshot_hamming(design['slat_array'], design['population'][index], True, True, None, True,
+                                        design['slat_length'], False, design['memory_budget'],
+                                        design['backend'], design['slat_index'], stage_metrics=stage_metrics)
+    else:
+        stage_start = time.perf_counter()
+        parent_state = _get_parent_state(design, parent_index)
+        record_stage_metric(stage_metrics, 'Parent State Time', stage_start)
+        res, _ = incremental_oneshot_hamming(parent_state, design['slat_array'],
+                                             design['population'][index], design['slat_length'],
+                                             report_worst_slat_combinations=True, request_substitute_risk_score=True,
+                                             backend=design['backend'], slat_index=design['slat_index'],
+                                             stage_metrics=stage_metrics)
+
+    design['scores'][index] = [res[name] for name in shared_score_names]
+
+    worst_combinations = {'Worst combinations handle IDs': res['Worst combinations handle IDs'],
+                          'Worst combinations antihandle IDs': res['Worst combinations antihandle IDs']}
+    if stage_metrics is not None:
+        worst_combinations['Stage metrics'] = stage_metrics
+    return worst_combinations
+
+
+def export_handle_array_to_excel(handle_array, output_file, conditional_formatting):
+    """
+    Writes a handle array to an Excel file, with one sheet per handle interface (in the standard design format).
+    :param handle_array: The handle array to export
+    :param output_file: Path of the Excel file
+    :param conditional_formatting: xlsxwriter conditional format applied to each sheet (for easy color-based identification)
+    :return: N/A
+    """
+    writer = pd.ExcelWriter(output_file, engine='xlsxwriter')
+
+    # prints out slat dataframes in standard format
+    for layer_index in range(handle_array.shape[-1]):
+        df = pd.DataFrame(handle_array[..., layer_index])
+        df.to_excel(writer, sheet_name=f'handle_interface_{layer_index + 1}', index=False, header=False)
+        writer.sheets[f'handle_interface_{layer_index + 1}'].conditional_format(0, 0, df.shape[0], df.shape[1] - 1,
+                                                                                conditional_formatting)
+    writer.close()
+
+
+def export_evolution_report(output_folder, metrics, handle_array, generation, conditional_formatting):
+    """
+    Writes a full evolution report: a plot of the main metrics (PDF), all metrics (CSV) and the best handle array (Excel).
+    Matplotlib's pyplot interface is not used, so that reports can be written from a background thread.
+    :param output_folder: Folder in which to write the report
+    :param metrics: Dictionary of metric lists (one value per generation)
+    :param handle_array: The best handle array
+    :param generation: Generation of the best handle array
+    :param conditional_formatting: xlsxwriter conditional format applied to the handle array sheets
+    :return: N/A
+    """
+    fig = Figure(figsize=(10, 10))
+    ax = fig.subplots(5, 1)
+
+    for ind, (name, data) in enumerate(zip(['Candidate with Best Log Physics-Based Partition Score',
+                                            'Corresponding Hamming Distance',
+                                            'Corresponding Duplication Risk Score',
+                                            'Similarity of Population to Initial Candidates',
+                                            'Hamming Compute Time (s)'],
+                                           [metrics['Best (Log) Physics-Based Score'],
+                                            metrics['Corresponding Hamming Distance'],
+                                            metrics['Corresponding Duplicate Risk Score'],
+                                            metrics['Similarity Score'],
+                                            metrics['Hamming Compute Time']])):
+
+        ax[ind].plot(range(1, len(data)+1), data, linestyle='--', marker='o')
+        ax[ind].set_xlabel('Generation')
+        ax[ind].set_ylabel('Measurement')
+        ax[ind].set_title(name)
+        ax[ind].xaxis.set_major_locator(ticker.MaxNLocator(integer=True))
+
+    fig.tight_layout()
+    fig.savefig(os.path.join(output_folder, 'metrics_visualization.pdf'))
+
+    # saves the metrics to a csv file for downstream analysis/plotting
+    save_list_dict_to_file(output_folder, 'metrics.csv', metrics, append=False)
+
+    export_handle_array_to_excel(handle_array, os.path.join(output_folder, f'best_handle_array_generation_{generation}.xlsx'),
+                                 conditional_formatting)
+
 
 class EvolveManager:
     def __init__(self, slat_array, seed_handle_array=None, slat_length=32, random_seed=8, generational_survivors=3,
                  mutation_rate=5, mutation_type_probabilities=(0.425, 0.425, 0.15), unique_handle_sequences=32,
                  evolution_generations=200, evolution_population=30, split_sequence_handles=False, process_count=None,
                  early_hamming_stop=None, log_tracking_directory=None, progress_bar_update_iterations=2,
-                 mutation_memory_system='off', memory_length=10):
+                 mutation_memory_system='off', memory_length=10, hamming_memory_budget=None, fitness_cache_size=1000,
+                 incremental_evaluation=True, hamming_backend='auto', evaluation_mode='processes', stage_profiling=True,
+                 checkpoint_interval=None, resume_from=None, evolution_mode='generational', elite_pool_size=None,
+                 background_export=True):
         """
         Prepares an evolution manager to optimize a handle array for the provided slat array.
         WARNING: Make sure to use the "if __name__ == '__main__':" block to run this class in a script.
         Otherwise, the spawned processes will cause a recursion error.
+        The manager keeps a pool of worker processes alive between generations, which read the candidate population
+        from (and write scores to) shared memory.  Call close() when done with the manager (or use it as a context manager)
+        to shut the pool down - this is done automatically at the end of run_full_experiment.
         :param slat_array: The basis slat array for which a handle set needs to be found
         :param seed_handle_array: The initial handle array to use for the evolution (can be None)
         :param slat_length: Slat length in terms of number of handles
@@ -42,8 +256,37 @@ class EvolveManager:
         :param log_tracking_directory: Set to a directory to export plots and metrics during the optimization process (optional)
         :param progress_bar_update_iterations: Number of iterations before progress bar is updated
         - useful for server output files, but does not seem to work consistently on every system (optional)
-        :param mutation_memory_system: The type of memory system to use for the handle mutation process. Options are 'all', 'best', 'special', or 'off'.
+        :param mutation_memory_system: The type of memory system to use for the handle mutation process. Options are 'all', 'best_memory', 'special', or 'off'.
         :param memory_length: Memory of previous 'worst' handle combinations to retain when selecting positions to mutate.
+        :param hamming_memory_budget: Memory limit (in MB) for each hamming computation.  If set, the hamming distance
+        is streamed over blocks of slats to keep memory usage in check for large designs (optional).
+        :param fitness_cache_size: Number of previously evaluated handle arrays for which scores are retained, so that
+        surviving parents (or any repeated arrays) do not need to be re-scored.  Set to 0 to disable.
+        :param incremental_evaluation: Set to true to score mutated arrays incrementally i.e. only the slat combinations
+        affected by a mutation are re-computed from their parent's results.  Not available when a hamming memory budget is set.
+        :param hamming_backend: The hamming matching engine to use - 'numpy', 'bitset', 'gemm' or 'auto' to select the
+        fastest engine for this design (refer to multirule_oneshot_hamming)
+        :param evaluation_mode: Set to 'processes' to evaluate candidates over a pool of worker processes, or to 'threads'
+        to use a pool of threads within the current process instead (process_count then sets the number of threads).
+        Threads avoid the cost of starting up processes and copying data, at the cost of some parallelism (only the NumPy
+        computations run in parallel).  This is useful for servers that create a new manager for each request.
+        :param stage_profiling: Set to true to record the time spent by the workers on each stage of the hamming computation
+        (extraction, shift construction, comparison, reductions and hall of shame), along with the number of slat combinations
+        compared.  These are summed over the population and stored in the metrics of each generation.
+        :param checkpoint_interval: Number of generations between each checkpoint saved by run_full_experiment (to the
+        log tracking directory).  A checkpoint is also saved once the experiment ends.  Set to None to disable checkpoints.
+        :param resume_from: Path to a checkpoint file (from save_checkpoint) from which to resume a previous run.
+        The manager needs to be set up with the same slat array and parameters as the original run, after which
+        the evolution continues exactly as if it had never been interrupted.
+        :param evolution_mode: Set to 'generational' to evaluate and mutate the whole population in lockstep, or to
+        'steady_state' to keep every worker busy: each finished child is immediately added to a bounded pool of elites
+        (if good enough), and a new child is generated from the current elites for the freed up worker.
+        In steady-state mode, a 'generation' refers to every evolution_population evaluations (for metrics and exports),
+        children are always fully evaluated and checkpoints are not available.
+        :param elite_pool_size: Number of elites retained (and used as parents) in steady-state mode
+        (defaults to the number of generational survivors)
+        :param background_export: Set to true to write exports in a background thread (from a snapshot of the results),
+        rather than pausing the evolution until they have been written.
         """
 
         # initial parameter setup
@@ -67,6 +310,8 @@ class EvolveManager:
         self.progress_bar_update_iterations = int(progress_bar_update_iterations)
         self.mutation_memory_system = mutation_memory_system
         self.hall_of_shame_memory = memory_length
+        self.fitness_cache_size = int(fitness_cache_size)
+        self.fitness_cache = OrderedDict()  # least-recently used entries are at the start
 
         # converters for alternative parameter definitions
 
@@ -75,6 +320,42 @@ class EvolveManager:
         else:
             self.early_hamming_stop = int(early_hamming_stop)
 
+        if hamming_memory_budget is None:
+            self.hamming_memory_budget = None
+        else:
+            self.hamming_memory_budget = float(hamming_memory_budget)
+
+        if isinstance(incremental_evaluation, str):
+            incremental_evaluation = eval(incremental_evaluation.capitalize())
+        # the incremental system retains all pairwise results, and so cannot be used if memory is restricted
+        self.incremental_evaluation = incremental_evaluation and self.hamming_memory_budget is None
+
+        if evaluation_mode not in ['processes', 'threads']:
+            raise ValueError(f'Evaluation mode {evaluation_mode} not recognized.')
+        self.evaluation_mode = evaluation_mode
+
+        # the backend is tuned once here, rather than separately in every worker.
+        # torch is not auto-selected for process evaluation, since a CUDA context created in this process
+        # (e.g. when tuning) cannot be used by forked worker processes
+        slat_index = SlatIndex(slat_array)
+        self.slat_index = slat_index
+        excluded_backends = ('torch',) if evaluation_mode == 'processes' else ()
+        self.hamming_backend = resolve_hamming_backend(hamming_backend, len(slat_index.handle_keys),
+                                                       len(slat_index.antihandle_keys), slat_length,
+                                                       excluded_backends=excluded_backends)
+
+        if isinstance(stage_profiling, str):
+            stage_profiling = eval(stage_profiling.capitalize())
+        self.stage_profiling = stage_profiling
+        self.pending_export_time = 0  # time spent exporting results since the last generation
+
+        if isinstance(background_export, str):
+            background_export = eval(background_export.capitalize())
+        self.background_export = background_export
+        self.export_executor = None  # only started when the first export is requested
+        self.pending_exports = []
+        self.logged_generations = 0  # number of generations already written to the metrics log
+
         if isinstance(mutation_type_probabilities, str):
             self.mutation_type_probabilities = tuple(map(float, mutation_type_probabilities.split(', ')))
         else:
@@ -93,19 +374,130 @@ class EvolveManager:
 
         print(Fore.BLUE + f'Handle array evolution core count set to {self.num_processes}.' + Fore.RESET)
 
+        # only started when the first evaluation is requested
+        self.evaluation_pool = None
+        self.population_memory = None
+        self.score_memory = None
+        self.population_scores = None
+        self.evaluation_design = None  # only used for thread evaluation, as processes store the design themselves
+
         self.next_candidates = self.initialize_evolution()
         self.initial_candidates = self.next_candidates.copy()
+        self.candidate_parents = [None] * self.evolution_population  # population index of the parent of each candidate (if any)
+
+        # the mutator retains the design's slat positions and all hall of shame memories between generations
+        self.mutator = HandleMutator(self.slat_array, self.number_unique_handles, self.mutation_rate,
+                                     self.mutation_type_probabilities, self.mutation_memory_system,
+                                     self.hall_of_shame_memory, self.evolution_population, self.generational_survivors,
+                                     self.split_sequence_handles, slat_index)
+
+        self.excel_conditional_formatting = excel_conditional_formatting
+
+        if evolution_mode not in ['generational', 'steady_state']:
+            raise ValueError(f'Evolution mode {evolution_mode} not recognized.')
+        self.evolution_mode = evolution_mode
+        if self.evolution_mode == 'steady_state' and (checkpoint_interval is not None or resume_from is not None):
+            raise ValueError('Checkpoints are not available in steady-state evolution mode.')
+        if resume_from is not None and not os.path.isfile(resume_from):
+            if os.path.isdir(resume_from):
+                raise ValueError(f'{resume_from} is a directory, but a checkpoint file (evolution_checkpoint.npz) is '
+                                 f'required to resume a single evolution run (directories are only used for island runs).')
+            raise ValueError(f'Checkpoint file {resume_from} does not exist.')
+
+        # steady-state details (only set up once the first generation has been evaluated)
+        self.elite_pool_size = min(self.generational_survivors if elite_pool_size is None else int(elite_pool_size),
+                                   self.evolution_population)
+        # a few more children than workers are kept in flight, so that workers never wait for new children
+        self.steady_state_slots = min(self.evolution_population, 2 * int(self.num_processes))
+        self.elite_arrays = []
+        self.elite_results = []
+        self.elite_keys = []
+        self.completed_evaluations = queue.Queue()  # filled in by the evaluation pool as soon as each child is scored
+        self.free_slots = []  # population slots not currently being evaluated
+
+        self.checkpoint_interval = None if checkpoint_interval is None else int(checkpoint_interval)
+        if resume_from is not None:
+            self.load_checkpoint(resume_from)
+
+    def __enter__(self):
+        return self
 
-        self.memory_hallofshame = defaultdict(list)
-        self.memory_best_parent_hallofshame = defaultdict(list)
-        self.initial_hallofshame = defaultdict(list)
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
-        self.excel_conditional_formatting = {'type': '3_color_scale',
-                                             'criteria': '<>',
-                                             'min_color': "#63BE7B",  # Green
-                                             'mid_color': "#FFEB84",  # Yellow
-                                             'max_color': "#F8696B",  # Red
-                                             'value': 0}
+    def __del__(self):
+        # safety net in case the manager is discarded without being closed (e.g. by the gRPC server)
+        if getattr(self, 'evaluation_pool', None) is not None:
+            self.evaluation_pool.terminate()
+            self.evaluation_pool = None
+            self.evaluation_design = None
+            self.release_shared_memory()
+
+    def get_evaluation_pool(self):
+        """
+        Returns the persistent pool of hamming evaluation workers, starting it up if not already available.
+        The slat array is sent to each worker once here, rather than with every candidate in every generation.
+        The candidate population is also moved into shared memory, so that workers can access candidates by index.
+        """
+        if self.evaluation_pool is None and self.evaluation_mode == 'threads':
+            # threads can access the population directly, so no shared memory is required
+            self.population_scores = np.zeros((self.evolution_population, len(shared_score_names)), dtype=np.float64)
+            self.evaluation_design = _create_evaluation_design(self.slat_array, self.slat_length, self.hamming_memory_budget,
+                                                               self.hamming_backend, self.next_candidates, self.population_scores,
+                                                               2 * self.generational_survivors, self.stage_profiling)
+            self.evaluation_pool = ThreadPool(processes=self.num_processes)
+        elif self.evaluation_pool is None:
+            population_shape = self.next_candidates.shape
+            self.population_memory = shared_memory.SharedMemory(create=True, size=self.next_candidates.nbytes)
+            self.score_memory = shared_memory.SharedMemory(create=True, size=population_shape[0] * len(shared_score_names) * 8)
+
+            shared_population = np.ndarray(population_shape, dtype=np.uint16, buffer=self.population_memory.buf)
+            shared_population[:] = self.next_candidates
+            self.next_candidates = shared_population
+            self.population_scores = np.ndarray((population_shape[0], len(shared_score_names)), dtype=np.float64,
+                                                buffer=self.score_memory.buf)
+
+            self.evaluation_pool = multiprocessing.Pool(processes=self.num_processes,
+                                                        initializer=_initialize_evaluation_worker,
+                                                        initargs=(self.slat_array, self.slat_length, self.hamming_memory_budget,
+                                                                  self.hamming_backend, self.population_memory.name, population_shape,
+                                                                  self.score_memory.name, 2 * self.generational_survivors,
+                                                                  self.stage_profiling))
+        return self.evaluation_pool
+
+    def release_shared_memory(self):
+        """
+        Moves the candidate population back into standard memory and frees up the shared memory blocks.
+        """
+        if self.population_memory is not None:
+            self.next_candidates = self.next_candidates.copy()
+            self.population_scores = None  # all views need to be removed before the shared memory can be closed
+            for memory_block in [self.population_memory, self.score_memory]:
+                memory_block.close()
+                memory_block.unlink()
+            self.population_memory = None
+            self.score_memory = None
+
+    def close(self):
+        """
+        Shuts down the persistent evaluation pool (if running).  The pool will be restarted if further evolution steps are requested.
+        Also waits for any background exports to be completed.
+        """
+        if self.export_executor is not None:
+            try:
+                self.wait_for_exports()
+            finally:
+                self.export_executor.shutdown()
+                self.export_executor = None
+        if self.evaluation_pool is not None:
+            self.evaluation_pool.close()
+            self.evaluation_pool.join()
+            self.evaluation_pool = None
+            self.evaluation_design = None
+            self.release_shared_memory()
+            # steady-state children still waiting to be processed are discarded (new ones are generated if evolution continues)
+            self.completed_evaluations = queue.Queue()
+            self.free_slots = list(range(self.steady_state_slots)) if len(self.elite_results) > 0 else []
 
     def initialize_evolution(self):
         """
@@ -122,7 +514,8 @@ class EvolveManager:
         if self.handle_array is not None:
             candidate_handle_arrays[0] = self.handle_array
 
-        return candidate_handle_arrays
+        # the population is stored as a single contiguous array, allowing it to be placed in shared memory
+        return np.array(candidate_handle_arrays, dtype=np.uint16)
 
     def single_evolution_step(self):
         """
@@ -141,23 +534,46 @@ class EvolveManager:
         # multiprocessing will be used to speed up overall computation and parallelize the hamming distance calculations
         # refer to the multirule_oneshot_hamming function for details on input arguments
 
+        # handle arrays which have already been scored (e.g. surviving parents) are retrieved from the cache instead
+        results = [None] * self.evolution_population
+        candidate_keys = [hashlib.sha256(candidate.tobytes()).hexdigest() for candidate in self.next_candidates]
+        for index, key in enumerate(candidate_keys):
+            if key in self.fitness_cache:
+                self.fitness_cache.move_to_end(key)
+                results[index] = self.fitness_cache[key]
+        evaluation_indices = [index for index, res in enumerate(results) if res is None]
+
         multiprocess_start = time.time()
-        with multiprocessing.Pool(processes=self.num_processes) as pool:
-            results = pool.starmap(multirule_oneshot_hamming,
-                                   [(self.slat_array, self.next_candidates[j], True, True, None, True, self.slat_length)
-                                    for j in range(self.evolution_population)])
+        pool_startup_time = 0
+        if len(evaluation_indices) > 0:
+            evaluation_pool = self.get_evaluation_pool()
+            pool_startup_time = time.time() - multiprocess_start
+            worst_combinations = evaluation_pool.starmap(_evaluate_population_member,
+                                                         [(index, self.candidate_parents[index], self.evaluation_design)
+                                                          for index in evaluation_indices])
+        else:
+            worst_combinations = []
         multiprocess_time = time.time() - multiprocess_start
 
-        # Unpack and store results from multiprocessing
+        # Unpack and store results from multiprocessing (numerical scores are available directly in shared memory)
+        stage_metrics = defaultdict(float)
+        for index, worst_combination_dict in zip(evaluation_indices, worst_combinations):
+            for name, value in worst_combination_dict.pop('Stage metrics', {}).items():
+                stage_metrics[name] += value
+            res = {name: self.population_scores[index, col] for col, name in enumerate(shared_score_names)}
+            res.update(worst_combination_dict)
+            results[index] = res
+            if self.fitness_cache_size > 0:
+                self.fitness_cache[candidate_keys[index]] = res
+                if len(self.fitness_cache) > self.fitness_cache_size:
+                    self.fitness_cache.popitem(last=False)
+
         for index, res in enumerate(results):
             physical_scores[index] = res['Physics-Informed Partition Score']
             hammings[index] = res['Universal']
             duplicate_risk_scores[index] = res['Substitute Risk']
             hallofshame['handles'].append(res['Worst combinations handle IDs'])
             hallofshame['antihandles'].append(res['Worst combinations antihandle IDs'])
-            if self.current_generation == 1:
-                self.initial_hallofshame['handles'].append(res['Worst combinations handle IDs'])
-                self.initial_hallofshame['antihandles'].append(res['Worst combinations antihandle IDs'])
 
         # compare and find the individual with the best hamming distance i.e. the largest one. Note: there might be several
         max_physics_score_of_population = -np.max(physical_scores)
@@ -170,42 +586,285 @@ class EvolveManager:
         # All other metrics should match the specific handle array that has the best physics score
         self.metrics['Corresponding Duplicate Risk Score'].append(duplicate_risk_scores[np.argmax(physical_scores)])
         self.metrics['Hamming Compute Time'].append(multiprocess_time)
+        self.metrics['Pool Startup Time'].append(pool_startup_time)
+        self.metrics['Fitness Cache Hit Rate'].append((self.evolution_population - len(evaluation_indices)) / self.evolution_population)
+        if self.stage_profiling:  # worker times are summed, so can add up to more than the hamming compute time
+            for name in evaluation_stage_metric_names:
+                self.metrics[name].append(stage_metrics[name])
 
+        similarity_start = time.time()
         similarity_scores = []
         for candidate in self.next_candidates:
             for initial_candidate in self.initial_candidates:
                 similarity_scores.append(np.sum(candidate == initial_candidate))
 
         self.metrics['Similarity Score'].append(sum(similarity_scores) / len(similarity_scores))
+        self.metrics['Similarity Time'].append(time.time() - similarity_start)
+        self.metrics['Export Time'].append(self.pending_export_time)  # exports are carried out in between generations
+        self.pending_export_time = 0
 
-        self.handle_array = self.next_candidates[np.argmax(physical_scores)] # stores intermediate best array
+        self.handle_array = self.next_candidates[np.argmax(physical_scores)].copy() # stores intermediate best array
 
-        candidate_handle_arrays, mutation_maps = mutate_handle_arrays(self.slat_array, self.next_candidates,
-                                                                     hallofshame=hallofshame,
-                                                                     memory_hallofshame=self.memory_hallofshame,
-                                                                     memory_best_parent_hallofshame=self.memory_best_parent_hallofshame,
-                                                                     best_score_indices=indices_of_largest_scores,
-                                                                     unique_sequences=self.number_unique_handles,
-                                                                     mutation_rate=self.mutation_rate,
-                                                                     use_memory_type=self.mutation_memory_system,
-                                                                     special_hallofshame=self.initial_hallofshame,
-                                                                     mutation_type_probabilities=self.mutation_type_probabilities,
-                                                                     split_sequence_handles=self.split_sequence_handles)
+        mutation_start = time.time()
+        # the new generation is written directly into the existing (shared) population buffer
+        _, mutation_maps, parent_indices = self.mutator.mutate(self.next_candidates, hallofshame, indices_of_largest_scores,
+                                                               out=self.next_candidates)
+        if self.incremental_evaluation:
+            self.candidate_parents = [None] * self.generational_survivors + parent_indices.tolist()
+        self.metrics['Mutation Time'].append(time.time() - mutation_start)
 
-        for key, payload in hallofshame.items():
-            self.memory_hallofshame[key].extend(payload)
-            self.memory_best_parent_hallofshame[key].extend([payload[i] for i in indices_of_largest_scores])
 
-        if len(self.memory_hallofshame['handles']) > self.hall_of_shame_memory * self.evolution_population:
-            for key in self.memory_hallofshame.keys():
-                self.memory_hallofshame[key] = self.memory_hallofshame[key][-self.hall_of_shame_memory * self.evolution_population:]
-                self.memory_best_parent_hallofshame[key] = self.memory_best_parent_hallofshame[key][-self.hall_of_shame_memory * self.generational_survivors:]
+    def evolution_step(self):
+        """
+        Performs a single evolution step (generation) with the selected evolution mode.
+        :return: N/A
+        """
+        if self.evolution_mode == 'steady_state':
+            self.steady_state_evolution_step()
+        else:
+            self.single_evolution_step()
 
-        self.next_candidates = candidate_handle_arrays
+    def _complete_evaluation(self, slot, key, result):
+        """
+        Called by the evaluation pool once a steady-state child has been scored (or its evaluation has failed).
+        """
+        self.completed_evaluations.put((slot, key, result, False))
 
+    def update_elite_pool(self, candidate, key, res):
+        """
+        Adds a scored candidate to the steady-state elite pool, if the pool is not yet full or the candidate scores
+        better than the worst elite (which it then replaces).
+        :param candidate: Candidate handle array
+        :param key: Hash of the candidate handle array
+        :param res: Scores of the candidate (refer to multirule_oneshot_hamming)
+        :return: True if the candidate was added to the pool
+        """
+        if key in self.elite_keys:
+            return False
+        if len(self.elite_results) < self.elite_pool_size:
+            self.elite_arrays.append(candidate.copy())
+            self.elite_results.append(res)
+            self.elite_keys.append(key)
+            return True
+        worst_index = int(np.argmin([elite['Physics-Informed Partition Score'] for elite in self.elite_results]))
+        if res['Physics-Informed Partition Score'] <= self.elite_results[worst_index]['Physics-Informed Partition Score']:
+            return False
+        self.elite_arrays[worst_index] = candidate.copy()
+        self.elite_results[worst_index] = res
+        self.elite_keys[worst_index] = key
+        return True
 
-    def export_results(self, main_folder_path=None, generate_unique_folder_name=True):
+    def submit_steady_state_children(self, parent_arrays, hallofshame, parent_indices):
+        """
+        Generates a new child for each free population slot and sends it off for evaluation.
+        Children with cached scores are marked as completed straight away.
+        :param parent_arrays: Stacked handle arrays from which the parents are selected
+        :param hallofshame: Worst handle/antihandle combinations of the parent arrays
+        :param parent_indices: Indices of the parents within the parent arrays
+        :return: N/A
+        """
+        slots = self.free_slots
+        if len(slots) == 0:
+            return
+        self.free_slots = []
+        children, _, _ = self.mutator.mutate(parent_arrays, hallofshame, parent_indices, child_count=len(slots), remember=False)
+        for slot, child in zip(slots, children[len(parent_indices):]):
+            self.next_candidates[slot] = child
+            key = hashlib.sha256(child.tobytes()).hexdigest()
+            if key in self.fitness_cache:
+                self.fitness_cache.move_to_end(key)
+                self.completed_evaluations.put((slot, key, self.fitness_cache[key], True))
+            else:
+                self.evaluation_pool.apply_async(_evaluate_population_member, (slot, None, self.evaluation_design),
+                                                 callback=partial(self._complete_evaluation, slot, key),
+                                                 error_callback=partial(self._complete_evaluation, slot, key))
 
+    def steady_state_evolution_step(self):
+        """
+        Performs a single steady-state evolution step, which lasts until evolution_population further children have been
+        evaluated.  Workers are never left waiting for the rest of the population: each child is added to the elite pool
+        (if good enough) as soon as it has been scored, and a new child is generated from the current elites in its place.
+        The first step evaluates the initial population in full, to set up the elite pool.
+        :return: N/A
+        """
+        self.current_generation += 1
+        step_start = time.time()
+        evaluation_pool = self.get_evaluation_pool()
+        pool_startup_time = time.time() - step_start
+
+        stage_metrics = defaultdict(float)
+        block_hallofshame = defaultdict(list)
+        block_scores = []
+        cache_hits = 0
+        mutation_time = 0
+        evaluation_count = 0
+
+        first_generation = len(self.elite_results) == 0
+        if first_generation:
+            candidate_keys = [hashlib.sha256(candidate.tobytes()).hexdigest() for candidate in self.next_candidates]
+            worst_combinations = evaluation_pool.starmap(_evaluate_population_member,
+                                                         [(index, None, self.evaluation_design)
+                                                          for index in range(self.evolution_population)])
+            completions = [(index, key, worst_combination_dict, False) for index, (key, worst_combination_dict)
+                           in enumerate(zip(candidate_keys, worst_combinations))]
+        else:
+            completions = []
+            if len(self.free_slots) > 0:  # e.g. if the evaluation pool was shut down in between steps
+                mutation_start = time.time()
+                self.submit_steady_state_children(np.array(self.elite_arrays), self.get_elite_hallofshame(),
+                                                  np.arange(len(self.elite_arrays)))
+                mutation_time += time.time() - mutation_start
+
+        while True:
+            for slot, key, result, cached in completions:
+                if cached:
+                    res = result
+                    cache_hits += 1
+                else:
+                    if isinstance(result, BaseException):
+                        raise result
+                    for name, value in result.pop('Stage metrics', {}).items():
+                        stage_metrics[name] += value
+                    res = {name: self.population_scores[slot, col] for col, name in enumerate(shared_score_names)}
+                    res.update(result)
+                    if self.fitness_cache_size > 0:
+                        self.fitness_cache[key] = res
+                        if len(self.fitness_cache) > self.fitness_cache_size:
+                            self.fitness_cache.popitem(last=False)
+                self.update_elite_pool(self.next_candidates[slot], key, res)
+                block_hallofshame['handles'].append(res['Worst combinations handle IDs'])
+                block_hallofshame['antihandles'].append(res['Worst combinations antihandle IDs'])
+                block_scores.append(res['Physics-Informed Partition Score'])
+                if not first_generation:
+                    self.free_slots.append(slot)
+            evaluation_count += len(completions)
+
+            # new children are generated for the freed up slots straight away, from the current elites
+            mutation_start = time.time()
+            if first_generation:  # parents are selected from the whole initial population, as in generational mode
+                self.free_slots = list(range(self.steady_state_slots))
+                self.submit_steady_state_children(self.next_candidates, block_hallofshame,
+                                                  np.argpartition(block_scores, -self.elite_pool_size)[-self.elite_pool_size:])
+            else:
+                self.submit_steady_state_children(np.array(self.elite_arrays), self.get_elite_hallofshame(),
+                                                  np.arange(len(self.elite_arrays)))
+            mutation_time += time.time() - mutation_start
+
+            if evaluation_count >= self.evolution_population:
+                break
+
+            # waits for at least one child to be scored, then picks up any others that have also completed
+            completions = [self.completed_evaluations.get()]
+            while True:
+                try:
+                    completions.append(self.completed_evaluations.get_nowait())
+                except queue.Empty:
+                    break
+
+        # the hall of shame of all children evaluated in this step is remembered together, as for a generation
+        if self.mutator.use_memory_type in ['all', 'best_memory']:
+            valid_positions = self.elite_arrays[0].ravel() > 0
+            survivor_count = min(self.generational_survivors, len(block_scores))
+            self.mutator.remember({kind: self.mutator.encode_hallofshame(block_hallofshame[kind], kind, valid_positions)
+                                   for kind in self.mutator.slat_positions},
+                                  np.argpartition(block_scores, -survivor_count)[-survivor_count:])
+
+        best_elite = int(np.argmax([elite['Physics-Informed Partition Score'] for elite in self.elite_results]))
+        best_result = self.elite_results[best_elite]
+        self.metrics['Best (Log) Physics-Based Score'].append(np.log(-best_result['Physics-Informed Partition Score']))
+        self.metrics['Corresponding Hamming Distance'].append(best_result['Universal'])
+        self.metrics['Corresponding Duplicate Risk Score'].append(best_result['Substitute Risk'])
+        self.metrics['Hamming Compute Time'].append(time.time() - step_start - mutation_time)
+        self.metrics['Pool Startup Time'].append(pool_startup_time)
+        self.metrics['Fitness Cache Hit Rate'].append(cache_hits / evaluation_count)
+        if self.stage_profiling:
+            for name in evaluation_stage_metric_names:
+                self.metrics[name].append(stage_metrics[name])
+
+        similarity_start = time.time()
+        similarity_scores = []
+        for elite in self.elite_arrays:
+            for initial_candidate in self.initial_candidates:
+                similarity_scores.append(np.sum(elite == initial_candidate))
+
+        self.metrics['Similarity Score'].append(sum(similarity_scores) / len(similarity_scores))
+        self.metrics['Similarity Time'].append(time.time() - similarity_start)
+        self.metrics['Export Time'].append(self.pending_export_time)
+        self.pending_export_time = 0
+
+        self.handle_array = self.elite_arrays[best_elite].copy()
+        self.metrics['Mutation Time'].append(mutation_time)
+
+    def get_elite_hallofshame(self):
+        """
+        Gathers the worst handle/antihandle combinations of each member of the steady-state elite pool.
+        :return: Dictionary with a list of entries for 'handles' and 'antihandles'
+        """
+        return {'handles': [elite['Worst combinations handle IDs'] for elite in self.elite_results],
+                'antihandles': [elite['Worst combinations antihandle IDs'] for elite in self.elite_results]}
+
+    def get_export_executor(self):
+        """
+        Returns the background thread used to write exports, starting it up if not already available.
+        A single thread is used, so that exports are always written in the order in which they were requested.
+        """
+        if self.export_executor is None:
+            self.export_executor = ThreadPoolExecutor(max_workers=1)
+        return self.export_executor
+
+    def submit_export(self, function, *args, background=True):
+        """
+        Runs an export function in the background (or straight away if background exports are disabled).
+        All arguments should be snapshots, as the evolution continues while the export is being written.
+        :param function: Export function to run
+        :param args: Arguments for the export function
+        :param background: Set to false to always run the export straight away (after any pending background exports,
+        so that files are still written in order)
+        :return: N/A
+        """
+        if self.background_export and background:
+            self.pending_exports.append(self.get_export_executor().submit(function, *args))
+        else:
+            self.wait_for_exports()
+            function(*args)
+
+    def wait_for_exports(self):
+        """
+        Waits for all background exports to be written to file (any errors in the exports are raised here).
+        :return: N/A
+        """
+        pending_exports = self.pending_exports
+        self.pending_exports = []
+        for export in pending_exports:
+            export.result()
+
+    def log_metrics(self):
+        """
+        Appends the metrics of all generations not yet logged to the metrics.csv file in the log tracking directory.
+        The file is re-written from scratch on the first call, so that the logs of any previous run are replaced.
+        :return: N/A
+        """
+        export_start = time.time()
+        logged_generations = self.logged_generations
+        new_metrics = {name: list(values[logged_generations:]) for name, values in self.metrics.items()}
+        self.logged_generations = len(self.metrics['Corresponding Hamming Distance'])
+        create_dir_if_empty(self.log_tracking_directory)
+        self.submit_export(save_list_dict_to_file, self.log_tracking_directory, 'metrics.csv', new_metrics, None,
+                           logged_generations > 0)
+        self.pending_export_time += time.time() - export_start
+
+    def export_results(self, main_folder_path=None, generate_unique_folder_name=True, background=False):
+        """
+        Exports a full report of the evolution so far: a plot of the main metrics (PDF), all metrics (CSV) and the
+        current best handle array (Excel).  The report has been fully written once this returns, unless a background
+        export is requested (for periodic exports during the evolution).
+        :param main_folder_path: Folder in which to create an output folder (defaults to the log tracking directory)
+        :param generate_unique_folder_name: Set to true to give the output folder a unique, time-stamped name
+        :param background: Set to true to write the report in the background from a snapshot of the current results,
+        so that the evolution can continue straight away (only applies if background exports are enabled)
+        :return: N/A
+        """
+        export_start = time.time()
         if main_folder_path:
             if generate_unique_folder_name:
                 output_folder = os.path.join(main_folder_path, f"evolution_results_{time.strftime('%Y%m%d_%H%M%S')}")
@@ -213,67 +872,170 @@ class EvolveManager:
                 output_folder = os.path.join(main_folder_path, 'evolution_results')
         else:
             output_folder = self.log_tracking_directory
+            # the full metrics file written here replaces the log, which then continues on from this point
+            self.logged_generations = len(self.metrics['Corresponding Hamming Distance'])
 
         create_dir_if_empty(output_folder)
 
-        fig, ax = plt.subplots(5, 1, figsize=(10, 10))
-
-        for ind, (name, data) in enumerate(zip(['Candidate with Best Log Physics-Based Partition Score',
-                                                'Corresponding Hamming Distance',
-                                                'Corresponding Duplication Risk Score',
-                                                'Similarity of Population to Initial Candidates',
-                                                'Hamming Compute Time (s)'],
-                                               [self.metrics['Best (Log) Physics-Based Score'],
-                                                self.metrics['Corresponding Hamming Distance'],
-                                                self.metrics['Corresponding Duplicate Risk Score'],
-                                                self.metrics['Similarity Score'],
-                                                self.metrics['Hamming Compute Time']])):
-
-            ax[ind].plot(range(1, len(data)+1), data, linestyle='--', marker='o')
-            ax[ind].set_xlabel('Generation')
-            ax[ind].set_ylabel('Measurement')
-            ax[ind].set_title(name)
-            ax[ind].xaxis.set_major_locator(ticker.MaxNLocator(integer=True))
-
-        plt.tight_layout()
-        plt.savefig(os.path.join(output_folder, 'metrics_visualization.pdf'))
-        plt.close(fig)
-
-        # saves the metrics to a csv file for downstream analysis/plotting
-        save_list_dict_to_file(output_folder, 'metrics.csv', self.metrics, append=False)
-
-        writer = pd.ExcelWriter(
-            os.path.join(output_folder, f'best_handle_array_generation_{self.current_generation}.xlsx'),
-            engine='xlsxwriter')
-
-        # prints out slat dataframes in standard format
-        for layer_index in range(self.handle_array.shape[-1]):
-            df = pd.DataFrame(self.handle_array[..., layer_index])
-            df.to_excel(writer, sheet_name=f'handle_interface_{layer_index + 1}', index=False, header=False)
-            # Apply conditional formatting for easy color-based identification
-            writer.sheets[f'handle_interface_{layer_index + 1}'].conditional_format(0, 0, df.shape[0],
-                                                                                    df.shape[1] - 1,
-                                                                                    self.excel_conditional_formatting)
-        writer.close()
+        self.submit_export(export_evolution_report, output_folder, {name: list(values) for name, values in self.metrics.items()},
+                           self.handle_array.copy(), self.current_generation, self.excel_conditional_formatting,
+                           background=background)
+        self.pending_export_time += time.time() - export_start
+
+    def save_checkpoint(self, checkpoint_file=None):
+        """
+        Saves the full state of the evolution (population, hall of shame memories, fitness cache, initial candidates, metrics,
+        generation counter and random number generator state) to a single npz file, from which the run can be resumed.
+        :param checkpoint_file: Path of the checkpoint file (defaults to evolution_checkpoint.npz in the log tracking directory)
+        :return: Path of the checkpoint file
+        """
+        if checkpoint_file is None:
+            checkpoint_file = os.path.join(self.log_tracking_directory, 'evolution_checkpoint.npz')
+
+        rng_name, rng_keys, rng_position, rng_has_gauss, rng_cached_gaussian = np.random.get_state()
+        metric_names = list(self.metrics.keys())
+        checkpoint = {'population': self.next_candidates,
+                      'initial_candidates': self.initial_candidates,
+                      'handle_array': np.zeros(0, dtype=np.uint16) if self.handle_array is None else self.handle_array,
+                      'candidate_parents': np.array([-1 if parent is None else parent for parent in self.candidate_parents], dtype=np.int64),
+                      'current_generation': np.int64(self.current_generation),
+                      'metric_names': np.array(metric_names, dtype=str),
+                      'metric_values': np.array([self.metrics[name] for name in metric_names], dtype=np.float64),
+                      'rng_name': np.array(rng_name, dtype=str),
+                      'rng_keys': rng_keys,
+                      'rng_position': np.int64(rng_position),
+                      'rng_has_gauss': np.int64(rng_has_gauss),
+                      'rng_cached_gaussian': np.float64(rng_cached_gaussian)}
+        checkpoint.update(self.mutator.get_memory_state())
+        checkpoint.update(self.get_fitness_cache_state())
+
+        # the checkpoint is written to a temporary file first, so that an interruption never leaves a corrupted checkpoint behind
+        temp_file = checkpoint_file + '.tmp'
+        with open(temp_file, 'wb') as f:
+            np.savez(f, **checkpoint)
+        os.replace(temp_file, checkpoint_file)
+        return checkpoint_file
+
+    def get_fitness_cache_state(self):
+        """
+        Packs the fitness cache into flat arrays (e.g. for storage in a checkpoint).  Worst combinations are stored as
+        indices into the design's handle/antihandle slat lists, and the entries of all arrays are concatenated.
+        :return: Dictionary of arrays (the cache entries are kept in their least-recently used order)
+        """
+        handle_positions = {key: index for index, key in enumerate(self.slat_index.handle_keys)}
+        antihandle_positions = {key: index for index, key in enumerate(self.slat_index.antihandle_keys)}
+        results = list(self.fitness_cache.values())
+        return {'fitness_cache_keys': np.array(list(self.fitness_cache.keys()), dtype=str),
+                'fitness_cache_scores': np.array([[res[name] for name in shared_score_names] for res in results],
+                                                 dtype=np.float64).reshape(-1, len(shared_score_names)),
+                'fitness_cache_worst_handles': np.array([handle_positions[key] for res in results
+                                                         for key in res['Worst combinations handle IDs']], dtype=np.int64),
+                'fitness_cache_worst_antihandles': np.array([antihandle_positions[key] for res in results
+                                                             for key in res['Worst combinations antihandle IDs']], dtype=np.int64),
+                'fitness_cache_worst_lengths': np.array([len(res['Worst combinations handle IDs']) for res in results], dtype=np.int64)}
+
+    def load_fitness_cache_state(self, state):
+        """
+        Restores the fitness cache from arrays generated by get_fitness_cache_state.
+        :param state: Dictionary of fitness cache arrays
+        :return: N/A
+        """
+        boundaries = np.cumsum(state['fitness_cache_worst_lengths'])[:-1]
+        worst_handles = np.split(state['fitness_cache_worst_handles'], boundaries)
+        worst_antihandles = np.split(state['fitness_cache_worst_antihandles'], boundaries)
+        self.fitness_cache = OrderedDict()
+        for key, scores, handle_indices, antihandle_indices in zip(state['fitness_cache_keys'], state['fitness_cache_scores'],
+                                                                   worst_handles, worst_antihandles):
+            res = {name: score for name, score in zip(shared_score_names, scores)}
+            res['Worst combinations handle IDs'] = [self.slat_index.handle_keys[index] for index in handle_indices]
+            res['Worst combinations antihandle IDs'] = [self.slat_index.antihandle_keys[index] for index in antihandle_indices]
+            self.fitness_cache[str(key)] = res
+
+    def load_checkpoint(self, checkpoint_file):
+        """
+        Restores the state of the evolution from a checkpoint file (from save_checkpoint).
+        :param checkpoint_file: Path of the checkpoint file
+        :return: N/A
+        """
+        with np.load(checkpoint_file) as checkpoint:
+            if checkpoint['population'].shape != self.next_candidates.shape:
+                raise ValueError(f'The checkpoint population has shape {checkpoint["population"].shape}, '
+                                 f'but the evolution population has shape {self.next_candidates.shape}.')
+
+            # the population buffer is re-used, as it could be shared with the evaluation workers
+            self.next_candidates[:] = checkpoint['population']
+            self.initial_candidates = checkpoint['initial_candidates'].copy()
+            self.handle_array = checkpoint['handle_array'].copy() if checkpoint['handle_array'].size > 0 else None
+            self.candidate_parents = [None if parent < 0 else int(parent) for parent in checkpoint['candidate_parents']]
+            self.current_generation = int(checkpoint['current_generation'])
+            self.logged_generations = 0  # the metrics log is re-written in full from the restored metrics
+
+            self.metrics = defaultdict(list)
+            for name, values in zip(checkpoint['metric_names'], checkpoint['metric_values']):
+                self.metrics[str(name)] = list(values)
+
+            self.mutator.load_memory_state(checkpoint)
+            if 'fitness_cache_keys' in checkpoint.files:  # not available in older checkpoints
+                self.load_fitness_cache_state(checkpoint)
+
+            np.random.set_state((str(checkpoint['rng_name']), checkpoint['rng_keys'], int(checkpoint['rng_position']),
+                                 int(checkpoint['rng_has_gauss']), float(checkpoint['rng_cached_gaussian'])))
+
+    def select_migrants(self, migrant_count):
+        """
+        Selects the candidates to send to other populations (e.g. in an island model).  These are the survivors of the
+        latest generation, with the current best handle array first.
+        :param migrant_count: Number of candidates to select (capped at the number of survivors)
+        :return: Array of migrant handle arrays i.e. (migrants, X, Y, layers - 1)
+        """
+        survivors = self.next_candidates[:self.generational_survivors]
+        if self.handle_array is None:  # no generations run yet
+            return survivors[:migrant_count].copy()
+        best_index = next((index for index, survivor in enumerate(survivors) if np.array_equal(survivor, self.handle_array)), 0)
+        order = [best_index] + [index for index in range(len(survivors)) if index != best_index]
+        return survivors[order[:migrant_count]].copy()
+
+    def insert_migrants(self, migrants):
+        """
+        Inserts candidates from other populations into the next generation.  Migrants replace the last mutated
+        children of the population (survivors are never replaced), and are fully evaluated in the next generation.
+        :param migrants: Array of migrant handle arrays i.e. (migrants, X, Y, layers - 1)
+        :return: Number of migrants inserted
+        """
+        migrant_count = min(len(migrants), self.evolution_population - self.generational_survivors)
+        if migrant_count == 0:
+            return 0
+        self.next_candidates[-migrant_count:] = migrants[:migrant_count]
+        self.candidate_parents[-migrant_count:] = [None] * migrant_count
+        return migrant_count
 
     def run_full_experiment(self, logging_interval=10):
         """
         Runs a full evolution experiment.
-        :param logging_interval: The frequency at which logs should be written to file (including the best hamming array file).
+        :param logging_interval: The frequency (in generations) at which new metrics are appended to the metrics log.
+        The full report (including the metrics plot and the best handle array file) is exported at the end of the experiment.
         """
         if self.log_tracking_directory is None:
             raise ValueError('Log tracking directory must be specified to run an automatic full experiment.')
-        with tqdm(total=self.max_evolution_generations - self.current_generation, desc='Evolution Progress', miniters=self.progress_bar_update_iterations) as pbar:
-            for index, generation in enumerate(range(self.current_generation, self.max_evolution_generations)):
-                self.single_evolution_step()
-                if (index+1) % logging_interval == 0:
-                    self.export_results()
-
-                pbar.update(1)
-                pbar.set_postfix({f'Latest hamming score': self.metrics['Corresponding Hamming Distance'][-1],
-                                  'Time for hamming calculation': self.metrics['Hamming Compute Time'][-1],
-                                  'Latest log physics partition score': self.metrics['Best (Log) Physics-Based Score'][-1]}, refresh=False)
-
-                if self.early_hamming_stop and max(self.metrics['Corresponding Hamming Distance']) >= self.early_hamming_stop:
-                    break
+        try:
+            with tqdm(total=self.max_evolution_generations - self.current_generation, desc='Evolution Progress', miniters=self.progress_bar_update_iterations) as pbar:
+                for index, generation in enumerate(range(self.current_generation, self.max_evolution_generations)):
+                    self.evolution_step()
+                    if (index+1) % logging_interval == 0:
+                        self.log_metrics()
+                    if self.checkpoint_interval and self.current_generation % self.checkpoint_interval == 0:
+                        self.save_checkpoint()
+
+                    pbar.update(1)
+                    pbar.set_postfix({f'Latest hamming score': self.metrics['Corresponding Hamming Distance'][-1],
+                                      'Time for hamming calculation': self.metrics['Hamming Compute Time'][-1],
+                                      'Latest log physics partition score': self.metrics['Best (Log) Physics-Based Score'][-1]}, refresh=False)
+
+                    if self.early_hamming_stop and max(self.metrics['Corresponding Hamming Distance']) >= self.early_hamming_stop:
+                        break
+            self.export_results()
+            if self.checkpoint_interval:
+                self.save_checkpoint()
+        finally:
+            self.close()
 
@@ -33,28 +33,32 @@ class OptunaEvolveManager(EvolveManager):
         """
         if self.log_tracking_directory is None:
             raise ValueError('Log tracking directory must be specified to run an automatic full experiment.')
-        with tqdm(total=self.max_evolution_generations - self.current_generation, desc='Evolution Progress', miniters=self.progress_bar_update_iterations) as pbar:
-            for index, generation in enumerate(range(self.current_generation, self.max_evolution_generations)):
+        try:
+            with tqdm(total=self.max_evolution_generations - self.current_generation, desc='Evolution Progress', miniters=self.progress_bar_update_iterations) as pbar:
+                for index, generation in enumerate(range(self.current_generation, self.max_evolution_generations)):
 
-                self.single_evolution_step()
-                self.optuna_trial.report(self.metrics['Best (Log) Physics-Based Score'][-1], generation)
+                    self.single_evolution_step()
+                    self.optuna_trial.report(self.metrics['Best (Log) Physics-Based Score'][-1], generation)
 
-                if index % logging_interval == 0:
-                    self.export_results()
+                    if index % logging_interval == 0:
+                        self.export_results(background=True)
 
-                pbar.update(1)
-                pbar.set_postfix({f'Latest hamming score': self.metrics['Corresponding Hamming Distance'][-1],
-                                  'Time for hamming calculation': self.metrics['Hamming Compute Time'][-1],
-                                  'Latest log physics partition score': self.metrics['Best (Log) Physics-Based Score'][-1]}, refresh=False)
+                    pbar.update(1)
+                    pbar.set_postfix({f'Latest hamming score': self.metrics['Corresponding Hamming Distance'][-1],
+                                      'Time for hamming calculation': self.metrics['Hamming Compute Time'][-1],
+                                      'Latest log physics partition score': self.metrics['Best (Log) Physics-Based Score'][-1]}, refresh=False)
 
-                if self.early_hamming_stop and max(self.metrics['Corresponding Hamming Distance']) >= self.early_hamming_stop:
-                    break
+                    if self.early_hamming_stop and max(self.metrics['Corresponding Hamming Distance']) >= self.early_hamming_stop:
+                        break
 
-                # Optuna can 'prune' i.e. stop a trial early if it thinks the trajectory is already very slow
-                if self.optuna_trial.should_prune():
-                    with open(os.path.join(self.log_tracking_directory, 'trial_pruned.txt'), 'w') as f:
-                        f.write(f'Trial was pruned at generation {generation}')
-                    raise optuna.TrialPruned()
+                    # Optuna can 'prune' i.e. stop a trial early if it thinks the trajectory is already very slow
+                    if self.optuna_trial.should_prune():
+                        with open(os.path.join(self.log_tracking_directory, 'trial_pruned.txt'), 'w') as f:
+                            f.write(f'Trial was pruned at generation {generation}')
+                        raise optuna.TrialPruned()
+        finally:
+            # background exports are completed and the evaluation pool is shut down before the trial ends
+            self.close()
 
 
 
@@ -1,138 +1,337 @@
 import numpy as np
-import random
 
+from crisscross.assembly_handle_optimization.hamming_compute import SlatIndex
 
-def mutate_handle_arrays(slat_array, candidate_handle_arrays,
-                         hallofshame, best_score_indices, unique_sequences=32,
-                         memory_hallofshame=None, memory_best_parent_hallofshame=None,
-                         special_hallofshame=None,
-                         mutation_rate=2.0, mutation_type_probabilities=(0.425, 0.425, 0.15),
-                         use_memory_type=None,
-                         split_sequence_handles=False):
+
+def sample_without_replacement(population_sizes, sample_sizes):
     """
-    Mutates (randomizes handles) a set of candidate arrays into a new generation,
-    while retaining the best scoring arrays  from the previous generation.
-    :param slat_array: Base slat array for design
-    :param candidate_handle_arrays: Set of candidate handle arrays from previous generation
-    :param hallofshame: Worst handle/antihandle combinations from previous generation
-    :param memory_hallofshame: List of all the worst handle/antihandle combinations from previous generations
-    :param memory_best_parent_hallofshame: List of the worst handle/antihandle combinations from previous generations (only the ones linked to the best parents)
-    :param special_hallofshame: List of special handle/antihandle combinations from previous generations
-    :param best_score_indices: The indices of the best scoring arrays from the previous generation
-    :param unique_sequences: Total length of handle library available
-    :param mutation_rate: The expected number of mutations per cycle
-    :param mutation_type_probabilities: Probability of selecting a specific mutation type for a target handle/antihandle
-    (either handle, antihandle or mixed mutations)
-    :param split_sequence_handles: Set to true if the handle library needs to be split between subsequent layers
-    :return: New generation of handle arrays to be screened
+    Draws samples (without replacement) from several populations at once.
+    Indices are drawn at random and only the (rare) duplicates are re-drawn, which avoids sorting the populations.
+    Populations where most of the members are required are instead sampled via a permutation.
+    :param population_sizes: Array containing the size of each population
+    :param sample_sizes: Array containing the number of samples to draw from each population
+    :return: Population index and member index (within the population) of each sample
     """
+    sample_populations = np.repeat(np.arange(len(population_sizes)), sample_sizes)
+    sample_members = (np.random.random(len(sample_populations)) * population_sizes[sample_populations]).astype(np.int64)
 
-    # These are the arrays that will be mutated
-    mutated_handle_arrays = []
+    dense_populations = np.flatnonzero(2 * sample_sizes > population_sizes)
+    dense_samples = np.isin(sample_populations, dense_populations)
+    for population in dense_populations:
+        sample_members[sample_populations == population] = np.random.permutation(population_sizes[population])[:sample_sizes[population]]
 
-    # These are the arrays that will be the mutation sources
-    parent_handle_arrays = [candidate_handle_arrays[i] for i in best_score_indices]
+    while True:
+        sample_keys = sample_populations * population_sizes.max(initial=0) + sample_members
+        _, first_samples = np.unique(sample_keys, return_index=True)
+        duplicates = np.ones(len(sample_keys), dtype=bool)
+        duplicates[first_samples] = False
+        duplicates &= ~dense_samples
+        if not np.any(duplicates):
+            return sample_populations, sample_members
+        sample_members[duplicates] = (np.random.random(np.sum(duplicates)) * population_sizes[sample_populations[duplicates]]).astype(np.int64)
 
-    # these are the combinations that had the worst scores in the previous generation
-    parent_hallofshame_handles = [hallofshame['handles'][i] for i in best_score_indices]
-    parent_hallofshame_antihandles = [hallofshame['antihandles'][i] for i in best_score_indices]
 
-    # number of arrays to generate
-    generation_array_count = len(candidate_handle_arrays)
-    parent_array_count = len(parent_handle_arrays)
+class HallOfShameMemory:
+    """
+    Fixed-size ring buffer of hall of shame entries (the handle positions linked to a candidate's worst slat combinations).
+    Once full, new entries overwrite the oldest ones, so the memory never needs to be re-sliced.
+    """
 
-    # mask to prevent the assigning of a handle in areas where none should be placed (zeros)
-    mask = candidate_handle_arrays[0] > 0
+    def __init__(self, capacity):
+        """
+        :param capacity: Maximum number of entries to retain
+        """
+        self.capacity = int(capacity)
+        self.entries = np.empty(self.capacity, dtype=object)
+        self.size = 0
+        self.next_index = 0
 
-    # all parents are members of the next generation and survive
-    mutated_handle_arrays.extend(parent_handle_arrays)
+    def __len__(self):
+        return self.size
 
-    mutation_maps = []
+    def extend(self, entries):
+        """
+        Adds entries to the memory, overwriting the oldest entries if full.
+        :param entries: List of entries to add
+        :return: N/A
+        """
+        if self.capacity == 0:
+            return
+        for entry in entries:
+            self.entries[self.next_index] = entry
+            self.next_index = (self.next_index + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
 
-    # applies a normalization just in case the input values do not sum to 1
-    normalized_mutation_probabilities = [m/sum(mutation_type_probabilities) for m in mutation_type_probabilities]
+    def contents(self):
+        """
+        :return: List of all entries in the memory, from oldest to newest
+        """
+        if self.size < self.capacity:
+            return list(self.entries[:self.size])
+        return list(np.roll(self.entries, -self.next_index))
 
-    # prepares masks for each new candidate to allow mutations to occur in select areas
-    for i in range(parent_array_count, generation_array_count):
 
-        # pick someone to mutate
-        pick = np.random.randint(0, parent_array_count)
-        mother = parent_handle_arrays[pick].copy()
-        random_choice = np.random.choice(['mutate handles', 'mutate antihandles', 'mutate anywhere'],
-                                         p=normalized_mutation_probabilities)
+class HandleMutator:
+    """
+    Batched mutation engine, which produces an entire new generation of handle arrays in one go.
+    The handle positions of every slat are found once for the design, candidates are stacked into a single array
+    and the mutation types, parents and mutated positions of all children are sampled together.
+    Hall of shame memories are retained in fixed-size ring buffers.
+    """
 
-        if random_choice == 'mutate handles':
-            if use_memory_type is None or use_memory_type == 'off':
-                mother_hallofshame_handles = parent_hallofshame_handles[pick]
-            elif use_memory_type == 'all':
-                mother_hallofshame_handles = random.sample(hallofshame['handles'] + memory_hallofshame['handles'], 1)[0]
-            elif use_memory_type == 'best_memory':
-                mother_hallofshame_handles = random.sample(hallofshame['handles'] + memory_best_parent_hallofshame['handles'], 1)[0]
-            elif use_memory_type == 'special':
-                mother_hallofshame_handles = random.sample(special_hallofshame['handles'], 1)[0]
-            else:
-                raise NotImplementedError
-
-            # locates the target slats for mutation, and prepares a mask
-            mask2 = np.full(candidate_handle_arrays[0].shape, False, dtype=bool)
-            for layer, slatname in mother_hallofshame_handles:  # indexing has a -1 since the handles always face up (and are 1-indexed)
-                mask2[:, :, layer - 1] = (slat_array[:, :, layer - 1] == slatname) | mask2[:, :, layer - 1]
-
-        elif random_choice == 'mutate antihandles':  # or some bad antihandle sequences
-            if use_memory_type is None or use_memory_type == 'off':
-                mother_hallofshame_antihandles = parent_hallofshame_antihandles[pick]
-            elif use_memory_type == 'all':
-                mother_hallofshame_antihandles = random.sample(hallofshame['antihandles'] + memory_hallofshame['antihandles'], 1)[0]
-            elif use_memory_type == 'best_memory':
-                mother_hallofshame_antihandles = random.sample(hallofshame['antihandles'] + memory_best_parent_hallofshame['antihandles'], 1)[0]
-            elif use_memory_type == 'special':
-                mother_hallofshame_antihandles = random.sample(special_hallofshame['antihandles'], 1)[0]
-            else:
-                raise NotImplementedError
+    memory_types = ['off', 'all', 'best_memory', 'special']
+
+    def __init__(self, slat_array, unique_sequences=32, mutation_rate=2.0, mutation_type_probabilities=(0.425, 0.425, 0.15),
+                 use_memory_type='off', memory_length=10, population_size=30, survivors=3, split_sequence_handles=False,
+                 slat_index=None):
+        """
+        :param slat_array: Base slat array for design
+        :param unique_sequences: Total length of handle library available
+        :param mutation_rate: The expected number of mutations per cycle
+        :param mutation_type_probabilities: Probability of selecting a specific mutation type for a target handle/antihandle
+        (either handle, antihandle or mixed mutations)
+        :param use_memory_type: The hall of shame entries from which mutation targets are selected - 'off' (the parent's own
+        worst combinations), 'all' (any from the current generation or the memory of previous generations), 'best_memory'
+        (any from the current generation or the memory of the best parents of previous generations) or 'special'
+        (any from the first generation)
+        :param memory_length: Number of generations for which hall of shame entries are retained
+        :param population_size: Number of handle arrays in each generation
+        :param survivors: Number of arrays that survive (and act as parents) in each generation
+        :param split_sequence_handles: Set to true if the handle library needs to be split between subsequent layers
+        :param slat_index: Pre-computed SlatIndex of the slat array (built from the slat array if not provided)
+        """
+        if use_memory_type is None:
+            use_memory_type = 'off'
+        if use_memory_type not in self.memory_types:
+            raise ValueError(f'Mutation memory type {use_memory_type} not recognized.')
+
+        self.slat_array = slat_array
+        self.slat_index = SlatIndex(slat_array) if slat_index is None else slat_index
+        self.unique_sequences = int(unique_sequences)
+        self.mutation_rate = mutation_rate
+        # applies a normalization just in case the input values do not sum to 1
+        self.mutation_type_probabilities = np.array(mutation_type_probabilities, dtype=np.float64) / sum(mutation_type_probabilities)
+        self.use_memory_type = use_memory_type
+        self.split_sequence_handles = split_sequence_handles and slat_array.shape[2] >= 3
+
+        # flat positions of each slat within the handle array
+        self.slat_positions = {'handles': self.slat_index.handle_indices, 'antihandles': self.slat_index.antihandle_indices}
+        self.slat_lookup = {'handles': {key: i for i, key in enumerate(self.slat_index.handle_keys)},
+                            'antihandles': {key: i for i, key in enumerate(self.slat_index.antihandle_keys)}}
+
+        self.memory = {kind: HallOfShameMemory(memory_length * population_size) for kind in self.slat_positions}
+        self.best_parent_memory = {kind: HallOfShameMemory(memory_length * survivors) for kind in self.slat_positions}
+        self.special_memory = {kind: [] for kind in self.slat_positions}
+
+    def encode_hallofshame(self, entries, kind, valid_positions):
+        """
+        Converts hall of shame entries into the handle array positions that can be mutated.
+        :param entries: List of entries, each a list of the (layer, slat ID) keys of the worst slat combinations of a candidate
+        :param kind: 'handles' or 'antihandles'
+        :param valid_positions: Flat boolean mask of the handle array positions which can contain a handle
+        :return: List of flat position arrays (one per entry)
+        """
+        encoded_entries = []
+        for entry in entries:
+            slats = [self.slat_lookup[kind][tuple(key)] for key in entry]
+            positions = np.unique(self.slat_positions[kind][slats].ravel())
+            encoded_entries.append(positions[valid_positions[positions]])
+        return encoded_entries
+
+    def get_memory_state(self):
+        """
+        Packs the hall of shame memories into flat arrays (e.g. for storage in a checkpoint).
+        :return: Dictionary of arrays - the positions of all entries of each memory are concatenated, along with the length of each entry
+        """
+        state = {}
+        for name, memory in [('memory', self.memory), ('best_parent_memory', self.best_parent_memory),
+                             ('special_memory', self.special_memory)]:
+            for kind, entries in memory.items():
+                entries = entries.contents() if isinstance(entries, HallOfShameMemory) else entries
+                state[f'{name}_{kind}_positions'] = np.concatenate(entries) if len(entries) > 0 else np.zeros(0, dtype=np.intp)
+                state[f'{name}_{kind}_lengths'] = np.array([len(entry) for entry in entries], dtype=np.int64)
+        return state
+
+    def load_memory_state(self, state):
+        """
+        Restores the hall of shame memories from arrays generated by get_memory_state.
+        :param state: Dictionary of memory arrays
+        :return: N/A
+        """
+        for name in ['memory', 'best_parent_memory', 'special_memory']:
+            for kind in self.slat_positions:
+                positions = np.asarray(state[f'{name}_{kind}_positions'], dtype=np.intp)
+                entries = np.split(positions, np.cumsum(state[f'{name}_{kind}_lengths'])[:-1]) if len(state[f'{name}_{kind}_lengths']) > 0 else []
+                if name == 'special_memory':
+                    self.special_memory[kind] = entries
+                else:
+                    memory = getattr(self, name)
+                    memory[kind] = HallOfShameMemory(memory[kind].capacity)
+                    memory[kind].extend(entries)
 
-            # locates the target slats for mutation, and prepares a mask
-            mask2 = np.full(candidate_handle_arrays[0].shape, False, dtype=bool)
+    def remember(self, hallofshame, best_score_indices):
+        """
+        Adds the hall of shame of a generation to the memories required for the selected memory type.
+        :param hallofshame: Dictionary of encoded hall of shame entries (for 'handles' and 'antihandles') of the whole generation
+        :param best_score_indices: The indices of the best scoring arrays of the generation
+        :return: N/A
+        """
+        for kind, entries in hallofshame.items():
+            if self.use_memory_type == 'all':
+                self.memory[kind].extend(entries)
+            elif self.use_memory_type == 'best_memory':
+                self.best_parent_memory[kind].extend([entries[i] for i in best_score_indices])
 
-            for layer, slatname in mother_hallofshame_antihandles:  # indexing has a -2 since the antihandles always face down (and are 1-indexed)
-                mask2[:, :, layer - 2] = (slat_array[:, :, layer - 1] == slatname) | mask2[:, :, layer - 2]
+    def mutate(self, candidate_handle_arrays, hallofshame, best_score_indices, out=None, child_count=None, remember=True):
+        """
+        Mutates (randomizes handles) a set of candidate arrays into a new generation, while retaining the best scoring
+        arrays from the previous generation.  The hall of shame of the previous generation is added to the mutator's
+        memory once the new generation has been prepared.
+        :param candidate_handle_arrays: Stacked candidate handle arrays from the previous generation (population, X, Y, layers - 1)
+        :param hallofshame: Worst handle/antihandle combinations from the previous generation
+        (dictionary with a list of entries for 'handles' and 'antihandles')
+        :param best_score_indices: The indices of the best scoring arrays from the previous generation
+        :param out: Array into which the new generation should be written (optional)
+        :param child_count: Number of mutated arrays to generate (defaults to the size of the previous generation,
+        minus the number of parents)
+        :param remember: Set to false to leave the mutator's memory untouched (the hall of shame can then be added
+        separately with remember)
+        :return: New generation of handle arrays, the mutation maps of each mutated array and the index
+        (within the new generation) of the parent of each mutated array
+        """
+        candidate_handle_arrays = np.asarray(candidate_handle_arrays)
+        generation_array_count = len(candidate_handle_arrays)
+        best_score_indices = np.asarray(best_score_indices)
+        parent_array_count = len(best_score_indices)
+        if child_count is None:
+            child_count = generation_array_count - parent_array_count
+        else:
+            generation_array_count = parent_array_count + child_count
 
-        elif random_choice == 'mutate anywhere':
-            mask2 = np.full(candidate_handle_arrays[0].shape, True, dtype=bool)
+        # mask to prevent the assigning of a handle in areas where none should be placed (zeros)
+        valid_positions = candidate_handle_arrays[0].ravel() > 0
 
+        # only the entries that can be selected (or need to be remembered) are encoded
+        if self.use_memory_type == 'off':
+            current_entries = {kind: self.encode_hallofshame([hallofshame[kind][i] for i in best_score_indices], kind, valid_positions)
+                               for kind in self.slat_positions}
+        elif self.use_memory_type == 'special':
+            current_entries = {}
+            if len(self.special_memory['handles']) == 0:  # the special entries are those of the first generation
+                self.special_memory = {kind: self.encode_hallofshame(hallofshame[kind], kind, valid_positions)
+                                       for kind in self.slat_positions}
+        else:
+            current_entries = {kind: self.encode_hallofshame(hallofshame[kind], kind, valid_positions) for kind in self.slat_positions}
 
-        next_gen_member = mother.copy()
+        # pick someone to mutate, along with the type of mutation
+        parent_picks = np.random.randint(0, parent_array_count, size=child_count)
+        mutation_types = np.random.choice(3, size=child_count, p=self.mutation_type_probabilities)
+
+        # locates the target positions for each child
+        anywhere_positions = np.flatnonzero(valid_positions)
+        child_positions = [anywhere_positions] * child_count
+        for mutation_type, kind in enumerate(self.slat_positions):
+            children = np.flatnonzero(mutation_types == mutation_type)
+            if self.use_memory_type == 'off':
+                selection_pool = current_entries[kind]
+                selections = parent_picks[children]
+            else:
+                if self.use_memory_type == 'all':
+                    selection_pool = current_entries[kind] + self.memory[kind].contents()
+                elif self.use_memory_type == 'best_memory':
+                    selection_pool = current_entries[kind] + self.best_parent_memory[kind].contents()
+                else:
+                    selection_pool = self.special_memory[kind]
+                selections = np.random.randint(0, len(selection_pool), size=len(children))
+            for child, selection in zip(children, selections):
+                child_positions[child] = selection_pool[selection]
 
         # The mutation rate is defined as the expected number of mutations in the whole structure.
         # This can be applied using Binomial and poisson statistics:  [mutation rate] =  [num places to be mutated] * probability
-        positions_to_be_mutated = mask & mask2 # Mask and mask2 two are the places where mutations are allowed
+        position_counts = np.array([len(positions) for positions in child_positions], dtype=np.int64)
+        mutation_probabilities = np.minimum(self.mutation_rate / np.maximum(position_counts, 1), 1)
+        mutation_counts = np.random.binomial(position_counts, mutation_probabilities)
+        # The above can result in no mutations being applied.  In this case, set one at random.
+        mutation_counts = np.where(position_counts > 0, np.maximum(mutation_counts, 1), 0)
 
-        logicforpointmutations = np.random.random(candidate_handle_arrays[0].shape) < mutation_rate / np.sum(positions_to_be_mutated)
-        logicforpointmutations = logicforpointmutations & positions_to_be_mutated
+        # the mutated positions of all children are selected together
+        all_positions = np.concatenate(child_positions) if child_count > 0 else np.zeros(0, dtype=np.intp)
+        mutated_children, position_selections = sample_without_replacement(position_counts, mutation_counts)
+        mutated_positions = all_positions[(np.cumsum(position_counts) - position_counts)[mutated_children] + position_selections]
 
-        # The above can result in no mutations being applied.  In this case, set one at random.
-        if np.sum(logicforpointmutations) == 0:
-            # Get all valid mutation coordinates (multi-dimensional)
-            possible_indices = np.argwhere(positions_to_be_mutated)
-            # Randomly choose one valid coordinate
-            chosen_index = tuple(possible_indices[np.random.choice(len(possible_indices))])
-            # Set mutation at that coordinate
-            logicforpointmutations[chosen_index] = True
+        if out is None:
+            out = np.empty((generation_array_count,) + candidate_handle_arrays.shape[1:], dtype=candidate_handle_arrays.dtype)
+
+        # all parents are members of the next generation and survive, and are placed at the start in the same order
+        parent_handle_arrays = candidate_handle_arrays[best_score_indices]
+        next_generation = out.reshape(generation_array_count, -1)
+        out[:parent_array_count] = parent_handle_arrays
+        out[parent_array_count:] = parent_handle_arrays[parent_picks]
 
         # The actual mutation happens here
-        if not split_sequence_handles or slat_array.shape[2] < 3:  # just use the entire library for any one handle
-            next_gen_member[logicforpointmutations] = np.random.randint(1, unique_sequences + 1, size=np.sum(logicforpointmutations))
+        if not self.split_sequence_handles:  # just use the entire library for any one handle
+            new_handles = np.random.randint(1, self.unique_sequences + 1, size=len(mutated_positions))
         else:  # in the split case, only half the library is available for any one layer
-            for layer in range(logicforpointmutations.shape[2]):
-                if layer % 2 == 0:
-                    h1 = 1
-                    h2 = int(unique_sequences / 2) + 1
-                else:
-                    h1 = int(unique_sequences / 2) + 1
-                    h2 = unique_sequences + 1
+            layers = mutated_positions % candidate_handle_arrays.shape[-1]
+            half_library = int(self.unique_sequences / 2) + 1
+            new_handles = np.random.randint(np.where(layers % 2 == 0, 1, half_library),
+                                            np.where(layers % 2 == 0, half_library, self.unique_sequences + 1))
+        next_generation[parent_array_count + mutated_children, mutated_positions] = new_handles
+
+        mutation_maps = np.zeros((child_count,) + candidate_handle_arrays.shape[1:], dtype=bool)
+        mutation_maps.reshape(child_count, -1)[mutated_children, mutated_positions] = True
+
+        if remember:
+            self.remember(current_entries, best_score_indices)
+
+        return out, mutation_maps, parent_picks
+
+
+def mutate_handle_arrays(slat_array, candidate_handle_arrays,
+                         hallofshame, best_score_indices, unique_sequences=32,
+                         memory_hallofshame=None, memory_best_parent_hallofshame=None,
+                         special_hallofshame=None,
+                         mutation_rate=2.0, mutation_type_probabilities=(0.425, 0.425, 0.15),
+                         use_memory_type=None,
+                         split_sequence_handles=False,
+                         return_parent_indices=False):
+    """
+    Mutates (randomizes handles) a set of candidate arrays into a new generation,
+    while retaining the best scoring arrays  from the previous generation.
+    The mutation itself is carried out by a HandleMutator - use one directly to retain the design details and hall of shame
+    memories between generations.
+    :param slat_array: Base slat array for design
+    :param candidate_handle_arrays: Set of candidate handle arrays from previous generation
+    :param hallofshame: Worst handle/antihandle combinations from previous generation
+    :param memory_hallofshame: List of all the worst handle/antihandle combinations from previous generations
+    :param memory_best_parent_hallofshame: List of the worst handle/antihandle combinations from previous generations (only the ones linked to the best parents)
+    :param special_hallofshame: List of special handle/antihandle combinations from previous generations
+    :param best_score_indices: The indices of the best scoring arrays from the previous generation
+    :param unique_sequences: Total length of handle library available
+    :param mutation_rate: The expected number of mutations per cycle
+    :param mutation_type_probabilities: Probability of selecting a specific mutation type for a target handle/antihandle
+    (either handle, antihandle or mixed mutations)
+    :param split_sequence_handles: Set to true if the handle library needs to be split between subsequent layers
+    :param return_parent_indices: Set to true to also return the index (within the new generation) of the parent of each mutated array
+    :return: New generation of handle arrays to be screened, along with the mutation maps for each new array
+    (and the parent indices if requested)
+    """
+    candidate_handle_arrays = np.array(candidate_handle_arrays)
+    mutator = HandleMutator(slat_array, unique_sequences, mutation_rate, mutation_type_probabilities, use_memory_type,
+                            memory_length=0, split_sequence_handles=split_sequence_handles)
 
-                next_gen_member[:, :, layer][logicforpointmutations[:, :, layer]] = np.random.randint(h1, h2, size=np.sum( logicforpointmutations[:, :, layer]))
+    # the provided memories are loaded into the mutator in full
+    valid_positions = candidate_handle_arrays[0].ravel() > 0
+    for kind in mutator.slat_positions:
+        for memory, entries in [(mutator.memory, memory_hallofshame), (mutator.best_parent_memory, memory_best_parent_hallofshame)]:
+            if entries is not None and len(entries[kind]) > 0:
+                memory[kind] = HallOfShameMemory(len(entries[kind]))
+                memory[kind].extend(mutator.encode_hallofshame(entries[kind], kind, valid_positions))
+        if special_hallofshame is not None:
+            mutator.special_memory[kind] = mutator.encode_hallofshame(special_hallofshame[kind], kind, valid_positions)
 
-        mutated_handle_arrays.append(next_gen_member)
-        mutation_maps.append(logicforpointmutations)
+    mutated_handle_arrays, mutation_maps, parent_indices = mutator.mutate(candidate_handle_arrays, hallofshame, best_score_indices)
 
-    return mutated_handle_arrays, mutation_maps
+    if return_parent_indices:
+        return list(mutated_handle_arrays), list(mutation_maps), parent_indices.tolist()
+    return list(mutated_handle_arrays), list(mutation_maps)
@@ -0,0 +1,334 @@
+import os
+import queue
+import traceback
+import multiprocessing
+import numpy as np
+import pandas as pd
+from colorama import Fore
+
+from crisscross.assembly_handle_optimization.handle_evolution import (EvolveManager, export_handle_array_to_excel,
+                                                                     excel_conditional_formatting)
+from crisscross.helper_functions import create_dir_if_empty, save_list_dict_to_file
+
+migration_topologies = ['ring', 'fully_connected', 'random']
+
+
+def get_migration_destinations(island_index, island_count, topology='ring'):
+    """
+    Finds the islands to which an island should send its migrants.
+    :param island_index: Index of the sending island
+    :param island_count: Total number of islands
+    :param topology: Migration topology - 'ring' (to the next island only), 'fully_connected' (to all other islands)
+    or 'random' (to a single, randomly selected island for each migration)
+    :return: List of destination island indices
+    """
+    if topology not in migration_topologies:
+        raise ValueError(f'Migration topology {topology} not recognized.')
+    if island_count < 2:
+        return []
+    if topology == 'ring':
+        return [(island_index + 1) % island_count]
+    elif topology == 'fully_connected':
+        return [index for index in range(island_count) if index != island_index]
+    else:
+        destination = np.random.randint(0, island_count - 1)
+        return [destination if destination < island_index else destination + 1]
+
+
+class MigrationTransport:
+    """
+    Base class for the system used to move migrants between islands.  Alternative transports (e.g. one which
+    spans several nodes) should implement send and receive, and must be picklable to be passed on to island processes.
+    """
+
+    def send(self, source, destination, migrants):
+        """
+        Sends migrants to another island.  This should not wait for the destination island to receive them.
+        :param source: Index of the sending island
+        :param destination: Index of the receiving island
+        :param migrants: Array of migrant handle arrays
+        :return: N/A
+        """
+        raise NotImplementedError
+
+    def receive(self, island_index):
+        """
+        Collects all migrants that have arrived at an island (without waiting for any more to arrive).
+        :param island_index: Index of the receiving island
+        :return: Array of migrant handle arrays (or None if no migrants have arrived)
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Called by each island once it has stopped evolving.
+        """
+        pass
+
+
+class LocalQueueTransport(MigrationTransport):
+    """
+    Moves migrants between islands running on the same node, with a multiprocessing queue for each island.
+    """
+
+    def __init__(self, island_count, context=None):
+        """
+        :param island_count: Total number of islands
+        :param context: Multiprocessing context with which to create the queues (the default context if not specified)
+        """
+        context = multiprocessing.get_context() if context is None else context
+        self.queues = [context.Queue() for _ in range(island_count)]
+
+    def send(self, source, destination, migrants):
+        self.queues[destination].put((source, migrants))
+
+    def receive(self, island_index):
+        migrants = []
+        while True:
+            try:
+                _, island_migrants = self.queues[island_index].get_nowait()
+            except queue.Empty:
+                break
+            migrants.append(island_migrants)
+        return np.concatenate(migrants) if len(migrants) > 0 else None
+
+    def close(self):
+        # migrants still waiting in a queue are no longer needed, and should not hold up the island process from exiting
+        for island_queue in self.queues:
+            island_queue.cancel_join_thread()
+
+
+def _run_island(island_index, island_count, slat_array, evolution_params, migration_topology, migration_interval,
+                migrant_count, transport, stop_event, result_queue, logging_interval, resume_from):
+    """
+    Runs the evolution of a single island, exchanging migrants with the other islands at a fixed generation interval.
+    :param island_index: Index of the island
+    :param island_count: Total number of islands
+    :param slat_array: The basis slat array for which a handle set is being evolved
+    :param evolution_params: EvolveManager parameters for this island (including its seed and log directory)
+    :param migration_topology: Migration topology (refer to get_migration_destinations)
+    :param migration_interval: Number of generations between each migration
+    :param migrant_count: Number of candidates sent to each destination island in each migration
+    :param transport: MigrationTransport used to exchange migrants
+    :param stop_event: Event set once any island reaches the early hamming stop (stops all islands)
+    :param result_queue: Queue to which the final island results are sent
+    :param logging_interval: Number of generations between each metrics log update
+    :param resume_from: Checkpoint file from which to resume the island (optional)
+    :return: N/A (results are sent through the result queue - the handle array is None if no generation was evaluated)
+    """
+    try:
+        with EvolveManager(slat_array, resume_from=resume_from, **evolution_params) as evolve_manager:
+            # the arrival count continues on from the checkpoint when resuming
+            migrant_arrivals = int(evolve_manager.metrics['Migrant Arrivals'][-1]) if 'Migrant Arrivals' in evolve_manager.metrics else 0
+            while evolve_manager.current_generation < evolve_manager.max_evolution_generations and not stop_event.is_set():
+                evolve_manager.single_evolution_step()
+                generation = evolve_manager.current_generation
+
+                if generation % migration_interval == 0:
+                    migrants = evolve_manager.select_migrants(migrant_count)
+                    for destination in get_migration_destinations(island_index, island_count, migration_topology):
+                        transport.send(island_index, destination, migrants)
+                    arrivals = transport.receive(island_index)
+                    if arrivals is not None:
+                        migrant_arrivals += evolve_manager.insert_migrants(arrivals)
+                evolve_manager.metrics['Migrant Arrivals'].append(migrant_arrivals)
+
+                if evolve_manager.log_tracking_directory is not None and generation % logging_interval == 0:
+                    evolve_manager.log_metrics()
+                if evolve_manager.checkpoint_interval and generation % evolve_manager.checkpoint_interval == 0:
+                    evolve_manager.save_checkpoint()
+                if evolve_manager.early_hamming_stop and evolve_manager.metrics['Corresponding Hamming Distance'][-1] >= evolve_manager.early_hamming_stop:
+                    stop_event.set()
+
+            # the full report is only exported once the island is done (an island stopped by another island before
+            # evaluating any generation has nothing to export, and simply returns an empty result)
+            final_generation = evolve_manager.current_generation
+            if evolve_manager.handle_array is not None:
+                if evolve_manager.log_tracking_directory is not None:
+                    evolve_manager.export_results()
+                if evolve_manager.checkpoint_interval and final_generation % evolve_manager.checkpoint_interval != 0:
+                    evolve_manager.save_checkpoint()
+
+            result_queue.put({'island': island_index,
+                              'metrics': dict(evolve_manager.metrics),
+                              'handle_array': evolve_manager.handle_array,
+                              'generations': evolve_manager.current_generation})
+    except Exception:
+        result_queue.put({'island': island_index, 'error': traceback.format_exc()})
+    finally:
+        transport.close()
+
+
+class IslandEvolveManager:
+    def __init__(self, slat_array, island_count=None, migration_topology='ring', migration_interval=10, migrant_count=1,
+                 random_seed=8, log_tracking_directory=None, transport=None, resume_from=None, **evolution_params):
+        """
+        Runs several independent handle evolution populations (islands) in separate processes, with the best
+        candidates of each island migrating to other islands at a fixed interval.  Islands do not wait for each other
+        (migrants are picked up by an island whenever they arrive), so no global selection barrier is present.
+        :param slat_array: The basis slat array for which a handle set is being evolved
+        :param island_count: Number of islands (defaults to the number of cores available)
+        :param migration_topology: Island connections along which migrants are sent - 'ring', 'fully_connected' or 'random'
+        :param migration_interval: Number of generations between each migration
+        :param migrant_count: Number of candidates each island sends in each migration (capped at the number of survivors)
+        :param random_seed: Random seed of the first island (each other island's seed is offset by its index)
+        :param log_tracking_directory: Directory in which to store the results of each island (in island_X sub-folders),
+        along with the global best handle array and a summary of all islands
+        :param transport: MigrationTransport used to exchange migrants (defaults to a LocalQueueTransport)
+        :param resume_from: Directory containing the island_X checkpoint folders of a previous run (from which to resume)
+        :param evolution_params: Any other parameters are passed on to the EvolveManager of each island.  Unless
+        specified, each island evaluates its population in a single thread (process_count=1, evaluation_mode='threads').
+        Islands always evolve in generational mode (steady-state evolution is not supported).
+        """
+        if migration_topology not in migration_topologies:
+            raise ValueError(f'Migration topology {migration_topology} not recognized.')
+        if resume_from is not None and not os.path.isdir(resume_from):
+            if os.path.isfile(resume_from):
+                raise ValueError(f'{resume_from} is a file, but island runs are resumed from the log tracking directory '
+                                 f'of a previous island run (containing the island_X checkpoint folders).')
+            raise ValueError(f'Resume directory {resume_from} does not exist.')
+        # migrants are exchanged through the generational population (survivors and mutated children)
+        if evolution_params.get('evolution_mode', 'generational') != 'generational':
+            raise ValueError('Island evolution is only available in generational evolution mode.')
+
+        self.slat_array = slat_array
+        self.island_count = int(island_count) if island_count is not None else multiprocessing.cpu_count()
+        self.migration_topology = migration_topology
+        self.migration_interval = int(migration_interval)
+        self.migrant_count = int(migrant_count)
+        self.seed = int(random_seed)
+        self.log_tracking_directory = log_tracking_directory
+        self.resume_from = resume_from
+
+        self.context = multiprocessing.get_context()
+        self.transport = LocalQueueTransport(self.island_count, self.context) if transport is None else transport
+
+        # islands already run in parallel, so each only evaluates in a single thread unless requested otherwise
+        self.evolution_params = dict(evolution_params)
+        self.evolution_params.setdefault('process_count', 1)
+        self.evolution_params.setdefault('evaluation_mode', 'threads')
+
+        self.island_metrics = {}
+        self.island_handle_arrays = {}
+        self.best_island = None
+        self.handle_array = None  # global best handle array (available once the experiment has been run)
+
+        if self.log_tracking_directory is not None:
+            create_dir_if_empty(self.log_tracking_directory)
+
+    def get_island_params(self, island_index):
+        """
+        Prepares the EvolveManager parameters of a specific island.
+        :param island_index: Index of the island
+        :return: Dictionary of parameters
+        """
+        island_params = dict(self.evolution_params)
+        island_params['random_seed'] = self.seed + island_index
+        if self.log_tracking_directory is not None:
+            island_params['log_tracking_directory'] = os.path.join(self.log_tracking_directory, f'island_{island_index}')
+        return island_params
+
+    def collect_island_results(self, islands, result_queue, stop_event, poll_interval=1.0):
+        """
+        Waits for the results of all islands, and then joins their processes.  Results are collected before joining,
+        as the islands cannot exit until their results have been sent over.  An island process that exits without
+        sending its results (e.g. if killed by the system when out of memory) stops all other islands and raises an error.
+        :param islands: Island processes (in island index order)
+        :param result_queue: Queue to which the islands send their results
+        :param stop_event: Event used to stop all islands
+        :param poll_interval: Time (in seconds) between each check of the island processes
+        :return: List of island results (in the order received)
+        """
+        results = []
+        exited_islands = set()  # islands which had already exited without their results arriving at the last check
+        while len(results) < len(islands):
+            try:
+                results.append(result_queue.get(timeout=poll_interval))
+                continue
+            except queue.Empty:
+                pass
+            # islands always send their results (or their error) before exiting normally, so an island that was killed
+            # (non-zero exit code) or whose results still haven't arrived a full poll interval after exiting has failed
+            received = {result['island'] for result in results}
+            for island_index, island in enumerate(islands):
+                if island_index in received or island.exitcode is None:
+                    continue
+                if island.exitcode == 0 and island_index not in exited_islands:
+                    exited_islands.add(island_index)
+                else:
+                    stop_event.set()
+                    for other_island in islands:
+                        if other_island.is_alive():
+                            other_island.terminate()
+                        other_island.join()
+                    raise RuntimeError(f'Island {island_index} exited unexpectedly (exit code {island.exitcode}) '
+                                       f'without sending its results.')
+        for island in islands:
+            island.join()
+        return results
+
+    def run_full_experiment(self, logging_interval=10):
+        """
+        Runs the evolution of all islands to completion (or until any island reaches the early hamming stop).
+        :param logging_interval: Number of generations between each metrics log update (for each island)
+        :return: Dataframe summarizing the final results of each island
+        """
+        stop_event = self.context.Event()
+        result_queue = self.context.Queue()
+
+        islands = []
+        for island_index in range(self.island_count):
+            resume_file = None
+            if self.resume_from is not None:
+                resume_file = os.path.join(self.resume_from, f'island_{island_index}', 'evolution_checkpoint.npz')
+            islands.append(self.context.Process(target=_run_island,
+                                                args=(island_index, self.island_count, self.slat_array,
+                                                      self.get_island_params(island_index), self.migration_topology,
+                                                      self.migration_interval, self.migrant_count, self.transport,
+                                                      stop_event, result_queue, logging_interval, resume_file)))
+        print(Fore.BLUE + f'Running handle evolution on {self.island_count} islands.' + Fore.RESET)
+        for island in islands:
+            island.start()
+
+        results = self.collect_island_results(islands, result_queue, stop_event)
+
+        errors = [result for result in results if 'error' in result]
+        if len(errors) > 0:
+            raise RuntimeError(f'Island {errors[0]["island"]} failed with the following error:\n{errors[0]["error"]}')
+
+        # islands stopped before evaluating a single generation have no results, and are left out of the summary
+        results = [result for result in results if result['handle_array'] is not None]
+        if len(results) == 0:
+            raise RuntimeError('No island evaluated any generations.')
+
+        summary = []
+        for result in sorted(results, key=lambda res: res['island']):
+            island_index = result['island']
+            self.island_metrics[island_index] = result['metrics']
+            self.island_handle_arrays[island_index] = result['handle_array']
+            summary.append({'Island': island_index,
+                            'Random Seed': self.seed + island_index,
+                            'Generations': result['generations'],
+                            'Best (Log) Physics-Based Score': result['metrics']['Best (Log) Physics-Based Score'][-1],
+                            'Corresponding Hamming Distance': result['metrics']['Corresponding Hamming Distance'][-1],
+                            'Corresponding Duplicate Risk Score': result['metrics']['Corresponding Duplicate Risk Score'][-1],
+                            'Migrant Arrivals': result['metrics']['Migrant Arrivals'][-1]})
+        summary_df = pd.DataFrame(summary)
+
+        # survivors are always retained, so the latest best of each island is also its overall best
+        # (a lower log physics-based score is better)
+        best_row = summary_df['Best (Log) Physics-Based Score'].idxmin()
+        self.best_island = int(summary_df.loc[best_row, 'Island'])
+        self.handle_array = self.island_handle_arrays[self.best_island]
+
+        if self.log_tracking_directory is not None:
+            summary_df.to_csv(os.path.join(self.log_tracking_directory, 'island_summary.csv'), index=False)
+            save_list_dict_to_file(self.log_tracking_directory, 'global_best_metrics.csv',
+                                   self.island_metrics[self.best_island], append=False)
+            export_handle_array_to_excel(self.handle_array,
+                                         os.path.join(self.log_tracking_directory, 'global_best_handle_array.xlsx'),
+                                         excel_conditional_formatting)
+
+        print(Fore.GREEN + f'Best handle array found on island {self.best_island}, with a hamming distance of '
+                           f'{summary_df.loc[best_row, "Corresponding Hamming Distance"]}.' + Fore.RESET)
+        return summary_df
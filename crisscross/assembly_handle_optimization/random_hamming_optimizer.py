@@ -3,12 +3,12 @@ from tqdm import tqdm
 
 from crisscross.assembly_handle_optimization import generate_layer_split_handles, generate_random_slat_handles, \
     update_split_slat_handles, update_random_slat_handles
-from crisscross.assembly_handle_optimization.hamming_compute import multirule_precise_hamming
+from crisscross.assembly_handle_optimization.hamming_compute import multirule_precise_hamming, multirule_oneshot_hamming, SlatIndex
 
 
 def generate_handle_set_and_optimize(base_array, unique_sequences=32, slat_length=32, max_rounds=30,
                                      split_sequence_handles=False, universal_hamming=True, layer_hamming=False,
-                                     group_hamming=None, metric_to_optimize='Universal'):
+                                     group_hamming=None, metric_to_optimize='Universal', hamming_backend='auto'):
     """
     Generates random handle sets and attempts to choose the best set based on the hamming distance between slat assembly handles.
     :param base_array: Slat position array (3D)
@@ -22,9 +22,12 @@ def generate_handle_set_and_optimize(base_array, unique_sequences=32, slat_lengt
     of tuples containing the layer and slat ID of the slats in the group for which the specific
     hamming distance is being requested.
     :param metric_to_optimize: The metric to optimize for (Universal, Layer X or Group ID)
+    :param hamming_backend: The hamming matching engine to use when the universal hamming distance is requested
+    (all combinations are computed in that case, so the fastest engine can be used - refer to multirule_oneshot_hamming)
     :return: 2D array with handle IDs
     """
     best_hamming = 0
+    slat_index = SlatIndex(base_array) if universal_hamming else None
     with tqdm(total=max_rounds, desc='Kinetic Trap Check') as pbar:
         for i in range(max_rounds):
             if i == 0:
@@ -42,9 +45,14 @@ def generate_handle_set_and_optimize(base_array, unique_sequences=32, slat_lengt
                 else:
                     update_random_slat_handles(handle_array)
 
-            hamming_dict = multirule_precise_hamming(base_array, handle_array, universal_check=universal_hamming,
-                                                     per_layer_check=layer_hamming, specific_slat_groups=group_hamming,
-                                                     slat_length=slat_length)
+            if universal_hamming:
+                hamming_dict = multirule_oneshot_hamming(base_array, handle_array, report_worst_slat_combinations=False,
+                                                         per_layer_check=layer_hamming, specific_slat_groups=group_hamming,
+                                                         slat_length=slat_length, backend=hamming_backend, slat_index=slat_index)
+            else:  # only the requested combinations are computed
+                hamming_dict = multirule_precise_hamming(base_array, handle_array, universal_check=universal_hamming,
+                                                         per_layer_check=layer_hamming, specific_slat_groups=group_hamming,
+                                                         slat_length=slat_length)
             if hamming_dict[metric_to_optimize] > best_hamming:
                 best_hamming = hamming_dict[metric_to_optimize]
                 best_array = np.copy(handle_array)
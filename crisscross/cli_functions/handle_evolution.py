@@ -1,11 +1,21 @@
 import rich_click as click
 import sys
 
-@click.command(help='This function accepts a .toml config file and will run the handle evolution process for the'
-                    ' specified slat array and parameters (all within the config file).')
+@click.group(invoke_without_command=True,
+             help='This function accepts a .toml config file and will run the handle evolution process for the'
+                  ' specified slat array and parameters (all within the config file).')
 @click.option('--config_file', '-c', default=None,
               help='[String] Name or path of the evolution config file to be read in.')
-def handle_evolve(config_file):
+@click.option('--resume_from', '-R', default=None,
+              help='[String] Path from which to resume a previous run.  For a single evolution run, this is the'
+                   ' checkpoint file (evolution_checkpoint.npz).  For an island run (island_count set in the config'
+                   ' file), this is the log tracking directory of the previous run (containing the island_X folders).'
+                   '  The config file should match that of the original run.')
+@click.pass_context
+def handle_evolve(ctx, config_file, resume_from):
+    if ctx.invoked_subcommand is not None:
+        return
+
     from crisscross.assembly_handle_optimization.handle_evolution import EvolveManager
     import toml
     import pandas as pd
@@ -31,16 +41,54 @@ def handle_evolve(config_file):
 
     evolution_params['slat_array'] = slat_array
 
+    if resume_from is not None:
+        evolution_params['resume_from'] = resume_from
+
     if 'logging_interval' in evolution_params:
         logging_interval = evolution_params['logging_interval']
         del evolution_params['logging_interval']
     else:
         logging_interval = 10
 
-    evolve_manager = EvolveManager(**evolution_params)
+    if 'island_count' in evolution_params:  # runs several populations in parallel, with migration between them
+        from crisscross.assembly_handle_optimization.island_evolution import IslandEvolveManager
+        evolve_manager = IslandEvolveManager(**evolution_params)
+    else:
+        evolve_manager = EvolveManager(**evolution_params)
 
     evolve_manager.run_full_experiment(logging_interval)
 
 
+@handle_evolve.command(help='Runs short, fixed-seed evolutions over a matrix of designs, population sizes and process'
+                            ' counts, and reports the time spent on evaluation, mutation, metrics and export'
+                            ' (as JSON and CSV files).  Use this to size compute requests for full runs.')
+@click.option('--output_folder', '-o', default='evolution_benchmarks',
+              help='[String] Folder to which the benchmark reports should be written.')
+@click.option('--designs', '-d', default='square_32',
+              help='[String] Comma-separated benchmark designs (square_32, stack_3_layer, sparse_large_canvas, square_32_library_64).')
+@click.option('--populations', '-p', default='30',
+              help='[String] Comma-separated population sizes to benchmark.')
+@click.option('--process_counts', '-n', default='1',
+              help='[String] Comma-separated process counts to benchmark.')
+@click.option('--generations', '-g', default=20, type=int,
+              help='[Integer] Number of generations to run for each combination.')
+@click.option('--target_hamming', '-t', default=None, type=int,
+              help='[Integer] Hamming distance for which the time to reach should be recorded.')
+@click.option('--export_interval', '-e', default=10, type=int,
+              help='[Integer] Number of generations between each results export.')
+@click.option('--random_seed', '-r', default=8, type=int,
+              help='[Integer] Random seed used for every run.')
+def bench(output_folder, designs, populations, process_counts, generations, target_hamming, export_interval, random_seed):
+    from crisscross.assembly_handle_optimization.evolution_benchmarks import run_evolution_benchmarks
+
+    results_df = run_evolution_benchmarks(output_folder,
+                                          designs=[design.strip() for design in designs.split(',')],
+                                          populations=[int(population) for population in populations.split(',')],
+                                          process_counts=[int(count) for count in process_counts.split(',')],
+                                          generations=generations, target_hamming=target_hamming,
+                                          export_interval=export_interval, random_seed=random_seed)
+    print(results_df.to_string(index=False))
+
+
 if __name__ == '__main__':
     handle_evolve(sys.argv[1:])  # for use when debugging with pycharm
@@ -14,6 +14,18 @@ plate96 = [x + str(y) for x, y in product(ascii_uppercase[:8], range(1, 12 + 1))
 plate384 = [x + str(y) for x, y in product(ascii_uppercase[:16], range(1, 24 + 1))]
 plate96_center_pattern = [x + str(y) for x, y in product(ascii_uppercase[:8], range(3, 10 + 1))]
 
+def get_user_cache_directory():
+    """
+    Returns the per-user cache directory for crisscross files generated at runtime (e.g. hamming backend tuning results),
+    creating it if not already available.  Set the CRISSCROSS_CACHE_DIR environment variable to use a different folder.
+    :return: Path of the cache directory
+    """
+    cache_directory = os.environ.get('CRISSCROSS_CACHE_DIR',
+                                     os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')), 'crisscross'))
+    create_dir_if_empty(cache_directory)
+    return cache_directory
+
+
 def revcom(sequence):
     """
     Reverse complements a DNA sequence.
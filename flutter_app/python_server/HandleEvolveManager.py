@@ -80,9 +80,15 @@ class HandleEvolveService(hamming_evolve_communication_pb2_grpc.HandleEvolveServ
                 ])
             ]) for layer in np.transpose(self.evolve_manager.handle_array, (1, 0, 2))
         ]
-        self.evolve_manager = None
+        self.close()
         return hamming_evolve_communication_pb2.FinalResponse(handleArray=handleArray)
 
+    def close(self):
+        # the evaluation pool and its shared memory are released straight away, rather than whenever the manager is garbage collected
+        if self.evolve_manager is not None:
+            self.evolve_manager.close()
+            self.evolve_manager = None
+
     def requestExport(self, request, context):
         print('RECEIVED EXPORT REQUEST')
         self.evolve_manager.export_results(request.folderPath)
@@ -25,7 +25,8 @@ def serve():
     server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
 
     # add custom class code to the server
-    hamming_evolve_communication_pb2_grpc.add_HandleEvolveServicer_to_server(HandleEvolveService(), server)
+    evolve_service = HandleEvolveService()
+    hamming_evolve_communication_pb2_grpc.add_HandleEvolveServicer_to_server(evolve_service, server)
 
     # add a health checker system to the server
     health_pb2_grpc.add_HealthServicer_to_server(health.HealthServicer(), server)
@@ -34,7 +35,10 @@ def serve():
     server.add_insecure_port(HOST)
     print(f"gRPC server started and listening on {HOST}")
     server.start()
-    server.wait_for_termination()
+    try:
+        server.wait_for_termination()
+    finally:
+        evolve_service.close()
 
 
 if __name__ == '__main__':
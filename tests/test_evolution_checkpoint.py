@@ -0,0 +1,37 @@
+import numpy as np
+
+from crisscross.assembly_handle_optimization.handle_evolution import EvolveManager
+from crisscross.core_functions.slat_design import generate_standard_square_slats
+
+
+def deterministic_metrics(evolve_manager):
+    # timings depend on the machine, but every other metric should be identical after resuming
+    return {name: [float(value) for value in values] for name, values in evolve_manager.metrics.items()
+            if 'Time' not in name}
+
+
+def test_resumed_run_matches_uninterrupted_run(tmp_path):
+    slat_array, _ = generate_standard_square_slats(32)
+    params = dict(evolution_population=30, process_count=1, evaluation_mode='threads', random_seed=8,
+                  mutation_memory_system='special', memory_length=5)
+
+    with EvolveManager(slat_array, evolution_generations=6, log_tracking_directory=str(tmp_path / 'full'),
+                       **params) as full_run:
+        full_run.run_full_experiment(logging_interval=100)
+
+    with EvolveManager(slat_array, evolution_generations=3, log_tracking_directory=str(tmp_path / 'interrupted'),
+                       checkpoint_interval=3, **params) as interrupted_run:
+        interrupted_run.run_full_experiment(logging_interval=100)
+
+    with EvolveManager(slat_array, evolution_generations=6, log_tracking_directory=str(tmp_path / 'resumed'),
+                       resume_from=str(tmp_path / 'interrupted' / 'evolution_checkpoint.npz'), **params) as resumed_run:
+        resumed_run.run_full_experiment(logging_interval=100)
+
+    full_metrics = deterministic_metrics(full_run)
+    resumed_metrics = deterministic_metrics(resumed_run)
+    assert full_metrics.keys() == resumed_metrics.keys()
+    for name in full_metrics:
+        assert full_metrics[name] == resumed_metrics[name], name
+    assert 'Fitness Cache Hit Rate' in resumed_metrics
+    assert np.array_equal(full_run.next_candidates, resumed_run.next_candidates)
+    assert np.array_equal(full_run.handle_array, resumed_run.handle_array)
@@ -0,0 +1,41 @@
+import os
+import signal
+import multiprocessing
+
+import pytest
+
+from crisscross.assembly_handle_optimization.island_evolution import (IslandEvolveManager, LocalQueueTransport,
+                                                                      _run_island)
+from crisscross.core_functions.slat_design import generate_standard_square_slats
+
+
+def _kill_self():
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+def test_island_stopped_before_first_generation(tmp_path):
+    slat_array, _ = generate_standard_square_slats(32)
+    context = multiprocessing.get_context()
+    stop_event = context.Event()
+    stop_event.set()  # another island has already reached the target
+    result_queue = context.Queue()
+
+    evolution_params = {'evolution_population': 4, 'evolution_generations': 3, 'process_count': 1,
+                        'evaluation_mode': 'threads', 'log_tracking_directory': str(tmp_path / 'island_0'),
+                        'checkpoint_interval': 2}
+    _run_island(0, 1, slat_array, evolution_params, 'ring', 1, 1, LocalQueueTransport(1, context),
+                stop_event, result_queue, 1, None)
+
+    result = result_queue.get(timeout=10)
+    assert 'error' not in result
+    assert result['handle_array'] is None
+    assert result['generations'] == 0
+
+
+def test_dead_island_raises_instead_of_hanging():
+    slat_array, _ = generate_standard_square_slats(32)
+    manager = IslandEvolveManager(slat_array, island_count=1)
+    island = manager.context.Process(target=_kill_self)
+    island.start()
+    with pytest.raises(RuntimeError, match='exited unexpectedly'):
+        manager.collect_island_results([island], manager.context.Queue(), manager.context.Event(), poll_interval=0.1)